@@ -18,7 +18,7 @@ config = context.config
 
 # Override sqlalchemy.url with our settings
 # Use attributes to avoid ConfigParser interpolation issues with special characters in URLs
-config.attributes['sqlalchemy.url'] = settings.DATABASE_URL
+config.attributes['sqlalchemy.url'] = settings.database_url
 
 # Interpret the config file for Python logging.
 if config.config_file_name is not None:
@@ -42,8 +42,25 @@ def run_migrations_offline() -> None:
         context.run_migrations()
 
 
+def _run_migrations_with_connection(connection) -> None:
+    """Configure the context on an open connection and run migrations."""
+    context.configure(
+        connection=connection, target_metadata=target_metadata
+    )
+
+    with context.begin_transaction():
+        context.run_migrations()
+
+
 def run_migrations_online() -> None:
     """Run migrations in 'online' mode."""
+    # Callers running upgrades programmatically (or back-to-back) can pass an
+    # open connection via config.attributes["connection"] to reuse one socket
+    connection = config.attributes.get("connection")
+    if connection is not None:
+        _run_migrations_with_connection(connection)
+        return
+
     # Get URL from attributes (set from settings) or config file
     url = config.attributes.get("sqlalchemy.url") or config.get_main_option("sqlalchemy.url")
     
@@ -51,13 +68,11 @@ def run_migrations_online() -> None:
     from sqlalchemy import create_engine
     connectable = create_engine(url, poolclass=pool.NullPool)
 
-    with connectable.connect() as connection:
-        context.configure(
-            connection=connection, target_metadata=target_metadata
-        )
-
-        with context.begin_transaction():
-            context.run_migrations()
+    try:
+        with connectable.connect() as connection:
+            _run_migrations_with_connection(connection)
+    finally:
+        connectable.dispose()
 
 
 if context.is_offline_mode():
@@ -0,0 +1,44 @@
+"""add_ai_features_gin_index
+
+Revision ID: 3f6b2c1d9a7e
+Revises: 8d914a794ef0
+Create Date: 2025-12-05 10:12:44.318204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f6b2c1d9a7e'
+down_revision = '8d914a794ef0'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Build the GIN index without locking writes on products.
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction block.
+    with op.get_context().autocommit_block():
+        op.execute("SET maintenance_work_mem = '512MB'")
+        op.create_index(
+            'ix_products_ai_features_gin',
+            'products',
+            ['ai_features'],
+            unique=False,
+            postgresql_using='gin',
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.execute("RESET maintenance_work_mem")
+
+
+def downgrade() -> None:
+    # Drop the index before the ai_features column can be removed
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_products_ai_features_gin',
+            table_name='products',
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
@@ -0,0 +1,45 @@
+"""add_embedding_hnsw_index
+
+Revision ID: 5a1e7c4b2d90
+Revises: 3f6b2c1d9a7e
+Create Date: 2025-12-08 09:41:17.502836
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5a1e7c4b2d90'
+down_revision = '3f6b2c1d9a7e'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # HNSW index for ORDER BY embedding <=> :query LIMIT k (cosine distance).
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction block.
+    with op.get_context().autocommit_block():
+        op.execute("SET maintenance_work_mem = '512MB'")
+        op.create_index(
+            'ix_products_embedding_hnsw',
+            'products',
+            ['embedding'],
+            unique=False,
+            postgresql_using='hnsw',
+            postgresql_with={'m': 16, 'ef_construction': 64},
+            postgresql_ops={'embedding': 'vector_cosine_ops'},
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.execute("RESET maintenance_work_mem")
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_products_embedding_hnsw',
+            table_name='products',
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
@@ -0,0 +1,41 @@
+"""add_tags_gin_index
+
+Revision ID: b7c3e9f1a2d4
+Revises: 5a1e7c4b2d90
+Create Date: 2025-12-08 11:06:52.917340
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7c3e9f1a2d4'
+down_revision = '5a1e7c4b2d90'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # GIN index so tag lookups (tags @> ARRAY[:tag]) avoid a full scan.
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction block.
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_products_tags_gin',
+            'products',
+            ['tags'],
+            unique=False,
+            postgresql_using='gin',
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_products_tags_gin',
+            table_name='products',
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
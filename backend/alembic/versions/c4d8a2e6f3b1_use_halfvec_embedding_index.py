@@ -0,0 +1,59 @@
+"""use_halfvec_embedding_index
+
+Revision ID: c4d8a2e6f3b1
+Revises: b7c3e9f1a2d4
+Create Date: 2025-12-09 14:22:05.613948
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4d8a2e6f3b1'
+down_revision = 'b7c3e9f1a2d4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Replace the full-precision HNSW index with one over embedding::halfvec
+    # (requires pgvector >= 0.7). Same recall in practice at half the index size.
+    # CREATE/DROP INDEX CONCURRENTLY cannot run inside a transaction block.
+    with op.get_context().autocommit_block():
+        op.execute("SET maintenance_work_mem = '512MB'")
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_products_embedding_halfvec_hnsw "
+            "ON products USING hnsw ((embedding::halfvec(1536)) halfvec_cosine_ops) "
+            "WITH (m = 16, ef_construction = 64)"
+        )
+        op.execute("RESET maintenance_work_mem")
+        op.drop_index(
+            'ix_products_embedding_hnsw',
+            table_name='products',
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.execute("SET maintenance_work_mem = '512MB'")
+        op.create_index(
+            'ix_products_embedding_hnsw',
+            'products',
+            ['embedding'],
+            unique=False,
+            postgresql_using='hnsw',
+            postgresql_with={'m': 16, 'ef_construction': 64},
+            postgresql_ops={'embedding': 'vector_cosine_ops'},
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.execute("RESET maintenance_work_mem")
+        op.drop_index(
+            'ix_products_embedding_halfvec_hnsw',
+            table_name='products',
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
@@ -0,0 +1,25 @@
+"""add_embedding_input_hash
+
+Revision ID: d2a7f5c9e8b3
+Revises: c4d8a2e6f3b1
+Create Date: 2025-12-10 10:41:27.308152
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd2a7f5c9e8b3'
+down_revision = 'c4d8a2e6f3b1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Digest of the text (and model) each embedding was generated from
+    op.add_column('products', sa.Column('embedding_input_hash', sa.String(length=32), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('products', 'embedding_input_hash')
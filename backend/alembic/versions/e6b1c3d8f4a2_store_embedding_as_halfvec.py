@@ -0,0 +1,74 @@
+"""store_embedding_as_halfvec
+
+Revision ID: e6b1c3d8f4a2
+Revises: d2a7f5c9e8b3
+Create Date: 2025-12-10 16:03:48.271905
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e6b1c3d8f4a2'
+down_revision = 'd2a7f5c9e8b3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Store the embedding itself as halfvec (float16), halving heap size; the
+    # HNSW index moves from the embedding::halfvec expression to the column.
+    # CREATE/DROP INDEX CONCURRENTLY cannot run inside a transaction block.
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_products_embedding_halfvec_hnsw',
+            table_name='products',
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
+    
+    # Rewrites the table under an ACCESS EXCLUSIVE lock
+    op.execute(
+        "ALTER TABLE products ALTER COLUMN embedding TYPE halfvec(1536) "
+        "USING embedding::halfvec(1536)"
+    )
+    
+    with op.get_context().autocommit_block():
+        op.execute("SET maintenance_work_mem = '512MB'")
+        op.create_index(
+            'ix_products_embedding_halfvec_hnsw',
+            'products',
+            ['embedding'],
+            unique=False,
+            postgresql_using='hnsw',
+            postgresql_with={'m': 16, 'ef_construction': 64},
+            postgresql_ops={'embedding': 'halfvec_cosine_ops'},
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.execute("RESET maintenance_work_mem")
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_products_embedding_halfvec_hnsw',
+            table_name='products',
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
+    
+    op.execute(
+        "ALTER TABLE products ALTER COLUMN embedding TYPE vector(1536) "
+        "USING embedding::vector(1536)"
+    )
+    
+    with op.get_context().autocommit_block():
+        op.execute("SET maintenance_work_mem = '512MB'")
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_products_embedding_halfvec_hnsw "
+            "ON products USING hnsw ((embedding::halfvec(1536)) halfvec_cosine_ops) "
+            "WITH (m = 16, ef_construction = 64)"
+        )
+        op.execute("RESET maintenance_work_mem")
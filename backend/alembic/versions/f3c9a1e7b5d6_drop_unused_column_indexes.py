@@ -0,0 +1,48 @@
+"""drop_unused_column_indexes
+
+Revision ID: f3c9a1e7b5d6
+Revises: e6b1c3d8f4a2
+Create Date: 2025-12-11 09:17:33.584120
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3c9a1e7b5d6'
+down_revision = 'e6b1c3d8f4a2'
+branch_labels = None
+depends_on = None
+
+# No query filters or sorts on these columns; the indexes only cost writes and cache
+UNUSED_INDEXES = {
+    'ix_products_title': 'title',
+    'ix_products_product_type': 'product_type',
+    'ix_products_category': 'category',
+}
+
+
+def upgrade() -> None:
+    # DROP INDEX CONCURRENTLY cannot run inside a transaction block.
+    with op.get_context().autocommit_block():
+        for index_name in UNUSED_INDEXES:
+            op.drop_index(
+                index_name,
+                table_name='products',
+                postgresql_concurrently=True,
+                if_exists=True,
+            )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for index_name, column in UNUSED_INDEXES.items():
+            op.create_index(
+                index_name,
+                'products',
+                [column],
+                unique=False,
+                postgresql_concurrently=True,
+                if_not_exists=True,
+            )
@@ -0,0 +1,30 @@
+"""CLI dispatcher for one-shot operational tasks."""
+import argparse
+import sys
+from app.cli.migrate import migrate
+from app.utils.logger import setup_logging, get_logger
+
+logger = get_logger("cli")
+
+
+COMMANDS = {
+    "migrate": migrate,
+}
+
+
+def main(argv=None) -> int:
+    """Parse arguments and run the requested command."""
+    parser = argparse.ArgumentParser(prog="python -m app.cli")
+    parser.add_argument("command", choices=sorted(COMMANDS))
+    args = parser.parse_args(argv)
+    
+    setup_logging()
+    try:
+        return COMMANDS[args.command]()
+    except Exception as e:
+        logger.error(f"Command '{args.command}' failed: {e}", exc_info=True)
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
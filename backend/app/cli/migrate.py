@@ -0,0 +1,38 @@
+"""Schema migration command (``python -m app.cli migrate``)."""
+from app.utils.logger import get_logger
+
+logger = get_logger("cli.migrate")
+
+
+def migrate() -> int:
+    """
+    Upgrade the database schema to the latest Alembic revision.
+    
+    Skips the upgrade entirely when the database is already at head, so
+    running this on every deploy is a single cheap query in the common case.
+    
+    Returns:
+        Process exit code (non-zero if the schema isn't at head afterwards)
+    """
+    from app.config.database import get_schema_revisions, run_migrations
+    
+    current, head = get_schema_revisions()
+    if current == head:
+        logger.info(f"Database schema already at head ({head}); nothing to migrate")
+        return 0
+    
+    logger.info(f"Upgrading database schema from {current} to {head}")
+    try:
+        run_migrations()
+    except Exception as e:
+        logger.error(f"Database migration failed: {e}", exc_info=True)
+        return 1
+    
+    # Re-read the revision so a deploy only proceeds on a schema at head
+    current, head = get_schema_revisions()
+    if current != head:
+        logger.error(f"Database schema is at {current} after migrating, expected {head}")
+        return 1
+    
+    logger.info(f"Database schema upgraded to {head}")
+    return 0
@@ -1,29 +1,95 @@
 """Database configuration and session management."""
-from sqlalchemy import create_engine, text
+from sqlalchemy import create_engine, inspect, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from app.config.settings import settings
 from app.utils.logger import get_logger
 from alembic import command
 from alembic.config import Config
+from alembic.script import ScriptDirectory
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
+import asyncio
+import functools
 import os
+import uuid
 
 logger = get_logger("database")
 
+# Backend directory (holds alembic.ini and the alembic/ scripts)
+_BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+
 # Create database engine
 engine = create_engine(
-    settings.DATABASE_URL,
+    settings.database_url,
     pool_size=settings.DB_POOL_SIZE,
     max_overflow=settings.DB_MAX_OVERFLOW,
-    pool_pre_ping=True,  # Verify connections before using
+    # Pre-ping issues a SELECT 1 on every checkout; under PgBouncer transaction
+    # pooling that is an extra round-trip per request and leaves server backends
+    # "idle in transaction". Recycling connections on a short interval covers the
+    # stale-connection case instead, so pre-ping is opt-in.
+    # LIFO checkout keeps a small set of hot connections and lets the rest idle
+    # out (and be recycled) within PgBouncer's server_idle_timeout.
+    pool_pre_ping=settings.DB_POOL_PRE_PING,
+    pool_recycle=settings.DB_POOL_RECYCLE,
+    pool_timeout=settings.DB_POOL_TIMEOUT,
+    pool_use_lifo=True,
+    pool_reset_on_return="rollback",
 )
 
 # Create session factory
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+
+def _async_connect_args() -> dict:
+    """
+    asyncpg connect arguments for the async engine.
+    
+    asyncpg prepares every statement under a name and caches it per
+    connection. Under PgBouncer transaction pooling the next transaction may
+    run on another server connection, failing with "prepared statement ...
+    does not exist" or DuplicatePreparedStatementError, so unless
+    DB_PREPARED_STATEMENT_CACHE is set both caches are off and statements get
+    unique names.
+    """
+    if not settings.async_database_url.startswith("postgresql+asyncpg") or settings.DB_PREPARED_STATEMENT_CACHE:
+        return {}
+    return {
+        "statement_cache_size": 0,
+        "prepared_statement_cache_size": 0,
+        "prepared_statement_name_func": lambda: f"__asyncpg_{uuid.uuid4()}__",
+    }
+
+
+# Async engine (asyncpg) for request handlers and background jobs running on the
+# event loop. The sync engine above remains for Alembic and the RAG/embedding
+# code paths that have not been ported yet.
+async_engine = create_async_engine(
+    settings.async_database_url,
+    connect_args=_async_connect_args(),
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_pre_ping=settings.DB_POOL_PRE_PING,
+    pool_recycle=settings.DB_POOL_RECYCLE,
+    pool_timeout=settings.DB_POOL_TIMEOUT,
+    pool_use_lifo=True,
+    pool_reset_on_return="rollback",
+)
+
+# Async session factory
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+
 # Base class for models
 Base = declarative_base()
 
+# Dedicated executor for sync DB work awaited from async code. Sized to the sync
+# pool so callers queue on connections rather than on Starlette's shared threadpool.
+_db_executor = ThreadPoolExecutor(
+    max_workers=settings.DB_POOL_SIZE + settings.DB_MAX_OVERFLOW,
+    thread_name_prefix="db",
+)
+
 
 def get_db():
     """Dependency for getting database session."""
@@ -34,46 +100,147 @@ def get_db():
         db.close()
 
 
+async def get_async_db():
+    """Dependency for getting an async database session."""
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+async def run_db(fn, *args, **kwargs):
+    """
+    Run a blocking (sync session) DB call on the DB executor.
+    
+    Args:
+        fn: Callable doing sync database work
+        *args: Positional arguments for fn
+        **kwargs: Keyword arguments for fn
+        
+    Returns:
+        Whatever fn returns
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_db_executor, functools.partial(fn, *args, **kwargs))
+
+
+@functools.lru_cache()
+def _get_alembic_config() -> Config:
+    """Get the Alembic config pointing at our alembic.ini and database URL (built once)."""
+    alembic_cfg = Config(os.path.join(_BACKEND_DIR, "alembic.ini"))
+    
+    # Override sqlalchemy.url with our settings
+    alembic_cfg.attributes['sqlalchemy.url'] = settings.database_url
+    return alembic_cfg
+
+
+def _run_alembic(fn, revision: str) -> None:
+    """
+    Run an Alembic command (upgrade/stamp) on a connection from our pool.
+    
+    Args:
+        fn: Alembic command function taking (config, revision)
+        revision: Target revision
+    """
+    alembic_cfg = _get_alembic_config()
+    # Hand Alembic a connection from our pool instead of letting env.py open its own.
+    # Alembic manages the transaction itself (needed for autocommit_block).
+    with engine.connect() as connection:
+        alembic_cfg.attributes["connection"] = connection
+        try:
+            fn(alembic_cfg, revision)
+        finally:
+            # The config is shared; don't leave a closed connection on it
+            alembic_cfg.attributes.pop("connection", None)
+
+
+def run_migrations():
+    """
+    Enable extensions and upgrade the schema to the latest Alembic revision.
+    
+    Intended to run once per deployment (``python -m app.cli migrate``) rather
+    than in every app worker. If the upgrade fails on a database with none of
+    our tables yet, the schema is created from the models and stamped at head.
+    
+    Raises:
+        RuntimeError: If the upgrade fails on a database that already has tables
+    """
+    # Enable pgvector extension
+    try:
+        with engine.connect() as conn:
+            conn.execute(text("CREATE EXTENSION IF NOT EXISTS vector"))
+            conn.commit()
+        logger.info("PgVector extension enabled")
+    except Exception as e:
+        logger.warning(f"Could not enable pgvector extension (may already be enabled): {e}")
+    
+    # Import all models here to ensure they're registered
+    from app.models import product  # noqa: F401
+    
+    # A fresh database has none of the model tables
+    existing_tables = set(inspect(engine).get_table_names()) & set(Base.metadata.tables)
+    
+    # Run Alembic migrations to ensure schema is up to date
+    try:
+        logger.info("Running database migrations...")
+        _run_alembic(command.upgrade, "head")
+        logger.info("Database migrations completed successfully")
+    except Exception as e:
+        if existing_tables:
+            # create_all can't add missing columns to existing tables, so a
+            # stamp here could mark an outdated schema as current
+            raise RuntimeError(f"Migrations failed on an existing schema ({', '.join(sorted(existing_tables))}): {e}") from e
+        logger.warning(f"Could not run migrations on empty database, creating tables from models: {e}")
+        # The models declare every column and index the migrations add, so the
+        # result is the head schema; stamp it so verify_schema accepts it
+        Base.metadata.create_all(bind=engine)
+        _run_alembic(command.stamp, "head")
+        logger.info("Database tables created using create_all and stamped at head")
+
+
+def get_schema_revisions() -> Tuple[Optional[str], str]:
+    """
+    Get the database's current Alembic revision and the migration head.
+    
+    Returns:
+        Tuple of (current revision or None if unversioned, head revision)
+    """
+    head = ScriptDirectory.from_config(_get_alembic_config()).get_current_head()
+    try:
+        with engine.connect() as conn:
+            current = conn.execute(text("SELECT version_num FROM alembic_version")).scalar()
+    except Exception as e:
+        logger.warning(f"Could not read alembic_version: {e}")
+        current = None
+    return current, head
+
+
+def verify_schema():
+    """
+    Check that the database is at the latest Alembic revision.
+    
+    Raises:
+        RuntimeError: If the schema revision does not match the migration head
+    """
+    current, head = get_schema_revisions()
+    if current != head:
+        raise RuntimeError(
+            f"Database schema is at revision {current}, expected {head}. "
+            "Run `python -m app.cli migrate` before starting the app."
+        )
+    logger.info(f"Database schema is up to date (revision {current})")
+
+
 def init_db():
-    """Initialize database - enable extensions, run migrations, and create tables."""
+    """Initialize database - verify connectivity and schema (migrating first if enabled)."""
     try:
         # Test database connection
         with engine.connect() as conn:
             conn.execute(text("SELECT 1"))
         logger.info("Database connection successful")
         
-        # Enable pgvector extension
-        try:
-            with engine.connect() as conn:
-                conn.execute(text("CREATE EXTENSION IF NOT EXISTS vector"))
-                conn.commit()
-            logger.info("PgVector extension enabled")
-        except Exception as e:
-            logger.warning(f"Could not enable pgvector extension (may already be enabled): {e}")
-        
-        # Import all models here to ensure they're registered
-        from app.models import product  # noqa: F401
-        
-        # Run Alembic migrations to ensure schema is up to date
-        try:
-            # Get the path to alembic.ini (should be in the backend directory)
-            backend_dir = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
-            alembic_cfg = Config(os.path.join(backend_dir, "alembic.ini"))
-            
-            # Override sqlalchemy.url with our settings
-            alembic_cfg.attributes['sqlalchemy.url'] = settings.DATABASE_URL
-            
-            logger.info("Running database migrations...")
-            command.upgrade(alembic_cfg, "head")
-            logger.info("Database migrations completed successfully")
-        except Exception as e:
-            logger.warning(f"Could not run migrations (tables may already exist): {e}")
-            # Fall back to create_all if migrations fail
-            # This handles the case where alembic_version table doesn't exist yet
-            Base.metadata.create_all(bind=engine)
-            logger.info("Database tables created/verified using create_all")
+        if settings.RUN_MIGRATIONS_ON_STARTUP:
+            run_migrations()
+        verify_schema()
         
     except Exception as e:
         logger.error(f"Failed to initialize database: {e}")
         raise
-
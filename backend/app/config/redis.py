@@ -1,43 +1,42 @@
 """Redis configuration and connection management."""
-from redis import Redis
+from redis.asyncio import Redis, BlockingConnectionPool
 from typing import Optional
 from app.config.settings import settings
 from app.utils.logger import get_logger
 
 logger = get_logger("redis")
 
-# Global Redis connection
-_redis_client: Optional[Redis] = None
+# Global connection pool (created lazily so it binds to the running event loop)
+_pool: Optional[BlockingConnectionPool] = None
 
 
 def get_redis_client() -> Redis:
-    """Get synchronous Redis client."""
-    global _redis_client
-    if _redis_client is None:
-        try:
-            _redis_client = Redis.from_url(
-                settings.REDIS_URL,
-                decode_responses=settings.REDIS_DECODE_RESPONSES,
-                socket_connect_timeout=5,
-                socket_timeout=5,
-            )
-            # Test connection
-            _redis_client.ping()
-            logger.info(f"Redis connection established: {settings.REDIS_HOST}:{settings.REDIS_PORT}")
-        except Exception as e:
-            logger.error(f"Failed to connect to Redis: {e}")
-            raise
-    return _redis_client
+    """Get async Redis client backed by the shared connection pool."""
+    global _pool
+    if _pool is None:
+        _pool = BlockingConnectionPool.from_url(
+            settings.redis_url,
+            max_connections=settings.REDIS_POOL_SIZE,
+            timeout=5,
+            socket_connect_timeout=5,
+            socket_timeout=5,
+            socket_keepalive=True,
+            # Probe idle connections before reuse and retry timed-out commands once
+            health_check_interval=30,
+            retry_on_timeout=True,
+            decode_responses=settings.REDIS_DECODE_RESPONSES,
+        )
+        logger.info(f"Redis connection pool created: {settings.REDIS_HOST}:{settings.REDIS_PORT}")
+    return Redis(connection_pool=_pool)
 
 
 async def close_redis():
     """Close Redis connections."""
-    global _redis_client
-    if _redis_client:
+    global _pool
+    if _pool:
         try:
-            _redis_client.close()
-            _redis_client = None
+            await _pool.disconnect(inuse_connections=True)
+            _pool = None
             logger.info("Redis connection closed")
         except Exception as e:
             logger.error(f"Error closing Redis connection: {e}", exc_info=True)
-
@@ -13,6 +13,9 @@ HEALTH_STATUS_UNHEALTHY = "unhealthy"
 MEMORY_THRESHOLD_PERCENT = 90
 DISK_THRESHOLD_PERCENT = 90
 
+# Seconds a detailed health response is reused (absorbs probe bursts across replicas)
+HEALTH_CACHE_TTL_SECONDS = 2
+
 # Status Messages
 STATUS_ALIVE = "alive"
 STATUS_READY = "ready"
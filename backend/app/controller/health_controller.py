@@ -1,9 +1,12 @@
 """Health controller for handling health check requests."""
-from datetime import datetime
 from app.services.health_service import HealthService
 from app.schemas.health import HealthResponse
 from app.constants import STATUS_ALIVE, STATUS_READY
 
+# Static probe responses, built once
+_LIVENESS_RESPONSE = HealthResponse(status=STATUS_ALIVE)
+_READINESS_RESPONSE = HealthResponse(status=STATUS_READY)
+
 
 class HealthController:
     """Controller for health check endpoints."""
@@ -14,13 +17,13 @@ class HealthController:
     
     async def get_health(self) -> HealthResponse:
         """Get detailed health check information."""
-        return self.health_service.get_health_response()
+        return await self.health_service.get_health_response()
     
     async def get_liveness(self) -> HealthResponse:
         """Get liveness probe response."""
-        return HealthResponse(status=STATUS_ALIVE)
+        return _LIVENESS_RESPONSE
     
     async def get_readiness(self) -> HealthResponse:
         """Get readiness probe response."""
-        return HealthResponse(status=STATUS_READY)
+        return _READINESS_RESPONSE
 
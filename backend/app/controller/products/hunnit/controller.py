@@ -1,6 +1,8 @@
 """Hunnit product controller for handling product scraping requests."""
+import asyncio
 from typing import List, Optional
-from sqlalchemy.orm import Session
+from pydantic import TypeAdapter
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.services.products.hunnit.service import HunnitScraperService
 from app.services.products.hunnit.db_service import HunnitProductDBService
 from app.services.products.hunnit.redis_service import HunnitProductRedisService
@@ -9,71 +11,144 @@ from app.utils.logger import get_logger
 
 logger = get_logger("hunnit_controller")
 
+# Validates a whole list of ORM rows in one call instead of one model_validate per row
+_DB_PRODUCT_LIST = TypeAdapter(List[DBProduct])
+
 
 class HunnitController:
     """Controller for Hunnit product scraping endpoints."""
     
-    def __init__(self, db: Optional[Session] = None):
+    def __init__(self, db: Optional[AsyncSession] = None):
         """Initialize Hunnit controller with service."""
         self.scraper_service = HunnitScraperService()
         self.db = db
+        self._db_service = HunnitProductDBService(db) if db else None
         self.redis_service = HunnitProductRedisService()
     
+    def _get_db_service(self) -> HunnitProductDBService:
+        """Get the database service, raising if no session was provided."""
+        if not self._db_service:
+            raise ValueError("Database session not available")
+        return self._db_service
+    
     async def scrape_all_products(self, save_to_db: bool = True, save_to_redis: bool = True) -> ScrapeResponse:
         """
         Scrape all products from Hunnit.com.
         Specifically scrapes from https://hunnit.com/products.json
         
-        Flow: Scrape -> Save to Redis -> Save to DB
+        Flow: Scrape page -> Save to Redis and DB (concurrently, while the next page is fetched)
         
         Args:
             save_to_db: Whether to save scraped products to the database
             save_to_redis: Whether to save scraped products to Redis cache
             
         Returns:
-            ScrapeResponse with all scraped Hunnit products
+            ScrapeResponse with the scrape outcome and product count
         """
         logger.info("Starting product scraping from Hunnit.com")
+        save_to_db = save_to_db and self._db_service is not None
+        total = 0
+        # Redis snapshot for this scrape; published only if every chunk was cached
+        staging_key = self.redis_service.new_staging_key() if save_to_redis else None
+        redis_ok = True
+        published = False
+        # Products in chunks whose database save failed
+        db_failed = 0
+        chunks = self.scraper_service.fetch_products_chunked()
+        next_chunk = asyncio.ensure_future(chunks.__anext__())
         try:
-            products = await self.scraper_service.fetch_products()
-            logger.info(f"Successfully scraped {len(products)} products")
-            
-            # Step 1: Save to Redis first (cache)
-            if save_to_redis:
+            # Save each page to Redis (cache) and database (persistent storage)
+            # concurrently while the next page is fetched, so at most two pages
+            # are in memory
+            while True:
                 try:
-                    redis_saved = self.redis_service.save_products(products)
-                    if redis_saved:
-                        logger.info(f"Cached {len(products)} products in Redis")
-                    else:
-                        logger.warning("Failed to save products to Redis, continuing...")
-                except Exception as e:
-                    logger.error(f"Failed to save products to Redis: {e}", exc_info=True)
-                    # Continue even if Redis save fails
+                    chunk = await next_chunk
+                except StopAsyncIteration:
+                    break
+                next_chunk = asyncio.ensure_future(chunks.__anext__())
+                
+                save_tasks = []
+                # Later chunks are skipped once one failed; the snapshot is discarded
+                cache_chunk = save_to_redis and redis_ok
+                if cache_chunk:
+                    save_tasks.append(self._save_products_to_redis(chunk, staging_key, first_chunk=total == 0))
+                if save_to_db:
+                    save_tasks.append(self._save_products_to_db(chunk))
+                if save_tasks:
+                    results = await asyncio.gather(*save_tasks)
+                    if cache_chunk:
+                        redis_ok = results[0]
+                    if save_to_db and not results[-1]:
+                        db_failed += len(chunk)
+                total += len(chunk)
             
-            # Step 2: Save to database (persistent storage)
-            if save_to_db and self.db:
-                try:
-                    db_service = HunnitProductDBService(self.db)
-                    created, updated = db_service.save_products(products)
-                    logger.info(f"Saved {len(products)} products to database: {created} created, {updated} updated")
-                except Exception as e:
-                    logger.error(f"Failed to save products to database: {e}", exc_info=True)
-                    # Continue even if DB save fails
+            logger.info(f"Successfully scraped {total} products")
+            if save_to_redis and total:
+                if redis_ok and await self.redis_service.finalize_products(total, staging_key):
+                    published = True
+                    logger.info(f"Cached {total} products in Redis")
+                else:
+                    logger.warning("Failed to save products to Redis, keeping the previous snapshot")
             
+            if db_failed:
+                return ScrapeResponse(
+                    success=False,
+                    message=f"Scraped {total} Hunnit products, but {db_failed} could not be saved to the database",
+                    count=total,
+                )
             return ScrapeResponse(
                 success=True,
-                message=f"Successfully scraped {len(products)} Hunnit products from hunnit.com",
-                count=len(products),
-                products=products
+                message=f"Successfully scraped {total} Hunnit products from hunnit.com",
+                count=total,
             )
         except Exception as e:
             logger.error(f"Failed to scrape Hunnit products: {e}", exc_info=True)
             return ScrapeResponse(
                 success=False,
                 message=f"Failed to scrape Hunnit products: {str(e)}",
-                count=0,
-                products=None
+                count=total,
             )
+        finally:
+            # Stop any in-flight prefetch if we bailed out early
+            if not next_chunk.done():
+                next_chunk.cancel()
+                await asyncio.gather(next_chunk, return_exceptions=True)
+            await chunks.aclose()
+            # Drop a snapshot that wasn't published (failed chunk or scrape error)
+            if staging_key and not published:
+                await self.redis_service.discard_staging(staging_key)
+    
+    async def _save_products_to_redis(self, products: List[Product], staging_key: str, first_chunk: bool) -> bool:
+        """
+        Cache a chunk of scraped products in Redis, logging (not raising) on failure.
+        
+        Returns:
+            True if the chunk was cached
+        """
+        try:
+            if await self.redis_service.save_products_chunk(products, staging_key, first_chunk=first_chunk):
+                return True
+            logger.warning("Failed to save products to Redis, continuing...")
+        except Exception as e:
+            logger.error(f"Failed to save products to Redis: {e}", exc_info=True)
+            # Continue even if Redis save fails
+        return False
+    
+    async def _save_products_to_db(self, products: List[Product]) -> bool:
+        """
+        Persist scraped products to the database, logging (not raising) on failure.
+        
+        Returns:
+            True if the chunk was saved
+        """
+        try:
+            created, updated = await self._db_service.save_products(products)
+            logger.info(f"Saved {len(products)} products to database: {created} created, {updated} updated")
+            return True
+        except Exception as e:
+            logger.error(f"Failed to save products to database: {e}", exc_info=True)
+            # Continue even if DB save fails
+            return False
     
     async def get_product_by_id(self, product_id: int) -> Optional[Product]:
         """
@@ -120,20 +195,16 @@ class HunnitController:
         except Exception:
             return []
     
-    def get_all_products_from_db(self) -> List:
+    async def get_all_products_from_db(self) -> List:
         """
         Get all products from the database.
         
         Returns:
             List of Product models from database
         """
-        if not self.db:
-            raise ValueError("Database session not available")
-        
-        db_service = HunnitProductDBService(self.db)
-        return db_service.get_all_products()
+        return await self._get_db_service().get_all_products()
     
-    def get_product_from_db_by_external_id(self, external_id: str):
+    async def get_product_from_db_by_external_id(self, external_id: str):
         """
         Get a product from database by external ID.
         
@@ -143,13 +214,9 @@ class HunnitController:
         Returns:
             Product model if found, None otherwise
         """
-        if not self.db:
-            raise ValueError("Database session not available")
-        
-        db_service = HunnitProductDBService(self.db)
-        return db_service.get_product_by_external_id(external_id)
+        return await self._get_db_service().get_product_by_external_id(external_id)
     
-    def get_product_from_db_by_id(self, product_id: str):
+    async def get_product_from_db_by_id(self, product_id: str):
         """
         Get a product from database by UUID.
         
@@ -159,13 +226,21 @@ class HunnitController:
         Returns:
             Product model if found, None otherwise
         """
-        if not self.db:
-            raise ValueError("Database session not available")
+        return await self._get_db_service().get_product_by_id(product_id)
+    
+    async def get_product_from_db_by_any_id(self, product_id: str):
+        """
+        Get a product from database by UUID or external ID.
         
-        db_service = HunnitProductDBService(self.db)
-        return db_service.get_product_by_id(product_id)
+        Args:
+            product_id: The database UUID or external ID from Hunnit.com
+            
+        Returns:
+            Product model if found, None otherwise
+        """
+        return await self._get_db_service().get_product_by_any_id(product_id)
     
-    def get_products_from_db_by_tag(self, tag: str) -> List:
+    async def get_products_from_db_by_tag(self, tag: str) -> List:
         """
         Get products from database filtered by tag.
         
@@ -175,13 +250,9 @@ class HunnitController:
         Returns:
             List of Product models matching the tag
         """
-        if not self.db:
-            raise ValueError("Database session not available")
-        
-        db_service = HunnitProductDBService(self.db)
-        return db_service.get_products_by_tag(tag)
+        return await self._get_db_service().get_products_by_tag(tag)
     
-    def get_products_from_db_by_vendor(self, vendor: str) -> List:
+    async def get_products_from_db_by_vendor(self, vendor: str) -> List:
         """
         Get products from database filtered by vendor.
         
@@ -191,26 +262,18 @@ class HunnitController:
         Returns:
             List of Product models from the specified vendor
         """
-        if not self.db:
-            raise ValueError("Database session not available")
-        
-        db_service = HunnitProductDBService(self.db)
-        return db_service.get_products_by_vendor(vendor)
+        return await self._get_db_service().get_products_by_vendor(vendor)
     
-    def get_product_count_from_db(self) -> int:
+    async def get_product_count_from_db(self) -> int:
         """
         Get total number of products in the database.
         
         Returns:
             Total count of products
         """
-        if not self.db:
-            raise ValueError("Database session not available")
-        
-        db_service = HunnitProductDBService(self.db)
-        return db_service.get_product_count()
+        return await self._get_db_service().get_product_count()
     
-    def get_similar_products(
+    async def get_similar_products(
         self,
         product_id: str,
         limit: int = 4,
@@ -234,49 +297,29 @@ class HunnitController:
             from app.rag.vector_search import VectorSearchService
             
             # Get the product
-            product = self.get_product_from_db_by_id(product_id)
-            if not product:
-                product = self.get_product_from_db_by_external_id(product_id)
+            product = await self.get_product_from_db_by_any_id(product_id)
             
             if not product or product.embedding is None:
                 return []
             
-            # Convert pgvector Vector to list
-            import numpy as np
-            if hasattr(product.embedding, 'tolist'):
-                embedding_list = product.embedding.tolist()
-            elif isinstance(product.embedding, (list, tuple)):
-                embedding_list = list(product.embedding)
-            else:
-                # Try to convert numpy array
-                embedding_array = np.array(product.embedding)
-                embedding_list = embedding_array.tolist()
-            
-            if not embedding_list or len(embedding_list) == 0:
-                return []
-            
-            # Use vector search to find similar products
-            vector_search = VectorSearchService(self.db)
-            similar_results = vector_search.search_similar_products(
-                query_embedding=embedding_list,
-                limit=limit + 1,  # +1 to exclude the product itself
-                similarity_threshold=similarity_threshold
+            # Use vector search to find similar products (sync service, run on the
+            # async session's connection); the seed product is excluded in SQL
+            similar_results = await self.db.run_sync(
+                lambda session: VectorSearchService(session).search_similar_products(
+                    query_embedding=product.embedding.to_list(),
+                    limit=limit,
+                    similarity_threshold=similarity_threshold,
+                    exclude_ids=[product.id]
+                )
             )
-            
-            # Filter out the product itself
-            similar_products = []
-            for similar_product, score in similar_results:
-                if str(similar_product.id) != product_id and str(similar_product.external_id) != product_id:
-                    similar_products.append(similar_product)
-                    if len(similar_products) >= limit:
-                        break
+            similar_products = [similar_product for similar_product, _ in similar_results]
             
             return similar_products
         except Exception as e:
             logger.error(f"Error getting similar products: {e}", exc_info=True)
             return []
     
-    def get_cache_status(self) -> dict:
+    async def get_cache_status(self) -> dict:
         """
         Get Redis cache status and metadata.
         
@@ -284,8 +327,8 @@ class HunnitController:
             Dictionary with cache status information
         """
         try:
-            count = self.redis_service.get_products_count()
-            timestamp_info = self.redis_service.get_scrape_timestamp()
+            count = await self.redis_service.get_products_count()
+            timestamp_info = await self.redis_service.get_scrape_timestamp()
             
             return {
                 "cache_available": True,
@@ -311,18 +354,22 @@ class HunnitController:
         Returns:
             DBProduct schema
         """
-        return DBProduct(
-            id=str(scraped_product.id),
-            external_id=str(scraped_product.id),
+        # Fields come from an already-validated Product, so skip re-validation
+        product_id = str(scraped_product.id)
+        body_html = scraped_product.body_html
+        images = scraped_product.images
+        return DBProduct.model_construct(
+            id=product_id,
+            external_id=product_id,
             title=scraped_product.title,
             handle=scraped_product.handle,
-            description=scraped_product.body_html[:500] if scraped_product.body_html else None,
-            body_html=scraped_product.body_html,
+            description=body_html[:500] if body_html else None,
+            body_html=body_html,
             vendor=scraped_product.vendor,
             product_type=scraped_product.product_type,
             category=scraped_product.product_type,
             tags=scraped_product.tags,
-            image_urls=[str(img.src) for img in scraped_product.images] if scraped_product.images else None,
+            image_urls=[str(img.src) for img in images] if images else None,
         )
     
     async def get_all_products_as_db_products(self, from_db: bool = True) -> List[DBProduct]:
@@ -336,14 +383,19 @@ class HunnitController:
             List of DBProduct schemas
         """
         if from_db:
-            db_products = self.get_all_products_from_db()
-            return [DBProduct.model_validate(product) for product in db_products]
+            # Convert batch by batch so the full ORM result is never held at once
+            products = []
+            async for batch in self._get_db_service().iter_all_products():
+                products.extend(_DB_PRODUCT_LIST.validate_python(batch, from_attributes=True))
+            return products
         else:
             # Scrape from Hunnit.com (legacy behavior)
-            response = await self.scrape_all_products(save_to_db=False)
-            if not response.success or response.products is None:
+            try:
+                products = await self.scraper_service.fetch_products()
+            except Exception as e:
+                logger.error(f"Failed to scrape Hunnit products: {e}", exc_info=True)
                 return []
-            return [self._convert_scraped_product_to_db_product(p) for p in response.products]
+            return [self._convert_scraped_product_to_db_product(p) for p in products]
     
     async def get_product_as_db_product(
         self,
@@ -361,13 +413,8 @@ class HunnitController:
             DBProduct schema if found, None otherwise
         """
         if from_db:
-            # Try to get from database by UUID first
-            product = self.get_product_from_db_by_id(product_id)
-            if product:
-                return DBProduct.model_validate(product)
-            
-            # Try by external_id
-            product = self.get_product_from_db_by_external_id(product_id)
+            # Look up by UUID or external_id in one query
+            product = await self.get_product_from_db_by_any_id(product_id)
             if product:
                 return DBProduct.model_validate(product)
             
@@ -399,8 +446,8 @@ class HunnitController:
             List of DBProduct schemas matching the tag
         """
         if from_db:
-            db_products = self.get_products_from_db_by_tag(tag)
-            return [DBProduct.model_validate(product) for product in db_products]
+            db_products = await self.get_products_from_db_by_tag(tag)
+            return _DB_PRODUCT_LIST.validate_python(db_products, from_attributes=True)
         else:
             products = await self.get_products_by_tag(tag)
             return [self._convert_scraped_product_to_db_product(p) for p in products]
@@ -421,13 +468,13 @@ class HunnitController:
             List of DBProduct schemas from the specified vendor
         """
         if from_db:
-            db_products = self.get_products_from_db_by_vendor(vendor)
-            return [DBProduct.model_validate(product) for product in db_products]
+            db_products = await self.get_products_from_db_by_vendor(vendor)
+            return _DB_PRODUCT_LIST.validate_python(db_products, from_attributes=True)
         else:
             products = await self.get_products_by_vendor(vendor)
             return [self._convert_scraped_product_to_db_product(p) for p in products]
     
-    def get_similar_products_as_db_products(
+    async def get_similar_products_as_db_products(
         self,
         product_id: str,
         limit: int = 4
@@ -442,6 +489,6 @@ class HunnitController:
         Returns:
             List of similar DBProduct schemas
         """
-        similar_products = self.get_similar_products(product_id, limit=limit)
-        return [DBProduct.model_validate(product) for product in similar_products]
+        similar_products = await self.get_similar_products(product_id, limit=limit)
+        return _DB_PRODUCT_LIST.validate_python(similar_products, from_attributes=True)
 
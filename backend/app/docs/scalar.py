@@ -1,6 +1,6 @@
 """Scalar API documentation generator."""
 from fastapi.responses import HTMLResponse
-import json
+import orjson
 from app.config.settings import settings
 
 
@@ -18,6 +18,11 @@ def get_scalar_html(
     Returns:
         HTMLResponse with Scalar documentation
     """
+    return HTMLResponse(content=_render_scalar_html(openapi_schema, title))
+
+
+def _render_scalar_html(openapi_schema: dict, title: str) -> bytes:
+    """Render the Scalar documentation page as UTF-8 bytes."""
     config = {
         "theme": settings.SCALAR_THEME,
         "layout": settings.SCALAR_LAYOUT,
@@ -43,11 +48,11 @@ def get_scalar_html(
     <body>
         <script
             id="api-reference"
-            data-configuration='{json.dumps(config)}'
-        >{json.dumps(openapi_schema)}</script>
+            data-configuration='{orjson.dumps(config).decode()}'
+        >{orjson.dumps(openapi_schema).decode()}</script>
         <script src="https://cdn.jsdelivr.net/npm/@scalar/api-reference@latest/dist/browser/standalone.js"></script>
     </body>
     </html>
     """
-    return HTMLResponse(content=html_content)
+    return html_content.encode()
 
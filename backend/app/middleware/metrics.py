@@ -1,5 +1,6 @@
 """Performance metrics middleware for request timing and monitoring."""
 import time
+from collections import Counter, defaultdict
 from typing import Dict, Any
 from fastapi import Request
 from starlette.middleware.base import BaseHTTPMiddleware
@@ -7,14 +8,25 @@ from app.utils.logger import get_logger
 
 logger = get_logger("metrics_middleware")
 
+# Cap on distinct endpoint buckets; further unmatched paths share one bucket
+MAX_TRACKED_ENDPOINTS = 500
+OTHER_ENDPOINT = "<other>"
+
+
+def _new_metrics() -> Dict[str, Any]:
+    """Create empty metrics storage."""
+    return {
+        "request_count": 0,
+        "total_response_time": 0.0,
+        # endpoint -> [count, total_time]; averages are computed in get_metrics()
+        "endpoint_times": defaultdict(lambda: [0, 0.0]),
+        "status_codes": Counter(),
+        "errors": 0,
+    }
+
+
 # In-memory metrics storage (in production, use Redis or a proper metrics system)
-_metrics: Dict[str, Any] = {
-    "request_count": 0,
-    "total_response_time": 0.0,
-    "endpoint_times": {},
-    "status_codes": {},
-    "errors": 0,
-}
+_metrics: Dict[str, Any] = _new_metrics()
 
 
 class MetricsMiddleware(BaseHTTPMiddleware):
@@ -22,35 +34,24 @@ class MetricsMiddleware(BaseHTTPMiddleware):
     
     async def dispatch(self, request: Request, call_next):
         """Track request metrics."""
-        start_time = time.time()
+        start_time = time.perf_counter()
         _metrics["request_count"] += 1
         
-        # Track endpoint
-        endpoint = request.url.path
-        if endpoint not in _metrics["endpoint_times"]:
-            _metrics["endpoint_times"][endpoint] = {
-                "count": 0,
-                "total_time": 0.0,
-                "avg_time": 0.0,
-            }
-        
         try:
             response = await call_next(request)
             
             # Calculate response time
-            response_time = time.time() - start_time
+            response_time = time.perf_counter() - start_time
             _metrics["total_response_time"] += response_time
             
-            # Track endpoint metrics
-            endpoint_metrics = _metrics["endpoint_times"][endpoint]
-            endpoint_metrics["count"] += 1
-            endpoint_metrics["total_time"] += response_time
-            endpoint_metrics["avg_time"] = endpoint_metrics["total_time"] / endpoint_metrics["count"]
+            # Track endpoint metrics per route template (/products/{id}, not each ID)
+            slot = _metrics["endpoint_times"][_endpoint_key(request)]
+            slot[0] += 1
+            slot[1] += response_time
             
             # Track status codes
             status_code = response.status_code
-            status_group = f"{status_code // 100}xx"
-            _metrics["status_codes"][status_group] = _metrics["status_codes"].get(status_group, 0) + 1
+            _metrics["status_codes"][f"{status_code // 100}xx"] += 1
             
             # Track errors
             if status_code >= 400:
@@ -67,6 +68,18 @@ class MetricsMiddleware(BaseHTTPMiddleware):
             raise
 
 
+def _endpoint_key(request: Request) -> str:
+    """Get the metrics bucket for a request: its route template when one matched."""
+    route = request.scope.get("route")
+    if route is not None:
+        return route.path
+    path = request.url.path
+    endpoint_times = _metrics["endpoint_times"]
+    if path in endpoint_times or len(endpoint_times) < MAX_TRACKED_ENDPOINTS:
+        return path
+    return OTHER_ENDPOINT
+
+
 def get_metrics() -> Dict[str, Any]:
     """Get current metrics."""
     request_count = _metrics["request_count"]
@@ -79,7 +92,7 @@ def get_metrics() -> Dict[str, Any]:
     # Get top endpoints by request count
     top_endpoints = sorted(
         _metrics["endpoint_times"].items(),
-        key=lambda x: x[1]["count"],
+        key=lambda x: x[1][0],
         reverse=True
     )[:10]
     
@@ -87,15 +100,15 @@ def get_metrics() -> Dict[str, Any]:
         "total_requests": request_count,
         "total_errors": _metrics["errors"],
         "average_response_time_seconds": round(avg_response_time, 4),
-        "status_codes": _metrics["status_codes"],
+        "status_codes": dict(_metrics["status_codes"]),
         "top_endpoints": [
             {
                 "endpoint": endpoint,
-                "count": metrics["count"],
-                "avg_time_seconds": round(metrics["avg_time"], 4),
-                "total_time_seconds": round(metrics["total_time"], 2),
+                "count": count,
+                "avg_time_seconds": round(total_time / count, 4) if count else 0.0,
+                "total_time_seconds": round(total_time, 2),
             }
-            for endpoint, metrics in top_endpoints
+            for endpoint, (count, total_time) in top_endpoints
         ],
     }
 
@@ -103,11 +116,4 @@ def get_metrics() -> Dict[str, Any]:
 def reset_metrics():
     """Reset metrics (useful for testing)."""
     global _metrics
-    _metrics = {
-        "request_count": 0,
-        "total_response_time": 0.0,
-        "endpoint_times": {},
-        "status_codes": {},
-        "errors": 0,
-    }
-
+    _metrics = _new_metrics()
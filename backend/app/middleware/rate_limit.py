@@ -1,15 +1,54 @@
 """Rate limiting middleware for API endpoints."""
+from functools import lru_cache
 from slowapi import Limiter, _rate_limit_exceeded_handler
 from slowapi.util import get_remote_address
 from slowapi.errors import RateLimitExceeded
 from fastapi import Request
 from fastapi.responses import JSONResponse
+from app.config.settings import settings
 from app.utils.logger import get_logger
 
 logger = get_logger("rate_limit_middleware")
 
+# Socket timeouts (seconds) for the limiter's Redis client. limits' client is
+# synchronous and runs on the event loop, so a slow or unreachable Redis must
+# fail fast rather than stall every request on the worker.
+RATE_LIMIT_REDIS_TIMEOUT_SECONDS = 0.5
+
+
+def create_limiter(storage_uri: str) -> Limiter:
+    """
+    Create a rate limiter storing its counters at storage_uri.
+    
+    Counters live in Redis so limits hold across all workers (one atomic
+    INCR + EXPIRE per hit). If Redis is unreachable slowapi falls back to
+    per-process memory until it recovers, and any other limiter failure is
+    logged rather than failing the request.
+    
+    Args:
+        storage_uri: limits storage URI (redis://..., memory://)
+    
+    Returns:
+        Configured Limiter
+    """
+    storage_options = {}
+    if storage_uri.startswith(("redis://", "rediss://")):
+        storage_options = {
+            "socket_timeout": RATE_LIMIT_REDIS_TIMEOUT_SECONDS,
+            "socket_connect_timeout": RATE_LIMIT_REDIS_TIMEOUT_SECONDS,
+        }
+    return Limiter(
+        key_func=get_remote_address,
+        storage_uri=storage_uri,
+        storage_options=storage_options,
+        strategy="fixed-window",
+        in_memory_fallback_enabled=True,
+        swallow_errors=True,
+    )
+
+
 # Initialize rate limiter
-limiter = Limiter(key_func=get_remote_address)
+limiter = create_limiter(settings.RATE_LIMIT_STORAGE_URI or settings.redis_url)
 
 # Rate limit configurations for different endpoints
 RATE_LIMITS = {
@@ -20,8 +59,9 @@ RATE_LIMITS = {
 }
 
 
+@lru_cache(maxsize=1024)
 def get_rate_limit_for_path(path: str) -> str:
-    """Get appropriate rate limit for a given path."""
+    """Get appropriate rate limit for a given path (memoized per path)."""
     if "/chat" in path:
         return RATE_LIMITS["chat"]
     elif "/scrape" in path:
@@ -32,17 +72,23 @@ def get_rate_limit_for_path(path: str) -> str:
 
 
 def rate_limit_exceeded_handler(request: Request, exc: RateLimitExceeded):
-    """Custom handler for rate limit exceeded errors."""
+    """
+    Custom handler for rate limit exceeded errors.
+    
+    Retry-After is the limit's window length: with fixed windows the counter
+    resets within that many seconds.
+    """
     logger.warning(
         f"Rate limit exceeded for {get_remote_address(request)} on {request.url.path}"
     )
+    retry_after = exc.limit.limit.get_expiry()
     return JSONResponse(
         status_code=429,
         content={
-            "detail": "Rate limit exceeded. Please try again later.",
-            "retry_after": exc.retry_after,
+            "detail": f"Rate limit exceeded ({exc.detail}). Please try again later.",
+            "retry_after": retry_after,
             "request_id": getattr(request.state, "request_id", None),
         },
-        headers={"Retry-After": str(exc.retry_after)},
+        headers={"Retry-After": str(retry_after)},
     )
 
@@ -1,10 +1,9 @@
 """Validation middleware for request validation and sanitization."""
-import asyncio
 from fastapi import Request, HTTPException
 from fastapi.responses import JSONResponse
 from starlette.middleware.base import BaseHTTPMiddleware
 from app.utils.logger import get_logger
-from app.services.email_service import send_request_error_notification
+from app.services.email_service import queue_request_error_notification
 
 logger = get_logger("validation_middleware")
 
@@ -12,8 +11,8 @@ logger = get_logger("validation_middleware")
 class RequestValidationMiddleware(BaseHTTPMiddleware):
     """Middleware for request validation and rate limiting preparation."""
     
-    # Paths that should skip validation
-    SKIP_PATHS = ["/api/health", "/api/docs", "/docs", "/openapi.json"]
+    # Paths that should skip validation (a tuple so str.startswith checks them in one call)
+    SKIP_PATHS = ("/api/health", "/api/docs", "/docs", "/openapi.json")
     
     # Maximum request body size (10MB)
     MAX_BODY_SIZE = 10 * 1024 * 1024
@@ -22,7 +21,7 @@ class RequestValidationMiddleware(BaseHTTPMiddleware):
         """Process request through validation middleware."""
         
         # Skip validation for health checks and docs
-        if any(request.url.path.startswith(path) for path in self.SKIP_PATHS):
+        if request.url.path.startswith(self.SKIP_PATHS):
             return await call_next(request)
             
         # Add request ID for tracing (if not present)
@@ -45,14 +44,14 @@ class RequestValidationMiddleware(BaseHTTPMiddleware):
         except Exception as e:
             # Log unexpected errors
             logger.error(f"Unexpected error in middleware: {e}", exc_info=True)
-            # Send email notification in background
-            asyncio.create_task(send_request_error_notification(
+            # Queue email notification for the background worker
+            queue_request_error_notification(
                 error=e,
                 path=request.url.path,
                 method=request.method,
                 request_id=getattr(request.state, "request_id", None),
                 client_host=request.client.host if request.client else None
-            ))
+            )
             raise
 
 
@@ -73,14 +72,14 @@ class ErrorHandlingMiddleware(BaseHTTPMiddleware):
                 extra={"path": request.url.path, "method": request.method}
             )
             
-            # Send email notification in background
-            asyncio.create_task(send_request_error_notification(
+            # Queue email notification for the background worker
+            queue_request_error_notification(
                 error=e,
                 path=request.url.path,
                 method=request.method,
                 request_id=getattr(request.state, "request_id", None),
                 client_host=request.client.host if request.client else None
-            ))
+            )
             
             return JSONResponse(
                 status_code=500,
@@ -1,11 +1,14 @@
 """Product database models."""
-from sqlalchemy import Column, Integer, String, Text, Float, ARRAY, DateTime, JSON, TypeDecorator
+from sqlalchemy import Column, Integer, String, Text, Float, ARRAY, DateTime, JSON, TypeDecorator, Index
 from sqlalchemy.dialects.postgresql import UUID as PostgresUUID, ARRAY as PostgresARRAY
 from sqlalchemy.sql import func
-from pgvector.sqlalchemy import Vector
+from pgvector.sqlalchemy import HALFVEC
 from app.config.database import Base
 import uuid
-import json
+import orjson
+
+# Embedding width (stored as halfvec, float16, to halve heap and index size)
+EMBEDDING_DIMENSION = 1536
 
 
 class GUID(TypeDecorator):
@@ -59,7 +62,8 @@ class ArrayType(TypeDecorator):
         if dialect.name == 'postgresql':
             return dialect.type_descriptor(PostgresARRAY(self.item_type))
         else:
-            return dialect.type_descriptor(JSON())
+            # None binds as SQL NULL (not JSON 'null') so upsert COALESCEs see it
+            return dialect.type_descriptor(JSON(none_as_null=True))
     
     def process_bind_param(self, value, dialect):
         if value is None:
@@ -69,7 +73,7 @@ class ArrayType(TypeDecorator):
         else:
             # Convert list to JSON string for SQLite
             if isinstance(value, list):
-                return json.dumps(value)
+                return orjson.dumps(value).decode()
             return value
     
     def process_result_value(self, value, dialect):
@@ -80,7 +84,7 @@ class ArrayType(TypeDecorator):
         else:
             # Convert JSON string back to list for SQLite
             if isinstance(value, str):
-                return json.loads(value)
+                return orjson.loads(value)
             return value
 
 
@@ -90,28 +94,44 @@ class Product(Base):
     
     id = Column(GUID(), primary_key=True, default=uuid.uuid4)
     external_id = Column(String, unique=True, nullable=False, index=True)  # ID from Hunnit.com
-    title = Column(String, nullable=False, index=True)
+    title = Column(String, nullable=False)
     handle = Column(String, unique=True, nullable=False, index=True)
     description = Column(Text, nullable=True)
     body_html = Column(Text, nullable=True)
     price = Column(Float, nullable=True)
     compare_at_price = Column(Float, nullable=True)
-    vendor = Column(String, nullable=True, index=True)
-    product_type = Column(String, nullable=True, index=True)
-    category = Column(String, nullable=True, index=True)
+    vendor = Column(String, nullable=True, index=True)  # Filtered by the vendor endpoint
+    product_type = Column(String, nullable=True)
+    category = Column(String, nullable=True)
     tags = Column(ArrayType(String), nullable=True)
     image_urls = Column(ArrayType(String), nullable=True)
     features = Column(JSON, nullable=True)  # Store variant info, options, etc.
     ai_features = Column(ArrayType(String), nullable=True)  # AI-generated features
     
-    # Vector embedding for semantic search
-    embedding = Column(Vector(1536), nullable=True)  # 1536 for OpenAI, adjust for other models
+    # Half-precision vector embedding for semantic search
+    embedding = Column(HALFVEC(EMBEDDING_DIMENSION), nullable=True)
+    embedding_input_hash = Column(String(32), nullable=True)  # Digest of the text/model the embedding came from
     
     # Metadata
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     scraped_at = Column(DateTime(timezone=True), server_default=func.now())
     
+    __table_args__ = (
+        # GIN index so array containment / ANY() lookups on ai_features avoid a full scan
+        Index("ix_products_ai_features_gin", "ai_features", postgresql_using="gin"),
+        # GIN index for tag containment (tags @> ARRAY[:tag])
+        Index("ix_products_tags_gin", "tags", postgresql_using="gin"),
+        # HNSW index so cosine-distance KNN searches avoid a brute-force scan
+        Index(
+            "ix_products_embedding_halfvec_hnsw",
+            "embedding",
+            postgresql_using="hnsw",
+            postgresql_ops={"embedding": "halfvec_cosine_ops"},
+            postgresql_with={"m": 16, "ef_construction": 64},
+        ).ddl_if(dialect="postgresql"),
+    )
+    
     def __repr__(self):
         return f"<Product(id={self.id}, title='{self.title}', external_id='{self.external_id}')>"
 
@@ -1,12 +1,13 @@
 """RAG (Retrieval Augmented Generation) module for embeddings and vector search."""
 from app.rag.embedding_service import EmbeddingService, get_embedding_service
 from app.rag.vector_search import VectorSearchService
-from app.rag.rag_service import RAGService
+from app.rag.rag_service import RAGService, get_llm_client
 
 __all__ = [
     "EmbeddingService",
     "get_embedding_service",
     "VectorSearchService",
-    "RAGService"
+    "RAGService",
+    "get_llm_client"
 ]
 
@@ -1,13 +1,89 @@
 """Embedding service for generating vector embeddings using Gemini API."""
-from typing import List, Optional
+import hashlib
+import re
+import threading
+from typing import List, Optional, Union
 from google import genai
-from google.genai import types
+from google.genai import errors, types
 import numpy as np
+from tenacity import (
+    RetryCallState,
+    retry,
+    retry_if_exception,
+    stop_after_attempt,
+    wait_exponential_jitter,
+)
+from selectolax.lexbor import LexborHTMLParser
 from app.config.settings import settings
 from app.utils.logger import get_logger
 
 logger = get_logger("embedding_service")
 
+# Transient Gemini API failures worth retrying: rate limiting (other client
+# errors won't succeed on a retry) and any server error
+RETRYABLE_CLIENT_STATUS_CODES = {429}
+EMBED_MAX_ATTEMPTS = 6
+MAX_RETRY_AFTER_SECONDS = 60
+
+_backoff = wait_exponential_jitter(initial=1, max=30)
+
+
+def _is_retryable(exc: BaseException) -> bool:
+    """
+    Whether an embed_content failure is transient.
+    
+    HTTP failures arrive as the SDK's errors.ServerError/ClientError. Network
+    failures (connection resets, timeouts) are passed through from its HTTP
+    transport; they subclass OSError whichever library that is.
+    """
+    if isinstance(exc, errors.ServerError):
+        return True
+    if isinstance(exc, errors.APIError):
+        return exc.code in RETRYABLE_CLIENT_STATUS_CODES
+    return isinstance(exc, OSError)
+
+
+def _retry_wait(retry_state: RetryCallState) -> float:
+    """Jittered exponential backoff, extended to a 429's Retry-After when longer."""
+    wait = _backoff(retry_state)
+    exc = retry_state.outcome.exception()
+    response = getattr(exc, "response", None)
+    retry_after = getattr(response, "headers", {}).get("Retry-After") if response is not None else None
+    if retry_after and retry_after.isdigit():
+        wait = max(wait, min(float(retry_after), MAX_RETRY_AFTER_SECONDS))
+    return wait
+
+
+def _log_retry(retry_state: RetryCallState) -> None:
+    """Log a transient failure before sleeping for the next attempt."""
+    logger.warning(
+        f"Embedding request failed (attempt {retry_state.attempt_number}/{EMBED_MAX_ATTEMPTS}), "
+        f"retrying in {retry_state.next_action.sleep:.1f}s: {retry_state.outcome.exception()}"
+    )
+
+
+# Size caps for long product fields, in UTF-8 bytes: tracks token count across
+# scripts (CJK, emoji) far better than character count does
+MAX_DESCRIPTION_BYTES = 500
+MAX_FEATURES_BYTES = 500
+
+
+def _truncate_utf8(text: str, max_bytes: int) -> str:
+    """Cut text to at most max_bytes of UTF-8, at a word boundary when there is one."""
+    encoded = text.encode("utf-8")
+    if len(encoded) <= max_bytes:
+        return text
+    cut = encoded[:max_bytes].decode("utf-8", errors="ignore")
+    head, space, _ = cut.rpartition(" ")
+    return (head if space and head else cut) + "..."
+
+
+# Product fields read by _prepare_text, in its positional order
+PRODUCT_TEXT_FIELDS = ("title", "description", "body_html", "vendor", "product_type", "tags", "price")
+
+# Sentence boundaries in product body text (compiled once, used per product)
+_SENT_RE = re.compile(r'[.!?]\s+')
+
 
 class EmbeddingService:
     """Service for generating embeddings using Gemini Embeddings API."""
@@ -23,7 +99,7 @@ class EmbeddingService:
     
     def _prepare_product_text(self, product_data: dict) -> str:
         """
-        Prepare a structured text representation with importance weighting for embedding.
+        Prepare a structured text representation for embedding.
         
         Args:
             product_data: Dictionary containing product fields
@@ -31,53 +107,72 @@ class EmbeddingService:
         Returns:
             Combined text string for embedding
         """
-        import re
+        return self._prepare_text(
+            product_data.get("title"),
+            product_data.get("description"),
+            product_data.get("body_html"),
+            product_data.get("vendor"),
+            product_data.get("product_type"),
+            product_data.get("tags"),
+            product_data.get("price"),
+            product_data.get("category"),
+        )
+    
+    def _prepare_text(
+        self,
+        title: Optional[str] = None,
+        description: Optional[str] = None,
+        body_html: Optional[str] = None,
+        vendor: Optional[str] = None,
+        product_type: Optional[str] = None,
+        tags: Optional[List[str]] = None,
+        price: Optional[float] = None,
+        category: Optional[str] = None
+    ) -> str:
+        """
+        Build the embedding text from individual product fields.
+        
+        Positional order matches PRODUCT_TEXT_FIELDS, so column rows can be
+        passed straight through without building a dict per product.
+        
+        Returns:
+            Combined text string for embedding
+        """
         parts = []
         
-        # High importance fields (repeat title for emphasis)
-        if product_data.get("title"):
-            title = product_data['title']
+        # Each field appears once: repeating labels only adds tokens, not weight
+        if title:
             parts.append(f"Product: {title}")
-            parts.append(f"Title: {title}")  # Repeat for emphasis
         
         # Medium importance - description
-        if product_data.get("description"):
-            desc = product_data['description']
+        if description:
             # Truncate very long descriptions to focus on key info
-            if len(desc) > 500:
-                desc = desc[:500] + "..."
-            parts.append(f"Description: {desc}")
+            parts.append(f"Description: {_truncate_utf8(description, MAX_DESCRIPTION_BYTES)}")
         
-        if product_data.get("body_html"):
-            body_text = re.sub(r'<[^>]+>', '', product_data['body_html']).strip()
-            sentences = re.split(r'[.!?]\s+', body_text)
+        if body_html:
+            # Parse rather than regex-strip so entities (&amp;, &nbsp;) are decoded
+            body_text = LexborHTMLParser(body_html).text(separator=' ').strip()
+            sentences = _SENT_RE.split(body_text)
             key_sentences = [s.strip() for s in sentences[:3] if len(s.strip()) > 20]
             if key_sentences:
-                parts.append(f"Features: {' '.join(key_sentences)}")
+                parts.append(f"Features: {_truncate_utf8(' '.join(key_sentences), MAX_FEATURES_BYTES)}")
         
         # Categorical information
         category_parts = []
-        if product_data.get("product_type"):
-            category_parts.append(product_data['product_type'])
-        if product_data.get("category"):
-            category_parts.append(product_data['category'])
+        if product_type:
+            category_parts.append(product_type)
+        if category:
+            category_parts.append(category)
         if category_parts:
             parts.append(f"Category: {', '.join(category_parts)}")
         
-        # Brand/Vendor (add as both brand and manufacturer for synonym matching)
-        if product_data.get("vendor"):
-            parts.append(f"Brand: {product_data['vendor']}")
-            parts.append(f"Manufacturer: {product_data['vendor']}")
+        if vendor:
+            parts.append(f"Brand: {vendor}")
         
-        if product_data.get("tags") and isinstance(product_data["tags"], list):
-            tags = product_data["tags"]
-            if tags:
-                tags_str = ", ".join(tags)
-                parts.append(f"Tags: {tags_str}")
-                parts.append(f"Keywords: {tags_str}")
+        if tags and isinstance(tags, list):
+            parts.append(f"Tags: {', '.join(tags)}")
         
-        if product_data.get("price"):
-            price = product_data['price']
+        if price:
             if price < 50:
                 price_range = "budget affordable"
             elif price < 150:
@@ -88,7 +183,45 @@ class EmbeddingService:
         
         return " | ".join(parts)
     
-    def generate_embedding(self, text: str, task_type: str = "RETRIEVAL_DOCUMENT") -> Optional[List[float]]:
+    def _normalize(self, vectors: List[List[float]]) -> List[np.ndarray]:
+        """
+        L2-normalize embeddings in one vectorized pass.
+        
+        Gemini only normalizes full 3072-dimension embeddings; truncated
+        dimensions are returned as-is and must be normalized here.
+        
+        Args:
+            vectors: Raw embedding values, all of the same dimension
+        
+        Returns:
+            Unit-length float32 embeddings (rows of one matrix) in the same order
+        """
+        matrix = np.asarray(vectors, dtype=np.float32)
+        if self.dimension != 3072:
+            norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+            np.divide(matrix, norms, out=matrix, where=norms > 0)
+        # pgvector binds ndarrays directly, so no per-element Python lists
+        return list(matrix)
+    
+    @retry(
+        retry=retry_if_exception(_is_retryable),
+        wait=_retry_wait,
+        stop=stop_after_attempt(EMBED_MAX_ATTEMPTS),
+        before_sleep=_log_retry,
+        reraise=True,
+    )
+    def _embed_content(self, contents: Union[str, List[str]], task_type: str):
+        """Call the Gemini embed_content API, retrying transient failures."""
+        return self.client.models.embed_content(
+            model=self.model,
+            contents=contents,
+            config=types.EmbedContentConfig(
+                task_type=task_type,
+                output_dimensionality=self.dimension
+            )
+        )
+    
+    def generate_embedding(self, text: str, task_type: str = "RETRIEVAL_DOCUMENT") -> Optional[np.ndarray]:
         """
         Generate a single embedding for a text string.
         
@@ -98,35 +231,17 @@ class EmbeddingService:
                       Options: RETRIEVAL_DOCUMENT, RETRIEVAL_QUERY, SEMANTIC_SIMILARITY, etc.
         
         Returns:
-            List of float values representing the embedding, or None if error
+            Embedding as a float32 array, or None if error
         """
         if not text or not text.strip():
             logger.warning("Empty text provided for embedding generation")
             return None
         
         try:
-            result = self.client.models.embed_content(
-                model=self.model,
-                contents=text,
-                config=types.EmbedContentConfig(
-                    task_type=task_type,
-                    output_dimensionality=self.dimension
-                )
-            )
+            result = self._embed_content(text, task_type)
             
             if result.embeddings and len(result.embeddings) > 0:
-                embedding = result.embeddings[0]
-                
-                # Normalize embedding for dimensions other than 3072
-                # (3072 is already normalized by Gemini)
-                if self.dimension != 3072:
-                    embedding_values = np.array(embedding.values)
-                    norm = np.linalg.norm(embedding_values)
-                    if norm > 0:
-                        embedding_values = embedding_values / norm
-                    return embedding_values.tolist()
-                
-                return list(embedding.values)
+                return self._normalize([result.embeddings[0].values])[0]
             else:
                 logger.error("No embeddings returned from Gemini API")
                 return None
@@ -135,7 +250,7 @@ class EmbeddingService:
             logger.error(f"Error generating embedding: {e}")
             return None
     
-    def generate_embeddings_batch(self, texts: List[str], task_type: str = "RETRIEVAL_DOCUMENT") -> List[Optional[List[float]]]:
+    def generate_embeddings_batch(self, texts: List[str], task_type: str = "RETRIEVAL_DOCUMENT") -> List[Optional[np.ndarray]]:
         """
         Generate embeddings for multiple texts in a single batch.
         
@@ -156,36 +271,15 @@ class EmbeddingService:
             return [None] * len(texts)
         
         try:
-            result = self.client.models.embed_content(
-                model=self.model,
-                contents=valid_texts,
-                config=types.EmbedContentConfig(
-                    task_type=task_type,
-                    output_dimensionality=self.dimension
-                )
-            )
+            result = self._embed_content(valid_texts, task_type)
             
-            embeddings = []
-            valid_idx = 0
+            # Normalize the whole batch at once, then map back to text positions
+            normalized = iter(self._normalize([embedding.values for embedding in result.embeddings]))
             
-            for i, text in enumerate(texts):
+            embeddings = []
+            for text in texts:
                 if text and text.strip():
-                    if valid_idx < len(result.embeddings):
-                        embedding = result.embeddings[valid_idx]
-                        
-                        # Normalize if needed
-                        if self.dimension != 3072:
-                            embedding_values = np.array(embedding.values)
-                            norm = np.linalg.norm(embedding_values)
-                            if norm > 0:
-                                embedding_values = embedding_values / norm
-                            embeddings.append(embedding_values.tolist())
-                        else:
-                            embeddings.append(list(embedding.values))
-                        
-                        valid_idx += 1
-                    else:
-                        embeddings.append(None)
+                    embeddings.append(next(normalized, None))
                 else:
                     embeddings.append(None)
             
@@ -195,7 +289,12 @@ class EmbeddingService:
             logger.error(f"Error generating batch embeddings: {e}")
             return [None] * len(texts)
     
-    def generate_product_embedding(self, product_data: dict) -> Optional[List[float]]:
+    def input_hash(self, text: str) -> str:
+        """Digest identifying an embedding input: model, dimension and prepared text."""
+        key = f"{self.model}:{self.dimension}:{text}"
+        return hashlib.blake2b(key.encode("utf-8"), digest_size=16).hexdigest()
+    
+    def generate_product_embedding(self, product_data: dict) -> Optional[np.ndarray]:
         """
         Generate embedding for a product by preparing its text representation.
         
@@ -203,7 +302,7 @@ class EmbeddingService:
             product_data: Dictionary containing product fields (title, description, etc.)
         
         Returns:
-            List of float values representing the embedding, or None if error
+            Embedding as a float32 array, or None if error
         """
         product_text = self._prepare_product_text(product_data)
         if not product_text:
@@ -216,6 +315,7 @@ class EmbeddingService:
 # Global instance (lazy initialization)
 _embedding_service: Optional[EmbeddingService] = None
 _embedding_service_error: Optional[Exception] = None
+_embedding_service_lock = threading.Lock()
 
 
 def get_embedding_service() -> EmbeddingService:
@@ -227,15 +327,20 @@ def get_embedding_service() -> EmbeddingService:
     """
     global _embedding_service, _embedding_service_error
     
-    if _embedding_service_error is not None:
-        raise _embedding_service_error
+    if _embedding_service is not None:
+        return _embedding_service
     
-    if _embedding_service is None:
-        try:
-            _embedding_service = EmbeddingService()
-        except Exception as e:
-            _embedding_service_error = e
-            raise
+    # Double-checked so concurrent first callers build only one client
+    with _embedding_service_lock:
+        if _embedding_service_error is not None:
+            raise _embedding_service_error
+        
+        if _embedding_service is None:
+            try:
+                _embedding_service = EmbeddingService()
+            except Exception as e:
+                _embedding_service_error = e
+                raise
     
     return _embedding_service
 
@@ -1,156 +1,357 @@
 """Utility script to generate embeddings for products that don't have them."""
+import io
+import struct
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Iterator, List, Optional, Tuple
+import numpy as np
+from pgvector.utils import HalfVector
+from sqlalchemy import func, select, text
+from sqlalchemy.engine import Row
 from sqlalchemy.orm import Session
-from app.models.product import Product
+from sqlalchemy.sql import Select
+from app.models.product import EMBEDDING_DIMENSION, Product
 from app.rag import get_embedding_service
+from app.rag.embedding_service import PRODUCT_TEXT_FIELDS, EmbeddingService
+from app.rag.vector_search import invalidate_search_cache
 from app.utils.logger import get_logger
 
 logger = get_logger("generate_embeddings")
 
+# Texts sent per embed_content request (Gemini accepts up to 100)
+EMBEDDING_BATCH_SIZE = 100
 
-def generate_embeddings_for_products(db: Session, batch_size: int = 10) -> tuple[int, int]:
+# Embedding requests in flight at once
+MAX_IN_FLIGHT = 5
+
+# Columns needed to build embedding text (rows are fetched without the ORM
+# objects or their existing embedding); row[_TEXT_SLICE] feeds _prepare_text
+_EMBEDDING_INPUT_COLUMNS = (
+    Product.id,
+    *(getattr(Product, field) for field in PRODUCT_TEXT_FIELDS),
+    Product.embedding_input_hash,
+    Product.embedding.is_not(None).label("has_embedding"),
+)
+_TEXT_SLICE = slice(1, 1 + len(PRODUCT_TEXT_FIELDS))
+
+
+def _stream_groups(db: Session, statement: Select, group_size: int) -> Iterator[List[Row]]:
     """
-    Generate embeddings for all products that don't have embeddings yet.
+    Yield rows of a query in groups from a server-side cursor.
+    
+    The cursor runs on its own connection: committing the session's
+    embedding updates would otherwise close it mid-iteration.
+    
+    Args:
+        db: Database session (its engine provides the read connection)
+        statement: Select over _EMBEDDING_INPUT_COLUMNS
+        group_size: Rows fetched and yielded at a time
+    
+    Yields:
+        Lists of at most group_size rows
+    """
+    with db.get_bind().connect() as connection:
+        result = connection.execution_options(stream_results=True, yield_per=group_size).execute(statement)
+        for group in result.partitions():
+            yield group
+
+
+def _submit_texts(
+    pool: ThreadPoolExecutor,
+    embedding_service: EmbeddingService,
+    texts: List[str],
+    batch_size: int
+) -> Tuple[List[int], List[Future]]:
+    """
+    Start embedding texts on the pool, one request per batch.
+    
+    Identical texts (e.g. colour/size variants) are sent once. Unique texts
+    are batched in length order so each request holds similarly sized
+    inputs (less padding to the longest one).
+    
+    Args:
+        pool: Executor running the embedding requests
+        embedding_service: Embedding service to call
+        texts: Prepared product texts to embed
+        batch_size: Texts per embedding request
+    
+    Returns:
+        Tuple of (position of each text's embedding in the request results,
+        request futures)
+    """
+    unique_texts = sorted(dict.fromkeys(texts), key=len, reverse=True)
+    rank = {text: position for position, text in enumerate(unique_texts)}
+    futures = [
+        pool.submit(embedding_service.generate_embeddings_batch, unique_texts[i:i + batch_size])
+        for i in range(0, len(unique_texts), batch_size)
+    ]
+    return [rank[text] for text in texts], futures
+
+
+def _collect_embeddings(slots: List[int], futures: List[Future]) -> List[Optional[np.ndarray]]:
+    """
+    Wait for submitted embedding requests and map results back to the texts.
+    
+    Args:
+        slots: Result positions returned by _submit_texts
+        futures: Request futures returned by _submit_texts
+    
+    Returns:
+        Embeddings aligned with the submitted texts (None where generation failed)
+    """
+    results = [embedding for future in futures for embedding in future.result()]
+    return [results[slot] for slot in slots]
+
+
+# PostgreSQL binary COPY framing: signature, flags and header extension length
+# up front, a -1 field count as the trailer
+_PGCOPY_HEADER = b"PGCOPY\n\xff\r\n\x00" + struct.pack("!ii", 0, 0)
+_PGCOPY_TRAILER = struct.pack("!h", -1)
+
+
+def _copy_embeddings(db: Session, updates: List[dict]) -> None:
+    """
+    Write embeddings on PostgreSQL via a binary COPY into a staging table.
+    
+    One COPY plus one UPDATE ... FROM replaces a per-row UPDATE round-trip.
+    Rows are framed in COPY's binary format (uuid bytes, pgvector's halfvec
+    wire format, the hash as text).
+    
+    Args:
+        db: Database session on a psycopg2 connection
+        updates: {"id", "embedding", "embedding_input_hash"} per product
+    """
+    buffer = io.BytesIO()
+    buffer.write(_PGCOPY_HEADER)
+    for update in updates:
+        vector = HalfVector(update["embedding"]).to_binary()
+        input_hash = update["embedding_input_hash"].encode("ascii")
+        buffer.write(struct.pack("!hi16si", 3, 16, update["id"].bytes, len(vector)))
+        buffer.write(vector)
+        buffer.write(struct.pack("!i", len(input_hash)))
+        buffer.write(input_hash)
+    buffer.write(_PGCOPY_TRAILER)
+    buffer.seek(0)
+    
+    # Dropped when the group's transaction commits
+    db.execute(text(
+        "CREATE TEMP TABLE _embedding_stage ("
+        f"id uuid, embedding halfvec({EMBEDDING_DIMENSION}), embedding_input_hash varchar(32)"
+        ") ON COMMIT DROP"
+    ))
+    cursor = db.connection().connection.cursor()
+    try:
+        cursor.copy_expert("COPY _embedding_stage FROM STDIN WITH (FORMAT BINARY)", buffer)
+    finally:
+        cursor.close()
+    db.execute(text(
+        "UPDATE products SET embedding = s.embedding, embedding_input_hash = s.embedding_input_hash "
+        "FROM _embedding_stage s WHERE products.id = s.id"
+    ))
+
+
+def _save_group(
+    db: Session,
+    pending: List[Tuple[Row, str, str]],
+    slots: List[int],
+    futures: List[Future]
+) -> tuple[int, int]:
+    """
+    Wait for a group's embeddings and write them in one bulk write.
     
     Args:
         db: Database session
-        batch_size: Number of products to process in each batch
-        
+        pending: (product row, prepared text, input hash) per submitted product
+        slots: Result positions returned by _submit_texts
+        futures: Request futures returned by _submit_texts
+    
     Returns:
         Tuple of (successful_count, failed_count)
     """
     try:
-        embedding_service = get_embedding_service()
+        embeddings = _collect_embeddings(slots, futures)
     except Exception as e:
-        logger.error(f"Failed to initialize embedding service: {e}")
-        return 0, 0
+        logger.error(f"Error generating embeddings for {len(pending)} products: {e}")
+        return 0, len(pending)
     
-    # Get all products without embeddings
-    products_without_embeddings = db.query(Product).filter(
-        Product.embedding.is_(None)
-    ).all()
+    failed = 0
+    updates = []
+    for (product, _, input_hash), embedding in zip(pending, embeddings):
+        if embedding is not None:
+            updates.append({"id": product.id, "embedding": embedding, "embedding_input_hash": input_hash})
+        else:
+            failed += 1
+            logger.warning(f"Failed to generate embedding for product: {product.title} (ID: {product.id})")
     
-    if not products_without_embeddings:
-        logger.info("All products already have embeddings")
-        return 0, 0
+    # Binary COPY on psycopg2; elsewhere an executemany UPDATE ... WHERE id = ?
+    # (no ORM change tracking either way)
+    try:
+        if updates:
+            if db.get_bind().dialect.driver == "psycopg2":
+                _copy_embeddings(db, updates)
+            else:
+                db.bulk_update_mappings(Product, updates)
+        db.commit()
+        if updates:
+            invalidate_search_cache()
+        return len(updates), failed
+    except Exception as e:
+        logger.error(f"Error committing batch: {e}")
+        db.rollback()
+        return 0, failed + len(updates)
+
+
+def _generate_embeddings(
+    db: Session,
+    statement: Select,
+    total: int,
+    batch_size: int,
+    max_in_flight: int
+) -> tuple[int, int]:
+    """
+    Generate and save embeddings for the products selected by a query.
+    
+    Work is pipelined by group: while one group's requests are in flight,
+    the next group is read and prepared and the previous one is written.
+    
+    Args:
+        db: Database session
+        statement: Select over _EMBEDDING_INPUT_COLUMNS for the products to embed
+        total: Number of products the statement selects (for progress logging)
+        batch_size: Texts per embedding request
+        max_in_flight: Maximum concurrent embedding requests
     
-    logger.info(f"Found {len(products_without_embeddings)} products without embeddings")
+    Returns:
+        Tuple of (successful_count, failed_count)
+    """
+    embedding_service = get_embedding_service()
     
     successful = 0
     failed = 0
+    skipped = 0
+    processed = 0
     
-    # Process in batches
-    for i in range(0, len(products_without_embeddings), batch_size):
-        batch = products_without_embeddings[i:i + batch_size]
-        
-        for product in batch:
-            try:
-                # Prepare product data
-                product_data = {
-                    "title": product.title,
-                    "description": product.description,
-                    "body_html": product.body_html,
-                    "vendor": product.vendor,
-                    "product_type": product.product_type,
-                    "tags": product.tags if product.tags else [],
-                    "price": product.price,
-                }
-                
-                # Generate embedding
-                embedding = embedding_service.generate_product_embedding(product_data)
-                
-                if embedding:
-                    product.embedding = embedding
-                    successful += 1
-                    logger.info(f"Generated embedding for product: {product.title} (ID: {product.id})")
+    def save(group: tuple) -> None:
+        """Write a submitted group and update the running counts."""
+        nonlocal successful, failed
+        group_processed, pending, slots, futures = group
+        saved, group_failed = _save_group(db, pending, slots, futures)
+        successful += saved
+        failed += group_failed
+        logger.info(f"Committed {group_processed}/{total} products ({successful} successful, {failed} failed so far)")
+    
+    # Each group is max_in_flight concurrent requests, committed together. At
+    # most two groups are outstanding, which bounds memory and queued requests.
+    group_size = batch_size * max_in_flight
+    in_flight = None
+    # The Gemini client is blocking; threads overlap the network round-trips
+    with ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix="embed") as pool:
+        for group in _stream_groups(db, statement, group_size):
+            processed += len(group)
+            
+            # Skip products whose embedding was generated from identical input
+            pending = []
+            for product in group:
+                text = embedding_service._prepare_text(*product[_TEXT_SLICE])
+                input_hash = embedding_service.input_hash(text)
+                if product.has_embedding and product.embedding_input_hash == input_hash:
+                    skipped += 1
                 else:
-                    failed += 1
-                    logger.warning(f"Failed to generate embedding for product: {product.title} (ID: {product.id})")
-                    
-            except Exception as e:
-                failed += 1
-                logger.error(f"Error generating embedding for product {product.id}: {e}")
+                    pending.append((product, text, input_hash))
+            
+            submitted = None
+            if pending:
+                slots, futures = _submit_texts(pool, embedding_service, [text for _, text, _ in pending], batch_size)
+                submitted = (processed, pending, slots, futures)
+            
+            # Write the previous group while this one is being embedded
+            if in_flight:
+                save(in_flight)
+            in_flight = submitted
         
-        # Commit batch
-        try:
-            db.commit()
-            logger.info(f"Committed batch: {i // batch_size + 1} ({successful} successful, {failed} failed so far)")
-        except Exception as e:
-            logger.error(f"Error committing batch: {e}")
-            db.rollback()
+        if in_flight:
+            save(in_flight)
+    
+    if skipped:
+        logger.info(f"Skipped {skipped} products whose embedding input is unchanged")
+    
+    return successful, failed
+
+
+def generate_embeddings_for_products(
+    db: Session,
+    batch_size: int = EMBEDDING_BATCH_SIZE,
+    max_in_flight: int = MAX_IN_FLIGHT
+) -> tuple[int, int]:
+    """
+    Generate embeddings for all products that don't have embeddings yet.
+    
+    Args:
+        db: Database session
+        batch_size: Number of products embedded per API request
+        max_in_flight: Maximum concurrent embedding requests
+    
+    Returns:
+        Tuple of (successful_count, failed_count)
+    """
+    try:
+        get_embedding_service()
+    except Exception as e:
+        logger.error(f"Failed to initialize embedding service: {e}")
+        return 0, 0
+    
+    # Count up front; the rows themselves are streamed in groups
+    missing = Product.embedding.is_(None)
+    total = db.query(func.count(Product.id)).filter(missing).scalar()
+    
+    if not total:
+        logger.info("All products already have embeddings")
+        return 0, 0
+    
+    logger.info(f"Found {total} products without embeddings")
+    
+    statement = select(*_EMBEDDING_INPUT_COLUMNS).where(missing)
+    successful, failed = _generate_embeddings(db, statement, total, batch_size, max_in_flight)
     
     logger.info(f"Embedding generation complete: {successful} successful, {failed} failed")
     return successful, failed
 
 
-def regenerate_all_embeddings(db: Session, batch_size: int = 10) -> tuple[int, int]:
+def regenerate_all_embeddings(
+    db: Session,
+    batch_size: int = EMBEDDING_BATCH_SIZE,
+    max_in_flight: int = MAX_IN_FLIGHT
+) -> tuple[int, int]:
     """
     Regenerate embeddings for all products (even if they already have embeddings).
     
+    Products whose prepared text, model and dimension hash to the stored
+    embedding_input_hash are skipped.
+    
     Args:
         db: Database session
-        batch_size: Number of products to process in each batch
-        
+        batch_size: Number of products embedded per API request
+        max_in_flight: Maximum concurrent embedding requests
+    
     Returns:
         Tuple of (successful_count, failed_count)
     """
     try:
-        embedding_service = get_embedding_service()
+        get_embedding_service()
     except Exception as e:
         logger.error(f"Failed to initialize embedding service: {e}")
         return 0, 0
     
-    # Get all products
-    all_products = db.query(Product).all()
+    # Count up front; the rows themselves are streamed in groups
+    total = db.query(func.count(Product.id)).scalar()
     
-    if not all_products:
+    if not total:
         logger.info("No products found")
         return 0, 0
     
-    logger.info(f"Regenerating embeddings for {len(all_products)} products")
+    logger.info(f"Regenerating embeddings for {total} products")
     
-    successful = 0
-    failed = 0
-    
-    # Process in batches
-    for i in range(0, len(all_products), batch_size):
-        batch = all_products[i:i + batch_size]
-        
-        for product in batch:
-            try:
-                # Prepare product data
-                product_data = {
-                    "title": product.title,
-                    "description": product.description,
-                    "body_html": product.body_html,
-                    "vendor": product.vendor,
-                    "product_type": product.product_type,
-                    "tags": product.tags if product.tags else [],
-                    "price": product.price,
-                }
-                
-                # Generate embedding
-                embedding = embedding_service.generate_product_embedding(product_data)
-                
-                if embedding:
-                    product.embedding = embedding
-                    successful += 1
-                    logger.info(f"Regenerated embedding for product: {product.title} (ID: {product.id})")
-                else:
-                    failed += 1
-                    logger.warning(f"Failed to regenerate embedding for product: {product.title} (ID: {product.id})")
-                    
-            except Exception as e:
-                failed += 1
-                logger.error(f"Error regenerating embedding for product {product.id}: {e}")
-        
-        # Commit batch
-        try:
-            db.commit()
-            logger.info(f"Committed batch: {i // batch_size + 1} ({successful} successful, {failed} failed so far)")
-        except Exception as e:
-            logger.error(f"Error committing batch: {e}")
-            db.rollback()
+    statement = select(*_EMBEDDING_INPUT_COLUMNS)
+    successful, failed = _generate_embeddings(db, statement, total, batch_size, max_in_flight)
     
     logger.info(f"Embedding regeneration complete: {successful} successful, {failed} failed")
     return successful, failed
-
@@ -1,21 +1,40 @@
 """Query enhancement utilities for better RAG retrieval."""
 from typing import List
+import functools
 import re
 from app.utils.logger import get_logger
 
 logger = get_logger("query_enhancement")
 
+# Patterns compiled once at import rather than looked up per query
+_WS_RE = re.compile(r'\s+')
+_STRIP_RE = re.compile(r"[^\w\s'-]")
+_PRICE_RE = re.compile(r'(?:₹|rs\.?|rupees?|inr)?\s*(\d+(?:[.,]\d+)?)', re.IGNORECASE)
+_TOKEN_RE = re.compile(r"₹|[\w']+")
+
+# Words that mark a price query, matched against the query's token set
+_PRICE_INDICATORS = frozenset({
+    "price", "cost", "budget", "cheap", "expensive", "affordable",
+    "under", "below", "over", "above", "between", "upto",
+    "maximum", "minimum", "max", "min",
+    "rupee", "rupees", "rs", "₹",
+})
+_PRICE_PHRASES = ("up to", "less than", "more than")
+_CHEAP_KW = frozenset({"cheap", "affordable", "budget", "low"})
+_EXPENSIVE_KW = frozenset({"expensive", "premium", "luxury", "high"})
+
 
 class QueryEnhancer:
     """Enhance queries for better retrieval."""
     
-    # Common product-related synonyms and related terms
+    # Common product-related synonyms and related terms (values become
+    # de-duplicated tuples below)
     SYNONYMS = {
         "shirt": ["top", "blouse", "tee", "t-shirt", "tshirt"],
         "pants": ["trousers", "bottoms", "jeans", "slacks"],
         "shoes": ["footwear", "sneakers", "boots", "trainers"],
         "bag": ["purse", "handbag", "tote", "backpack", "satchel"],
-        "watch": ["timepiece", "wristwatch", "timepiece"],
+        "watch": ["timepiece", "wristwatch"],
         "gym": ["fitness", "workout", "exercise", "athletic", "training"],
         "meeting": ["business", "professional", "office", "formal", "corporate"],
         "casual": ["everyday", "relaxed", "informal", "comfortable"],
@@ -32,60 +51,82 @@ class QueryEnhancer:
         "price": ["cost", "pricing", "amount", "rupee", "rupees"],
         "cost": ["price", "pricing", "amount", "rupee", "rupees"],
     }
+    SYNONYMS = {term: tuple(dict.fromkeys(synonyms)) for term, synonyms in SYNONYMS.items()}
+    
+    # Each synonym as space-joined tokens, for whole-word "already in query" checks
+    SYNONYM_PHRASES = {
+        synonym: " ".join(_TOKEN_RE.findall(synonym))
+        for synonyms in SYNONYMS.values()
+        for synonym in synonyms
+    }
+    
+    # All SYNONYMS keys in one alternation, matched as whole words (plurals
+    # allowed), so a query is scanned once instead of once per key
+    SYNONYM_TRIGGER_RE = re.compile(
+        r'\b(' + '|'.join(sorted(map(re.escape, SYNONYMS), key=len, reverse=True)) + r')(?:e?s)?\b'
+    )
     
     def expand_query(self, query: str) -> str:
         """Expand query with synonyms and related terms."""
+        return _expand_query_cached(query)
+    
+    def _expand_query(self, query: str) -> str:
+        """Uncached implementation of expand_query."""
         query_lower = query.lower()
-        expanded_terms = [query]  # Keep original query
         
-        # Add synonyms for key terms
-        for term, synonyms in self.SYNONYMS.items():
-            if term in query_lower:
-                # Add synonyms that aren't already in the query
-                for synonym in synonyms:
-                    if synonym not in query_lower:
-                        expanded_terms.append(synonym)
+        # Query words, for whole-word checks ("tee" is not in "teenager"):
+        # single-word synonyms by set lookup, multi-word ones as a phrase
+        tokens = _TOKEN_RE.findall(query_lower)
+        token_set = set(tokens)
+        token_text = f" {' '.join(tokens)} "
+        
+        # Synonyms of each triggered term (once, in query order) that aren't
+        # already in the query, each added once
+        triggered = dict.fromkeys(self.SYNONYM_TRIGGER_RE.findall(query_lower))
+        expanded_terms = dict.fromkeys(
+            synonym
+            for term in triggered
+            for synonym in self.SYNONYMS[term]
+            if self.SYNONYM_PHRASES[synonym] not in token_set
+            and f" {self.SYNONYM_PHRASES[synonym]} " not in token_text
+        )
         
-        # Combine original query with expanded terms
         # Use original query first, then add synonyms
-        if len(expanded_terms) > 1:
-            return f"{query} {' '.join(expanded_terms[1:])}"
+        if expanded_terms:
+            return f"{query} {' '.join(expanded_terms)}"
         return query
     
     def normalize_query(self, query: str) -> str:
         """Normalize query by removing noise and standardizing."""
         # Remove extra whitespace
-        query = re.sub(r'\s+', ' ', query.strip())
+        query = _WS_RE.sub(' ', query.strip())
         # Remove special characters that don't add meaning (keep hyphens and apostrophes)
-        query = re.sub(r'[^\w\s\'-]', '', query)
+        query = _STRIP_RE.sub('', query)
         return query
     
     def enhance_price_query(self, query: str) -> str:
         """Enhance price-related queries with price context."""
+        return _enhance_price_query_cached(query)
+    
+    def _enhance_price_query(self, query: str) -> str:
+        """Uncached implementation of enhance_price_query."""
         if not query or not query.strip():
             return query
         
         query_lower = query.lower()
+        tokens = set(_TOKEN_RE.findall(query_lower))
         
-        # Price-related keywords that indicate price queries
-        price_indicators = [
-            "price", "cost", "budget", "cheap", "expensive", "affordable",
-            "under", "below", "over", "above", "between", "upto", "up to",
-            "less than", "more than", "maximum", "minimum", "max", "min",
-            "rupee", "rupees", "rs", "₹"
-        ]
-        
-        # Check if query contains price indicators
-        has_price_indicator = any(indicator in query_lower for indicator in price_indicators)
+        # Check if query contains price indicators (whole words or phrases)
+        has_price_indicator = bool(tokens & _PRICE_INDICATORS) or any(
+            phrase in query_lower for phrase in _PRICE_PHRASES
+        )
         
         if has_price_indicator:
             # Add price-related context terms to help with retrieval
             price_context = []
             
             # Extract numeric values (prices)
-            import re
-            price_pattern = r'(?:₹|rs\.?|rupees?|inr)?\s*(\d+(?:[.,]\d+)?)'
-            price_matches = re.findall(price_pattern, query_lower, re.IGNORECASE)
+            price_matches = _PRICE_RE.findall(query_lower)
             
             if price_matches:
                 # If we have price values, add price range context
@@ -93,9 +134,9 @@ class QueryEnhancer:
                 price_context.append("pricing")
             
             # Add qualitative price terms based on keywords
-            if any(kw in query_lower for kw in ["cheap", "affordable", "budget", "low"]):
+            if tokens & _CHEAP_KW:
                 price_context.extend(["budget-friendly", "affordable", "value"])
-            elif any(kw in query_lower for kw in ["expensive", "premium", "luxury", "high"]):
+            elif tokens & _EXPENSIVE_KW:
                 price_context.extend(["premium", "luxury", "high-end"])
             
             # Combine original query with price context
@@ -108,6 +149,17 @@ class QueryEnhancer:
     
     def enhance(self, query: str) -> str:
         """Apply all enhancement techniques."""
+        return _enhance_cached(query)
+    
+    @staticmethod
+    def cache_clear() -> None:
+        """Drop memoized enhancement results (e.g. between tests)."""
+        _enhance_cached.cache_clear()
+        _enhance_price_query_cached.cache_clear()
+        _expand_query_cached.cache_clear()
+    
+    def _enhance(self, query: str) -> str:
+        """Uncached implementation of enhance."""
         if not query or not query.strip():
             return query
         
@@ -122,11 +174,31 @@ class QueryEnhancer:
         # Limit expansion to avoid too long queries
         words = expanded.split()
         if len(words) > 20:
-            # Keep original query + first 10 additional terms
-            original_words = normalized.split()
-            additional = [w for w in words if w not in original_words][:10]
+            # Keep original query + first 10 distinct additional terms
+            original_words = set(normalized.split())
+            additional = list(dict.fromkeys(w for w in words if w not in original_words))[:10]
             expanded = f"{normalized} {' '.join(additional)}"
         
         logger.debug(f"Query enhanced: '{query}' -> '{expanded}'")
         return expanded
 
+
+# Enhancement is a pure function of the query string, so results are memoized
+# per process; QueryEnhancer has no state (its tables and patterns are class
+# attributes), so this one shared instance serves every caller
+QUERY_ENHANCER = QueryEnhancer()
+
+
+@functools.lru_cache(maxsize=4096)
+def _enhance_cached(query: str) -> str:
+    return QUERY_ENHANCER._enhance(query)
+
+
+@functools.lru_cache(maxsize=1024)
+def _enhance_price_query_cached(query: str) -> str:
+    return QUERY_ENHANCER._enhance_price_query(query)
+
+
+@functools.lru_cache(maxsize=1024)
+def _expand_query_cached(query: str) -> str:
+    return QUERY_ENHANCER._expand_query(query)
@@ -1,18 +1,733 @@
 """RAG service for product recommendations using vector search and LLM."""
+import asyncio
+import collections
+import hashlib
 import re
+import threading
 import time
-from typing import List, Optional, Dict, Any, Tuple
+from functools import lru_cache
+from typing import AsyncIterator, List, Optional, Dict, Any, Tuple
+import numpy as np
+import orjson
 from sqlalchemy.orm import Session
 from google import genai
 from google.genai import types
-from app.rag.vector_search import VectorSearchService
+from app.rag.vector_search import SEARCH_CACHE_TTL_SECONDS, VectorSearchService, get_index_version
 from app.rag import get_embedding_service
 from app.models.product import Product
+from app.config.database import run_db
+from app.config.redis import get_redis_client
 from app.config.settings import settings
 from app.utils.logger import get_logger
 
 logger = get_logger("rag_service")
 
+# Patterns compiled once at import rather than per request
+# Numeric price values, optionally prefixed by ₹ / Rs / rupee(s) / INR
+_PRICE_RE = re.compile(r'(?:₹|rs\.?|rupees?|inr)?\s*(\d+(?:[.,]\d+)?)', re.IGNORECASE)
+
+# Questions about a specific product rather than requests for recommendations
+_INFORMATIONAL_RES = tuple(re.compile(pattern) for pattern in (
+    r'what (sizes?|colors?|colours?|materials?|features?|specs?|specifications?) (does|do|is|are)',
+    r'does .+ (come|comes) in',
+    r'is .+ available in',
+    r'can .+ (come|comes) in',
+    r'tell me (about|more about)',
+    r'what (is|are) .+ (sizes?|colors?|colours?|materials?|features?)',
+    r'does .+ have',
+    r'what (does|do) .+ (have|come in)',
+    r'is .+ (available|in stock)',
+    r'how much (does|do|is) .+ (cost|price)',
+))
+
+# LLM response cleanup: per-product "- Name: ..." bullet lines, bold "**Name**:"
+# headings, excess blank lines
+_BULLET_RE = re.compile(r'\s*[-*•]\s*.*?:')
+_BOLD_RE = re.compile(r'\*\*.*?\*\*:')
+_NL_RE = re.compile(r'\n{3,}')
+
+# Phrases marking a response that asks the user to clarify (with a "?")
+_CLARIFY_RE = re.compile(
+    r'could you clarify|can you tell me more|what do you mean|could you be more specific|what are you looking for',
+    re.IGNORECASE
+)
+
+
+def _clean_line(line: str) -> str:
+    """
+    Clean one response line: labelled bullet lines and whitespace-only lines
+    become empty, bold headings are dropped (only lines with "**" are searched).
+    """
+    if _BULLET_RE.match(line):
+        return ''
+    if '**' in line:
+        line = _BOLD_RE.sub('', line)
+    return line if line.strip() else ''
+
+
+def _clean_llm_response(response: str) -> str:
+    """
+    Strip per-product listing lines from a recommendation response in one pass.
+    
+    Bullet lines with a label are blanked, bold headings removed, and runs of
+    blank lines collapsed to one.
+    
+    Args:
+        response: Raw LLM response text
+    
+    Returns:
+        Cleaned response text (not stripped)
+    """
+    lines = []
+    blank_run = 0
+    for line in response.split('\n'):
+        line = _clean_line(line)
+        blank_run = blank_run + 1 if not line else 0
+        if blank_run <= 1:
+            lines.append(line)
+    return '\n'.join(lines)
+
+
+class _ResponseLineFilter:
+    """
+    Incremental _clean_llm_response for streamed responses.
+    
+    Text is released a whole line at a time (a bullet line can only be
+    recognised once complete). The concatenated output equals
+    _clean_llm_response(text).strip(): leading/trailing blank lines and
+    whitespace are dropped and inner blank runs collapsed to one, so a line's
+    trailing whitespace is held back until another line follows it.
+    """
+    
+    def __init__(self):
+        self._partial = ""
+        self._started = False
+        self._blank_pending = False
+        self._tail = ""
+    
+    def feed(self, text: str) -> str:
+        """Add streamed text; return the cleaned text of any lines it completed."""
+        *lines, self._partial = (self._partial + text).split('\n')
+        return self._emit(lines)
+    
+    def flush(self) -> str:
+        """Return the cleaned text of the final, unterminated line."""
+        line, self._partial = self._partial, ""
+        return self._emit([line])
+    
+    def _emit(self, lines: List[str]) -> str:
+        out = []
+        for line in lines:
+            line = _clean_line(line)
+            if not line:
+                self._blank_pending = self._started
+                continue
+            if self._started:
+                out.append(self._tail)
+                out.append('\n\n' if self._blank_pending else '\n')
+            else:
+                line = line.lstrip()
+            text = line.rstrip()
+            self._tail = line[len(text):]
+            out.append(text)
+            self._started = True
+            self._blank_pending = False
+        return ''.join(out)
+
+# Leading numbering / bullets on suggested follow-up lines
+_LIST_MARKER_RE = re.compile(r'^[\d\-\*•\.\)\s]+')
+
+# Bounds concurrent LLM calls per process (created lazily so it binds to the
+# running event loop)
+_llm_semaphore: Optional[asyncio.Semaphore] = None
+
+
+# Product context is one JSON object per line; the short keys are explained once
+_PRODUCT_CONTEXT_LEGEND = (
+    "Products as JSON, one per line (n=product number, t=title, p=price in ₹, v=vendor, "
+    "c=category, d=description, tg=tags, col=available colors, sz=available sizes, "
+    "szc=sizes by color):\n"
+)
+
+# Variant option values read as colours (including compound colours like
+# "deep burgundy") and as sizes
+_COLOR_KEYWORDS = (
+    'red', 'blue', 'green', 'black', 'white', 'yellow', 'pink', 'purple',
+    'orange', 'gray', 'grey', 'brown', 'beige', 'navy', 'maroon', 'teal',
+    'coral', 'ivory', 'cream', 'tan', 'khaki', 'burgundy', 'deep burgundy',
+    'magenta', 'cyan', 'lime', 'olive', 'salmon', 'turquoise', 'violet', 'indigo',
+    'charcoal', 'peach', 'mint', 'lavender', 'rose', 'gold', 'silver',
+    'bronze', 'copper', 'plum', 'emerald', 'sapphire', 'ruby', 'amber',
+    'smoke', 'sage', 'stone', 'sand', 'camel', 'cognac', 'mocha', 'espresso',
+    'deep', 'light', 'dark', 'bright', 'pale', 'vibrant',
+)
+_SIZE_PATTERNS = (
+    'xs', 's', 'm', 'l', 'xl', 'xxl', 'xxxl', 'xxxxl',
+    'small', 'medium', 'large', 'extra small', 'extra large',
+    'one size', 'os', 'free size',
+)
+# Sort position of letter sizes (others sort after them)
+_SIZE_ORDER = {size: position for position, size in enumerate(('xs', 's', 'm', 'l', 'xl', 'xxl', 'xxxl'))}
+
+# Recommendation prompt pieces. The system prompt is specialised at import for
+# informational queries and for discovery queries with/without a colour in the
+# query; only the price guidance is filled in per request.
+_COLOR_QUERY_KEYWORDS = (
+    'red', 'blue', 'green', 'black', 'white', 'yellow', 'pink', 'purple',
+    'orange', 'gray', 'grey', 'brown', 'beige', 'navy', 'maroon', 'teal',
+    'coral', 'ivory', 'cream', 'tan', 'khaki', 'burgundy', 'deep burgundy',
+    'magenta', 'cyan', 'lime', 'olive', 'salmon', 'turquoise', 'violet', 'indigo',
+    'charcoal', 'peach', 'mint', 'lavender', 'rose', 'gold', 'silver',
+    'bronze', 'copper', 'plum', 'emerald', 'sapphire', 'ruby', 'amber',
+    'color', 'colour', 'hue', 'shade',
+)
+_COLOR_EMPHASIS = """
+12. COLOR QUERIES: If the user is searching for a specific color (e.g., "Deep Burgundy", "red", "blue"), 
+    emphasize products that have that exact color available. The product cards will automatically show 
+    the color-specific variant image when available. Make sure to highlight that these products come 
+    in the requested color.
+"""
+_PRICE_EMPHASIS_TMPL = """
+13. PRICE QUERIES: The user is searching for products within a {price_constraint_text}. 
+    - Emphasize that the products shown match their price requirements
+    - Mention the price range in your response (e.g., "These products are all under ₹{max_price:.0f}" or "These are budget-friendly options")
+    - Highlight value proposition when relevant
+    - If no products match the price criteria, explain this clearly and suggest adjusting the price range
+"""
+_INFORMATIONAL_GUIDANCE = """
+12. INFORMATIONAL QUERIES: The user is asking for information about a specific product (e.g., "What sizes does X come in?", 
+    "What colors are available for Y?"). 
+    - Answer the question directly using the product information provided
+    - DO NOT show product cards - this is an informational query, not a product discovery query
+    - Provide specific details like sizes, colors, materials, etc. from the product context
+    - If the product is not found in the context, politely say you couldn't find that specific product
+    - Keep the response focused on answering the question, not recommending products
+"""
+_SYSTEM_PROMPT_TMPL = """You are a helpful product recommendation assistant for an e-commerce website. 
+Your role is to help users find products that match their needs based on their queries.
+
+IMPORTANT GUIDELINES:
+1. DO NOT list product names, titles, or create bullet points of products in your response (EXCEPT when answering specific questions about product details)
+{product_display_note}
+3. Your response should be a conversational explanation of why these products match the user's query
+4. Interpret abstract and nuanced queries (e.g., "something for gym and meetings", "furniture for 2bhk apartment")
+5. If the query is unclear or ambiguous, ask ONE clarifying question to better understand the user's needs
+6. Be conversational, friendly, and helpful
+7. If no products match well, politely explain why and suggest what might help
+8. Keep responses concise but informative (2-3 sentences)
+9. Focus on explaining the match between the query and the products, not listing them
+10. Consider price range, style, use case, and category when explaining matches
+11. ANSWER QUESTIONS ABOUT PRODUCT DETAILS: If users ask about specific product details like colors, sizes, materials, or other attributes, provide that information directly from the product context provided. For example, if asked "What colors does this come in?" or "What sizes are available?", list the available options clearly.
+12. PRODUCT IMAGES: Product images are automatically displayed by the system below your response. You should NEVER say you cannot show images, cannot display products, or that showing images is beyond your capabilities. The system handles image display automatically - you just need to provide helpful responses about the products. If users ask to see products or images, simply provide a helpful response and the system will display the product cards with images automatically.
+{color_emphasis}
+{price_emphasis}
+{informational_guidance}
+EXAMPLES OF GOOD RESPONSES:
+- "I found some great options that work well for both gym workouts and professional meetings. These pieces combine athletic functionality with a polished look that transitions seamlessly from exercise to office."
+- "These products match your search for casual everyday wear. They're comfortable, versatile pieces that work well for various occasions."
+- "I found some options, but could you tell me more about the specific style you're looking for? Are you interested in something more formal or casual?"
+- "The Zen Nova Dress comes in Smoke Grey. Available sizes are S, M, L, and XL." (when asked about specific product details)
+
+Product Context:
+"""
+_INFORMATIONAL_SYSTEM_PROMPT = _SYSTEM_PROMPT_TMPL.format(
+    product_display_note="2. DO NOT display product cards - this is an informational query, just provide the answer",
+    color_emphasis="",
+    price_emphasis="",
+    informational_guidance=_INFORMATIONAL_GUIDANCE,
+)
+# Keyed by whether the query names a colour; {price_emphasis} left to fill
+_DISCOVERY_SYSTEM_PROMPTS = {
+    is_color_query: _SYSTEM_PROMPT_TMPL.format(
+        product_display_note="2. The products will be displayed as cards with images below your message automatically",
+        color_emphasis=_COLOR_EMPHASIS if is_color_query else "",
+        price_emphasis="{price_emphasis}",
+        informational_guidance="",
+    )
+    for is_color_query in (False, True)
+}
+_INFORMATIONAL_INSTRUCTIONS = """
+The user is asking for information about a specific product. Please:
+1. Answer the question directly using the product information provided above
+2. Provide specific details like sizes, colors, materials, etc. from the product context
+3. If the product is not found in the context, politely say you couldn't find that specific product
+4. DO NOT show product cards - this is an informational query, just provide the answer
+5. Keep the response focused on answering the question, not recommending products
+
+Remember: 
+- This is an informational query, not a product discovery query
+- Answer the question directly without showing product recommendations
+- Provide specific details from the product context when available
+"""
+_DISCOVERY_INSTRUCTIONS = """
+Based on the above products, please:
+1. Interpret what the user is looking for
+2. If needed, ask ONE clarifying question to better understand their needs
+3. Provide a conversational response explaining why these products match (DO NOT list product names)
+4. If the query is clear and products match well, explain the match directly
+5. Consider the price range, category, and use cases when explaining relevance
+6. If the user asks about specific product details (colors, sizes, materials, etc.), provide that information directly from the product context above
+7. If users ask to see products, images, or want to view items, provide a helpful response - the system will automatically display product cards with images below your message
+
+Remember: 
+- DO NOT include product names or create lists when explaining matches
+- DO provide specific details (colors, sizes, etc.) when the user asks about them
+- DO NOT say you cannot show images or that displaying products is beyond your capabilities - the system handles this automatically
+- Just provide a natural conversational response - product images will be displayed automatically by the system
+"""
+_PROMPT_LAYOUT = "{system}{product_context}\n\n{history}\nUser Query: {user_query}\n{metadata}{instructions}"
+
+# Product comparison prompt: system text + product context + instructions
+# (formatted with the product count and identifiers)
+_COMPARE_SYSTEM_PROMPT = """You are a helpful product comparison assistant. Your role is to provide structured, easy-to-read comparisons between products.
+
+IMPORTANT GUIDELINES:
+1. Format your response as structured bullet points organized by category
+2. Use clear categories like: Price & Value, Key Features, Best For, Pros & Cons
+3. Be objective and balanced in your comparison
+4. Make it easy to scan and understand quickly
+5. Use bullet points (•) for each comparison point
+6. Focus on actionable insights that help users make decisions
+7. Keep each bullet point concise (one line or short phrase)
+
+Format your response like this (IMPORTANT: Always prefix each bullet point with the product name or identifier):
+**Price & Value**
+• [Product Name/Identifier]: [price info and value]
+• [Product Name/Identifier]: [price info and value]
+
+**Key Features**
+• [Product Name/Identifier]: [key features]
+• [Product Name/Identifier]: [key features]
+
+**Best For**
+• [Product Name/Identifier]: [use cases]
+• [Product Name/Identifier]: [use cases]
+
+**Pros & Cons**
+• [Product Name/Identifier]: Pros: [list pros], Cons: [list cons]
+OR format as:
+• [Product Name/Identifier]: [pros and cons description]
+• [Product Name/Identifier]: [pros and cons description]
+
+**Summary**
+• [Overall recommendation or key takeaway]
+
+CRITICAL: For each bullet point, ALWAYS start with the product name or a clear identifier (like "Product 1", "Product 2", or use part of the product title) followed by a colon (:). This ensures each point can be matched to the correct product.
+
+Product Context:
+"""
+_COMPARE_INSTRUCTIONS_TMPL = """
+Please compare these {count} products using structured bullet points organized by:
+1. Price & Value - Compare prices and value proposition
+2. Key Features - Highlight main feature differences
+3. Best For - Best use cases for each product
+4. Pros & Cons - List pros and cons for EACH product separately. Format: "Product X: Pros: [list], Cons: [list]" or "Product X: [pros and cons]"
+5. Summary - Overall recommendation
+
+IMPORTANT: For each bullet point, ALWAYS start with the product identifier followed by a colon (:).
+Use these identifiers: {identifiers}
+
+Example format:
+• Product 1 (Zen Nova): ₹2698.0
+• Product 2 (Zen Halo): ₹2698.0
+
+For Pros & Cons, ensure you provide pros and cons for EACH product separately. Example:
+• Product 1 (Zen Nova): Pros: Unique design, Cons: May not suit everyone
+• Product 2 (Zen Halo): Pros: Classic style, Cons: Less distinctive
+
+For Summary, provide a concise overall recommendation based on the comparison.
+
+Use bullet points (•) for each point. Make it easy to scan and compare quickly.
+"""
+
+# Follow-up suggestion prompt header (the per-request part follows it)
+_FOLLOW_UP_SYSTEM_PROMPT = """You are generating clickable follow-up question suggestions for a product recommendation chat.
+
+CRITICAL UNDERSTANDING:
+- These are SUGGESTIONS for what the USER can click/ask next
+- These are NOT questions the AI assistant would ask the user
+- These are questions the USER would type or click to continue exploring
+- Think of these as "quick reply" buttons the user can click
+
+Your task is to generate 3-5 natural follow-up questions that:
+1. The USER can click/ask to explore products further
+2. Are directly relevant to what the user just asked about
+3. Help the user refine their search or learn more about products
+4. Are concise (under 12 words each)
+5. Sound natural and conversational
+
+IMPORTANT GUIDELINES:
+- These are USER questions that the user would ask, NOT assistant questions
+- DO NOT generate questions asking the user for information (like "What kind of event?" or "What's your budget?")
+- DO generate questions the user would ask to explore products (like "Show me more options" or "What are the best sellers?")
+- Base questions on the USER'S query and what they might want to explore next
+- If products were shown, questions can reference exploring those products further
+- Questions should help users explore, compare, or refine their product search
+
+WRONG EXAMPLES (these are assistant asking user - DO NOT GENERATE THESE):
+- "What kind of formal event is it?" ❌ (assistant asking user)
+- "What is the dress code?" ❌ (assistant asking user)
+- "What's your budget?" ❌ (assistant asking user)
+- "Do you need shoes or accessories?" ❌ (assistant asking user)
+- "Are you looking for a dress?" ❌ (assistant asking user)
+
+CORRECT EXAMPLES (these are user asking about products - GENERATE THESE):
+- "Show me more formal options" ✅ (user exploring)
+- "What are the best sellers?" ✅ (user asking about products)
+- "Can you show me different colors?" ✅ (user exploring)
+- "What sizes are available?" ✅ (user asking about products)
+- "Show me similar products" ✅ (user exploring)
+- "Compare these products" ✅ (user exploring)
+- "What are the best alternatives?" ✅ (user exploring)
+
+Format: Return ONLY a simple list, one question per line, no numbering, no bullets, no extra formatting.
+Each line should be a complete, natural question that the USER would click/ask next.
+"""
+
+# Recommendation responses cached in Redis by prompt; bump PROMPT_VERSION when
+# the prompt or response post-processing changes
+PROMPT_VERSION = "4"
+LLM_RESPONSE_KEY_PREFIX = "rag:llm_response:"
+LLM_RESPONSE_TTL_SECONDS = 3600
+
+
+def _get_llm_semaphore() -> asyncio.Semaphore:
+    """Get the semaphore limiting concurrent LLM calls."""
+    global _llm_semaphore
+    if _llm_semaphore is None:
+        _llm_semaphore = asyncio.Semaphore(settings.LLM_MAX_CONCURRENCY)
+    return _llm_semaphore
+
+
+# First-turn recommendations are also reused for near-identical phrasings.
+# Entries are keyed on the (per-process) index version; the TTL matches the
+# search cache so answers quoting product details changed by another worker's
+# scrape age out just as quickly.
+SEMANTIC_CACHE_SIZE = 256
+SEMANTIC_CACHE_TTL_SECONDS = SEARCH_CACHE_TTL_SECONDS
+SEMANTIC_CACHE_MIN_SIMILARITY = 0.95
+
+
+class _SemanticResponseCache:
+    """
+    Recent recommendation results, looked up by query-embedding similarity.
+    
+    Entries keep product ids rather than ORM objects and are tagged with the
+    embedding index version, so catalog/embedding updates retire them.
+    """
+    
+    def __init__(self, maxsize: int, ttl_seconds: float, min_similarity: float):
+        self._entries = collections.deque(maxlen=maxsize)
+        self._ttl_seconds = ttl_seconds
+        self._min_similarity = min_similarity
+        self._lock = threading.Lock()
+    
+    def get(self, embedding: np.ndarray, params: tuple) -> Optional[Dict[str, Any]]:
+        """
+        Find the most similar live entry for the same search parameters.
+        
+        Args:
+            embedding: Query embedding
+            params: Search parameters the entry must have been computed with
+        
+        Returns:
+            The cached entry, or None if none is at least min_similarity close
+        """
+        now = time.monotonic()
+        version = get_index_version()
+        with self._lock:
+            candidates = [
+                entry for entry in self._entries
+                if entry["params"] == params and entry["version"] == version and entry["expires"] > now
+            ]
+        if not candidates:
+            return None
+        
+        query = np.asarray(embedding, dtype=np.float32)
+        query = query / (np.linalg.norm(query) or 1.0)
+        similarities = np.stack([entry["embedding"] for entry in candidates]) @ query
+        best = int(np.argmax(similarities))
+        if similarities[best] < self._min_similarity:
+            return None
+        return candidates[best]
+    
+    def put(self, embedding: np.ndarray, params: tuple, version: int, result: Dict[str, Any]) -> None:
+        """
+        Cache a result for a query embedding.
+        
+        Args:
+            embedding: Query embedding
+            params: Search parameters the result was computed with
+            version: Index version the search ran against
+            result: response, needs_clarification, product_ids and scores
+        """
+        vector = np.asarray(embedding, dtype=np.float32)
+        entry = {
+            **result,
+            "embedding": vector / (np.linalg.norm(vector) or 1.0),
+            "params": params,
+            "version": version,
+            "expires": time.monotonic() + self._ttl_seconds,
+        }
+        with self._lock:
+            self._entries.append(entry)
+
+
+_semantic_cache = _SemanticResponseCache(
+    SEMANTIC_CACHE_SIZE, SEMANTIC_CACHE_TTL_SECONDS, SEMANTIC_CACHE_MIN_SIMILARITY
+)
+
+
+# Concurrent first-turn recommendation prompts can share one LLM call (off
+# when the window is 0). The requests come from different users, so answers
+# are matched back by id rather than by their position in the reply.
+_BATCH_PROMPT_HEADER = (
+    "The following {count} requests come from different, unrelated users. Answer each "
+    "one independently, using only the text of that request; never mention, quote or "
+    "use anything from another request. Return ONLY a JSON array of {count} objects "
+    "of the form {{\"id\": <request id>, \"answer\": \"<complete answer>\"}}, one per "
+    "request id.\n\n"
+)
+_BATCH_REQUEST_TMPL = "### Request id {number}\n{prompt}\n\n"
+
+
+def _response_text(response: Any) -> str:
+    """Extract the text of an LLM response (empty string if it has none)."""
+    if hasattr(response, 'text'):
+        return str(response.text or "")
+    if hasattr(response, 'candidates') and response.candidates:
+        candidate = response.candidates[0]
+        if hasattr(candidate, 'content') and hasattr(candidate.content, 'parts'):
+            parts = candidate.content.parts
+            if parts:
+                return str(parts[0].text) if hasattr(parts[0], 'text') else str(parts[0])
+    return str(response)
+
+
+class _PromptBatcher:
+    """
+    Micro-batches concurrent prompts into one LLM call (row-marshaling).
+    
+    Prompts arriving within the window of the first one (up to max_size) are
+    sent as a single request asking for a JSON array of {id, answer} objects.
+    If the reply doesn't carry exactly one answer per request id, each prompt
+    is sent on its own instead.
+    
+    Batched prompts share one model context, so callers must only submit
+    prompts without conversation history (first-turn, catalog-only context).
+    """
+    
+    def __init__(self, window_seconds: float, max_size: int):
+        self._window = window_seconds
+        self._max_size = max_size
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        # Strong references to in-flight batch calls
+        self._calls: set = set()
+    
+    async def generate(self, client: genai.Client, model: str, prompt: str) -> str:
+        """
+        Generate a response for a prompt, possibly batched with others.
+        
+        Args:
+            client: Gemini client
+            model: Model name
+            prompt: Full prompt
+            
+        Returns:
+            Response text
+        """
+        loop = asyncio.get_running_loop()
+        # The queue and worker belong to the loop that created them
+        if self._loop is not loop:
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._worker = None
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.create_task(self._collect())
+        future = loop.create_future()
+        await self._queue.put((client, model, prompt, future))
+        return await future
+    
+    async def _collect(self) -> None:
+        """Gather queued prompts into batches and dispatch them."""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self._window
+            while len(batch) < self._max_size:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            
+            # Dispatch without blocking the next window
+            call = asyncio.create_task(self._dispatch(batch))
+            self._calls.add(call)
+            call.add_done_callback(self._calls.discard)
+    
+    async def _dispatch(self, batch: List[tuple]) -> None:
+        """Answer a batch of queued prompts and resolve their futures."""
+        client, model = batch[0][0], batch[0][1]
+        prompts = [item[2] for item in batch]
+        try:
+            answers = await self._generate_batch(client, model, prompts) if len(batch) > 1 else None
+            if answers is None:
+                answers = await asyncio.gather(
+                    *(self._generate(client, model, prompt) for prompt in prompts),
+                    return_exceptions=True
+                )
+        except Exception as e:
+            answers = [e] * len(batch)
+        
+        for (_, _, _, future), answer in zip(batch, answers):
+            if future.done():
+                continue
+            if isinstance(answer, BaseException):
+                future.set_exception(answer)
+            else:
+                future.set_result(answer)
+    
+    async def _generate(self, client: genai.Client, model: str, contents: str, config: Any = None) -> str:
+        """Make one LLM call under the concurrency limit."""
+        async with _get_llm_semaphore():
+            response = await client.aio.models.generate_content(model=model, contents=contents, config=config)
+        return _response_text(response)
+    
+    async def _generate_batch(self, client: genai.Client, model: str, prompts: List[str]) -> Optional[List[str]]:
+        """
+        Answer several prompts with one LLM call.
+        
+        Args:
+            client: Gemini client
+            model: Model name
+            prompts: Prompts to answer
+            
+        Returns:
+            One answer per prompt (in prompt order), or None if the call
+            failed or its reply didn't carry exactly one string answer for
+            each request id
+        """
+        contents = _BATCH_PROMPT_HEADER.format(count=len(prompts)) + "".join(
+            _BATCH_REQUEST_TMPL.format(number=number, prompt=prompt)
+            for number, prompt in enumerate(prompts, 1)
+        )
+        try:
+            text = await self._generate(
+                client, model, contents,
+                types.GenerateContentConfig(response_mime_type="application/json")
+            )
+            items = orjson.loads(text)
+        except Exception as e:
+            logger.warning(f"Batched LLM call for {len(prompts)} prompts failed, sending individually: {e}")
+            return None
+        
+        answers: Dict[int, str] = {}
+        if isinstance(items, list):
+            for item in items:
+                if not isinstance(item, dict):
+                    break
+                request_id, answer = item.get("id"), item.get("answer")
+                # bool is an int subclass; duplicate ids mean a mixed-up reply
+                if type(request_id) is not int or not isinstance(answer, str) or request_id in answers:
+                    break
+                answers[request_id] = answer
+            else:
+                if len(items) == len(prompts) and set(answers) == set(range(1, len(prompts) + 1)):
+                    logger.info(f"Answered {len(prompts)} prompts with one LLM call")
+                    return [answers[number] for number in range(1, len(prompts) + 1)]
+        logger.warning(f"Batched LLM reply didn't match {len(prompts)} request ids, sending individually")
+        return None
+
+
+_prompt_batcher = _PromptBatcher(settings.LLM_BATCH_WINDOW_MS / 1000, settings.LLM_BATCH_MAX_SIZE)
+
+
+# Marks the end of a threaded LLM stream
+_STREAM_END = object()
+
+
+async def _stream_llm_text(client: genai.Client, model: str, prompt: str) -> AsyncIterator[str]:
+    """
+    Stream response text from the blocking Gemini stream in a worker thread.
+    
+    google-genai 0.2.2's aio generate_content_stream reads the HTTP stream on
+    the event loop, blocking every other request for the whole generation.
+    The sync iterator is driven in a thread instead, handing chunks back
+    through an asyncio.Queue.
+    
+    An LLM concurrency slot is held only while the thread generates; chunks
+    are buffered in the unbounded queue, so a slow consumer downstream never
+    keeps the slot for its whole download.
+    
+    Args:
+        client: Gemini client
+        model: Model name
+        prompt: Full prompt
+    
+    Yields:
+        Text of each streamed chunk
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+    stop = threading.Event()
+    
+    def put(item: Any) -> None:
+        try:
+            loop.call_soon_threadsafe(queue.put_nowait, item)
+        except RuntimeError:
+            # Event loop already closed; nobody is listening
+            stop.set()
+    
+    def pump() -> None:
+        try:
+            for chunk in client.models.generate_content_stream(model=model, contents=prompt):
+                if stop.is_set():
+                    break
+                put(chunk.text or "")
+        except Exception as e:
+            put(e)
+        finally:
+            put(_STREAM_END)
+    
+    semaphore = _get_llm_semaphore()
+    await semaphore.acquire()
+    try:
+        generation = loop.run_in_executor(None, pump)
+    except BaseException:
+        semaphore.release()
+        raise
+    generation.add_done_callback(lambda _: semaphore.release())
+    try:
+        while True:
+            item = await queue.get()
+            if item is _STREAM_END:
+                break
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        # Stops the thread at its next chunk if the consumer went away early
+        stop.set()
+
+
+@lru_cache(maxsize=1)
+def get_llm_client() -> genai.Client:
+    """
+    Get the process-wide Gemini client for LLM calls.
+    
+    RAGService is created per request; sharing one client avoids rebuilding
+    its configuration each time.
+    
+    Raises:
+        ValueError: If the client can't be created (e.g. GEMINI_API_KEY is not set)
+    """
+    return genai.Client(api_key=settings.GEMINI_API_KEY)
+
 
 class RAGService:
     """RAG service that combines vector search with LLM for intelligent product recommendations."""
@@ -30,14 +745,69 @@ class RAGService:
             self.llm_client = None
         else:
             try:
-                self.llm_client = genai.Client(api_key=settings.GEMINI_API_KEY)
+                self.llm_client = get_llm_client()
                 self.llm_model = "gemini-2.0-flash"  # Fast and cost-effective for chat
             except Exception as e:
                 logger.error(f"Failed to initialize LLM client: {e}")
                 self.llm_client = None
     
+    def _llm_cache_key(self, prompt: str) -> str:
+        """Redis key for a recommendation prompt (SHA-256 of version, model and prompt)."""
+        digest = hashlib.sha256(f"{PROMPT_VERSION}:{self.llm_model}:{prompt}".encode("utf-8")).hexdigest()
+        return f"{LLM_RESPONSE_KEY_PREFIX}{digest}"
+    
+    async def _get_cached_response(self, cache_key: str) -> Optional[Tuple[str, bool]]:
+        """
+        Look up a cached recommendation response.
+        
+        Args:
+            cache_key: Key from _llm_cache_key
+        
+        Returns:
+            Tuple of (cleaned_response, needs_clarification), or None on a miss
+            or if Redis is unavailable
+        """
+        try:
+            data = await get_redis_client().get(cache_key)
+            if data:
+                response, needs_clarification = orjson.loads(data)
+                return response, needs_clarification
+        except Exception as e:
+            logger.warning(f"Error reading cached LLM response: {e}")
+        return None
+    
+    async def _cache_response(self, cache_key: str, response: str, needs_clarification: bool) -> None:
+        """
+        Cache a recommendation response for LLM_RESPONSE_TTL_SECONDS.
+        
+        Args:
+            cache_key: Key from _llm_cache_key
+            response: Cleaned LLM response text
+            needs_clarification: Whether the response asks for clarification
+        """
+        try:
+            await get_redis_client().setex(
+                cache_key,
+                LLM_RESPONSE_TTL_SECONDS,
+                orjson.dumps([response, needs_clarification])
+            )
+        except Exception as e:
+            logger.warning(f"Error caching LLM response: {e}")
+    
+    def _remember_result(self, prepared: Dict[str, Any], result: Dict[str, Any]) -> None:
+        """Add a generated first-turn result to the semantic cache."""
+        if prepared["semantic_key"] is None:
+            return
+        embedding, params, version = prepared["semantic_key"]
+        _semantic_cache.put(embedding, params, version, {
+            "response": result["response"],
+            "needs_clarification": result["needs_clarification"],
+            "product_ids": [product.id for product in result["products"]],
+            "scores": list(result["scores"]),
+        })
+    
     def _format_product_context(self, products: List[Product]) -> str:
-        """Format products as context for LLM."""
+        """Format products as context for LLM: one compact JSON object per product."""
         if not products:
             return "No products found."
         
@@ -50,24 +820,21 @@ class RAGService:
             
             # Safely extract product fields with defaults
             try:
-                title = str(product.title) if product.title else "Untitled Product"
-                price = product.price if product.price is not None else None
-                vendor = str(product.vendor) if product.vendor else "N/A"
-                category = str(product.product_type) if product.product_type else "N/A"
-                description = str(product.description) if product.description else "N/A"
-                
-                # Truncate description to avoid overly long context
-                if len(description) > 200:
-                    description = description[:200] + "..."
-                
-                product_info = f"""
-Product {i}:
-- Title: {title}
-- Price: ₹{price if price is not None else 'N/A'}
-- Vendor: {vendor}
-- Category: {category}
-- Description: {description}
-"""
+                # Keys are described once in _PRODUCT_CONTEXT_LEGEND; missing
+                # fields are left out
+                product_info = {"n": i, "t": str(product.title) if product.title else "Untitled Product"}
+                if product.price is not None:
+                    product_info["p"] = product.price
+                if product.vendor:
+                    product_info["v"] = str(product.vendor)
+                if product.product_type:
+                    product_info["c"] = str(product.product_type)
+                if product.description:
+                    description = str(product.description)
+                    # Truncate description to avoid overly long context
+                    if len(description) > 200:
+                        description = description[:200] + "..."
+                    product_info["d"] = description
             except Exception as e:
                 logger.warning(f"Error formatting product {i}: {e}, skipping")
                 continue
@@ -77,7 +844,7 @@ Product {i}:
                     # Filter out None/empty tags
                     valid_tags = [str(tag) for tag in product.tags[:5] if tag and str(tag).strip()]
                     if valid_tags:
-                        product_info += f"- Tags: {', '.join(valid_tags)}\n"
+                        product_info["tg"] = valid_tags
             except Exception as e:
                 logger.debug(f"Error processing tags for product {i}: {e}")
             
@@ -92,21 +859,8 @@ Product {i}:
                         # Collect unique option values from variants
                         colors = set()
                         sizes = set()
-                        # Common color keywords (including compound colors like "deep burgundy")
-                        color_keywords = [
-                            'red', 'blue', 'green', 'black', 'white', 'yellow', 'pink', 'purple', 
-                            'orange', 'gray', 'grey', 'brown', 'beige', 'navy', 'maroon', 'teal', 
-                            'coral', 'ivory', 'cream', 'tan', 'khaki', 'burgundy', 'deep burgundy',
-                            'magenta', 'cyan', 'lime', 'olive', 'salmon', 'turquoise', 'violet', 'indigo',
-                            'charcoal', 'peach', 'mint', 'lavender', 'rose', 'gold', 'silver',
-                            'bronze', 'copper', 'plum', 'emerald', 'sapphire', 'ruby', 'amber',
-                            'smoke', 'sage', 'stone', 'sand', 'camel', 'cognac', 'mocha', 'espresso',
-                            'deep', 'light', 'dark', 'bright', 'pale', 'vibrant'
-                        ]
-                        # Common size patterns
-                        size_patterns = ['xs', 's', 'm', 'l', 'xl', 'xxl', 'xxxl', 'xxxxl', 
-                                        'small', 'medium', 'large', 'extra small', 'extra large',
-                                        'one size', 'os', 'free size']
+                        color_keywords = _COLOR_KEYWORDS
+                        size_patterns = _SIZE_PATTERNS
                         
                         for variant in variants:
                             if not isinstance(variant, dict):
@@ -192,9 +946,9 @@ Product {i}:
                         
                         # Add colors and sizes to product info
                         if colors:
-                            product_info += f"- Available Colors: {', '.join(sorted(colors))}\n"
+                            product_info["col"] = sorted(colors)
                         if sizes:
-                            product_info += f"- Available Sizes: {', '.join(sorted(sizes))}\n"
+                            product_info["sz"] = sorted(sizes)
                         
                         # Add detailed variant information: sizes available for each color
                         # This helps answer queries like "What sizes does X come in for Deep Burgundy?"
@@ -236,14 +990,10 @@ Product {i}:
                         
                         # Add color-specific size information
                         if color_size_map:
-                            product_info += "- Sizes by Color:\n"
-                            for color, size_set in sorted(color_size_map.items()):
-                                sorted_sizes = sorted(size_set, key=lambda x: (
-                                    ['xs', 's', 'm', 'l', 'xl', 'xxl', 'xxxl'].index(x.lower()) 
-                                    if x.lower() in ['xs', 's', 'm', 'l', 'xl', 'xxl', 'xxxl'] 
-                                    else 999, x
-                                ))
-                                product_info += f"  • {color}: {', '.join(sorted_sizes)}\n"
+                            product_info["szc"] = {
+                                color: sorted(size_set, key=lambda x: (_SIZE_ORDER.get(x.lower(), 999), x))
+                                for color, size_set in sorted(color_size_map.items())
+                            }
                 
                 # Also check options structure if available
                 if isinstance(features, dict) and "options" in features:
@@ -257,13 +1007,13 @@ Product {i}:
                                 valid_values = [str(v) for v in option_values if v and str(v).strip()]
                                 if valid_values:
                                     if "color" in option_name or "colour" in option_name:
-                                        product_info += f"- Available Colors: {', '.join(valid_values)}\n"
+                                        product_info["col"] = list(dict.fromkeys(product_info.get("col", []) + valid_values))
                                     elif "size" in option_name:
-                                        product_info += f"- Available Sizes: {', '.join(valid_values)}\n"
+                                        product_info["sz"] = list(dict.fromkeys(product_info.get("sz", []) + valid_values))
             
-            context_parts.append(product_info)
+            context_parts.append(orjson.dumps(product_info).decode())
         
-        return "\n".join(context_parts)
+        return _PRODUCT_CONTEXT_LEGEND + "\n".join(context_parts)
     
     def _calculate_metadata_context(self, products: List[Product]) -> str:
         """Calculate metadata context for products (price range, categories, etc.)."""
@@ -272,199 +1022,92 @@ Product {i}:
         
         context_parts = []
         
-        try:
-            # Calculate average price with safe handling
-            prices = []
-            for p in products:
-                if p and p.price is not None:
-                    try:
-                        price = float(p.price)
-                        if price > 0:  # Only include valid positive prices
-                            prices.append(price)
-                    except (ValueError, TypeError):
-                        continue
-            
-            if prices:
-                avg_price = sum(prices) / len(prices)
-                if avg_price > 0:
-                    if avg_price < 50:
-                        price_range = "budget-friendly"
-                    elif avg_price < 150:
-                        price_range = "mid-range"
-                    else:
-                        price_range = "premium"
-                    context_parts.append(f"Products are in the {price_range} price range (average ₹{avg_price:.0f}).")
-        except Exception as e:
-            logger.debug(f"Error calculating price metadata: {e}")
-        
-        try:
-            # Find common category with safe handling
-            categories = []
-            for p in products:
-                if p and p.product_type:
-                    try:
-                        category = str(p.product_type).strip()
-                        if category:
-                            categories.append(category)
-                    except Exception:
-                        continue
-            
-            if categories:
+        # One pass collects valid positive prices and category counts
+        prices = []
+        categories = collections.Counter()
+        for p in products:
+            if not p:
+                continue
+            if p.price is not None:
                 try:
-                    common_category = max(set(categories), key=categories.count)
-                    if common_category:
-                        context_parts.append(f"Most products are in the {common_category} category.")
-                except Exception as e:
-                    logger.debug(f"Error finding common category: {e}")
-        except Exception as e:
-            logger.debug(f"Error calculating category metadata: {e}")
+                    price = float(p.price)
+                    if price > 0:  # Only include valid positive prices
+                        prices.append(price)
+                except (ValueError, TypeError):
+                    pass
+            if p.product_type:
+                category = str(p.product_type).strip()
+                if category:
+                    categories[category] += 1
+        
+        if prices:
+            avg_price = sum(prices) / len(prices)
+            if avg_price < 50:
+                price_range = "budget-friendly"
+            elif avg_price < 150:
+                price_range = "mid-range"
+            else:
+                price_range = "premium"
+            context_parts.append(f"Products are in the {price_range} price range (average ₹{avg_price:.0f}).")
+        
+        if categories:
+            # Counter.most_common is O(n); ties go to the first category seen
+            common_category = categories.most_common(1)[0][0]
+            context_parts.append(f"Most products are in the {common_category} category.")
         
         return " ".join(context_parts)
     
     def _build_prompt(
-        self,
-        user_query: str,
-        products: List[Product],
-        conversation_history: Optional[List[Dict[str, str]]] = None,
-        is_informational: bool = False
-    ) -> str:
-        """Build improved prompt for the LLM with better context."""
-        product_context = self._format_product_context(products)
-        metadata_context = self._calculate_metadata_context(products)
-        
-        # Check if query contains color-related terms
-        color_keywords = [
-            'red', 'blue', 'green', 'black', 'white', 'yellow', 'pink', 'purple', 
-            'orange', 'gray', 'grey', 'brown', 'beige', 'navy', 'maroon', 'teal', 
-            'coral', 'ivory', 'cream', 'tan', 'khaki', 'burgundy', 'deep burgundy',
-            'magenta', 'cyan', 'lime', 'olive', 'salmon', 'turquoise', 'violet', 'indigo',
-            'charcoal', 'peach', 'mint', 'lavender', 'rose', 'gold', 'silver',
-            'bronze', 'copper', 'plum', 'emerald', 'sapphire', 'ruby', 'amber',
-            'color', 'colour', 'hue', 'shade'
-        ]
-        query_lower = user_query.lower()
-        is_color_query = any(keyword in query_lower for keyword in color_keywords)
-        
-        # Check if query contains price-related terms
-        price_info = self._parse_price_query(user_query)
-        is_price_query = price_info and price_info.get("is_price_query", False)
-        
-        color_emphasis = ""
-        if is_color_query and not is_informational:
-            color_emphasis = """
-12. COLOR QUERIES: If the user is searching for a specific color (e.g., "Deep Burgundy", "red", "blue"), 
-    emphasize products that have that exact color available. The product cards will automatically show 
-    the color-specific variant image when available. Make sure to highlight that these products come 
-    in the requested color.
-"""
-        
-        price_emphasis = ""
-        if is_price_query and not is_informational:
-            price_constraints = []
-            if price_info.get("min_price"):
-                price_constraints.append(f"minimum ₹{price_info['min_price']:.0f}")
-            if price_info.get("max_price"):
-                price_constraints.append(f"maximum ₹{price_info['max_price']:.0f}")
-            
-            price_constraint_text = " and ".join(price_constraints) if price_constraints else "specific price range"
-            
-            price_emphasis = f"""
-13. PRICE QUERIES: The user is searching for products within a {price_constraint_text}. 
-    - Emphasize that the products shown match their price requirements
-    - Mention the price range in your response (e.g., "These products are all under ₹{price_info.get('max_price', 'N/A'):.0f}" or "These are budget-friendly options")
-    - Highlight value proposition when relevant
-    - If no products match the price criteria, explain this clearly and suggest adjusting the price range
-"""
-        
-        informational_guidance = ""
-        if is_informational:
-            informational_guidance = """
-12. INFORMATIONAL QUERIES: The user is asking for information about a specific product (e.g., "What sizes does X come in?", 
-    "What colors are available for Y?"). 
-    - Answer the question directly using the product information provided
-    - DO NOT show product cards - this is an informational query, not a product discovery query
-    - Provide specific details like sizes, colors, materials, etc. from the product context
-    - If the product is not found in the context, politely say you couldn't find that specific product
-    - Keep the response focused on answering the question, not recommending products
-"""
-        
-        product_display_note = "2. The products will be displayed as cards with images below your message automatically" if not is_informational else "2. DO NOT display product cards - this is an informational query, just provide the answer"
-        
-        system_prompt = f"""You are a helpful product recommendation assistant for an e-commerce website. 
-Your role is to help users find products that match their needs based on their queries.
-
-IMPORTANT GUIDELINES:
-1. DO NOT list product names, titles, or create bullet points of products in your response (EXCEPT when answering specific questions about product details)
-{product_display_note}
-3. Your response should be a conversational explanation of why these products match the user's query
-4. Interpret abstract and nuanced queries (e.g., "something for gym and meetings", "furniture for 2bhk apartment")
-5. If the query is unclear or ambiguous, ask ONE clarifying question to better understand the user's needs
-6. Be conversational, friendly, and helpful
-7. If no products match well, politely explain why and suggest what might help
-8. Keep responses concise but informative (2-3 sentences)
-9. Focus on explaining the match between the query and the products, not listing them
-10. Consider price range, style, use case, and category when explaining matches
-11. ANSWER QUESTIONS ABOUT PRODUCT DETAILS: If users ask about specific product details like colors, sizes, materials, or other attributes, provide that information directly from the product context provided. For example, if asked "What colors does this come in?" or "What sizes are available?", list the available options clearly.
-12. PRODUCT IMAGES: Product images are automatically displayed by the system below your response. You should NEVER say you cannot show images, cannot display products, or that showing images is beyond your capabilities. The system handles image display automatically - you just need to provide helpful responses about the products. If users ask to see products or images, simply provide a helpful response and the system will display the product cards with images automatically.
-{color_emphasis}
-{price_emphasis}
-{informational_guidance}
-EXAMPLES OF GOOD RESPONSES:
-- "I found some great options that work well for both gym workouts and professional meetings. These pieces combine athletic functionality with a polished look that transitions seamlessly from exercise to office."
-- "These products match your search for casual everyday wear. They're comfortable, versatile pieces that work well for various occasions."
-- "I found some options, but could you tell me more about the specific style you're looking for? Are you interested in something more formal or casual?"
-- "The Zen Nova Dress comes in Smoke Grey. Available sizes are S, M, L, and XL." (when asked about specific product details)
-
-Product Context:
-"""
-        
-        user_prompt = f"""
-User Query: {user_query}
-"""
-        
-        if metadata_context:
-            user_prompt += f"\nContext: {metadata_context}\n"
-        
-        if is_informational:
-            user_prompt += """
-The user is asking for information about a specific product. Please:
-1. Answer the question directly using the product information provided above
-2. Provide specific details like sizes, colors, materials, etc. from the product context
-3. If the product is not found in the context, politely say you couldn't find that specific product
-4. DO NOT show product cards - this is an informational query, just provide the answer
-5. Keep the response focused on answering the question, not recommending products
-
-Remember: 
-- This is an informational query, not a product discovery query
-- Answer the question directly without showing product recommendations
-- Provide specific details from the product context when available
-"""
-        else:
-            user_prompt += """
-Based on the above products, please:
-1. Interpret what the user is looking for
-2. If needed, ask ONE clarifying question to better understand their needs
-3. Provide a conversational response explaining why these products match (DO NOT list product names)
-4. If the query is clear and products match well, explain the match directly
-5. Consider the price range, category, and use cases when explaining relevance
-6. If the user asks about specific product details (colors, sizes, materials, etc.), provide that information directly from the product context above
-7. If users ask to see products, images, or want to view items, provide a helpful response - the system will automatically display product cards with images below your message
-
-Remember: 
-- DO NOT include product names or create lists when explaining matches
-- DO provide specific details (colors, sizes, etc.) when the user asks about them
-- DO NOT say you cannot show images or that displaying products is beyond your capabilities - the system handles this automatically
-- Just provide a natural conversational response - product images will be displayed automatically by the system
-"""
+        self,
+        user_query: str,
+        products: List[Product],
+        conversation_history: Optional[List[Dict[str, str]]] = None,
+        is_informational: bool = False
+    ) -> str:
+        """Build improved prompt for the LLM with better context."""
+        product_context = self._format_product_context(products)
+        metadata_context = self._calculate_metadata_context(products)
+        
+        if is_informational:
+            system_prompt = _INFORMATIONAL_SYSTEM_PROMPT
+        else:
+            # Check if query contains color-related terms
+            query_lower = user_query.lower()
+            is_color_query = any(keyword in query_lower for keyword in _COLOR_QUERY_KEYWORDS)
+            
+            # Check if query contains price-related terms
+            price_emphasis = ""
+            price_info = self._parse_price_query(user_query)
+            if price_info and price_info.get("is_price_query", False):
+                price_constraints = []
+                if price_info.get("min_price"):
+                    price_constraints.append(f"minimum ₹{price_info['min_price']:.0f}")
+                if price_info.get("max_price"):
+                    price_constraints.append(f"maximum ₹{price_info['max_price']:.0f}")
+                
+                price_emphasis = _PRICE_EMPHASIS_TMPL.format(
+                    price_constraint_text=" and ".join(price_constraints) if price_constraints else "specific price range",
+                    max_price=price_info.get('max_price', 'N/A'),
+                )
+            
+            system_prompt = _DISCOVERY_SYSTEM_PROMPTS[is_color_query].format_map({"price_emphasis": price_emphasis})
         
+        history = ""
         if conversation_history:
             history_text = "\n".join([
                 f"{'User' if msg['role'] == 'user' else 'Assistant'}: {msg['content']}"
                 for msg in conversation_history[-5:]  # Last 5 messages for context
             ])
-            user_prompt = f"Previous conversation:\n{history_text}\n\n{user_prompt}"
+            history = f"Previous conversation:\n{history_text}\n\n"
         
-        return system_prompt + product_context + "\n\n" + user_prompt
+        return _PROMPT_LAYOUT.format_map({
+            "system": system_prompt,
+            "product_context": product_context,
+            "history": history,
+            "user_query": user_query,
+            "metadata": f"\nContext: {metadata_context}\n" if metadata_context else "",
+            "instructions": _INFORMATIONAL_INSTRUCTIONS if is_informational else _DISCOVERY_INSTRUCTIONS,
+        })
     
     def _parse_price_query(self, query: str) -> Optional[Dict[str, Any]]:
         """
@@ -504,9 +1147,7 @@ Remember:
                 price_info["is_price_query"] = True
             
             # Extract numeric price values (handle ₹, Rs, rupee formats)
-            # Pattern: (₹|Rs|rupee|rupees)?\s*(\d+([.,]\d+)?)
-            price_pattern = r'(?:₹|rs\.?|rupees?|inr)?\s*(\d+(?:[.,]\d+)?)'
-            price_matches = re.findall(price_pattern, query_lower, re.IGNORECASE)
+            price_matches = _PRICE_RE.findall(query_lower)
             
             # Convert to float values
             price_values = []
@@ -650,28 +1291,9 @@ Remember:
             if not query_lower:
                 return False
             
-            # Informational query patterns
-            informational_patterns = [
-                r'what (sizes?|colors?|colours?|materials?|features?|specs?|specifications?) (does|do|is|are)',
-                r'does .+ (come|comes) in',
-                r'is .+ available in',
-                r'can .+ (come|comes) in',
-                r'tell me (about|more about)',
-                r'what (is|are) .+ (sizes?|colors?|colours?|materials?|features?)',
-                r'does .+ have',
-                r'what (does|do) .+ (have|come in)',
-                r'is .+ (available|in stock)',
-                r'how much (does|do|is) .+ (cost|price)',
-            ]
-            
             # Check if query matches informational patterns
-            for pattern in informational_patterns:
-                try:
-                    if re.search(pattern, query_lower):
-                        return True
-                except re.error as e:
-                    logger.debug(f"Invalid regex pattern {pattern}: {e}")
-                    continue
+            if any(pattern.search(query_lower) for pattern in _INFORMATIONAL_RES):
+                return True
             
             # Check if query starts with informational question words and mentions a specific product
             question_starters = ['what', 'does', 'is', 'can', 'tell me', 'show me']
@@ -685,28 +1307,28 @@ Remember:
             logger.warning(f"Error detecting informational query: {e}")
             return False
     
-    def recommend_products(
+    async def _prepare_recommendation(
         self,
         user_query: str,
-        max_results: int = 5,
-        similarity_threshold: float = 0.6,
-        conversation_history: Optional[List[Dict[str, str]]] = None,
-        auto_adjust_threshold: bool = True
+        max_results: int,
+        similarity_threshold: float,
+        conversation_history: Optional[List[Dict[str, str]]],
+        auto_adjust_threshold: bool
     ) -> Dict[str, Any]:
         """
-        Recommend products based on user query using RAG.
+        Validate a recommendation request, retrieve products and build the LLM prompt.
         
         Args:
             user_query: User's natural language query
             max_results: Maximum number of products to retrieve
             similarity_threshold: Minimum similarity score for products
             conversation_history: Previous conversation messages for context
+            auto_adjust_threshold: Whether to adjust the threshold to the query
         
         Returns:
-            Dictionary with:
-            - response: LLM-generated response text
-            - products: List of recommended products
-            - needs_clarification: Whether the LLM is asking for clarification
+            Either a finished result (same shape as recommend_products) when no
+            LLM call is needed, or a dictionary with prompt, products, scores,
+            is_informational and semantic_key (for _remember_result)
         """
         # Validate inputs
         if not user_query or not isinstance(user_query, str):
@@ -771,12 +1393,52 @@ Remember:
                 except Exception as e:
                     logger.warning(f"Error adjusting threshold: {e}, using default")
             
+            # Constraints parsed from the query text change the answer, so
+            # they're part of the semantic cache key below
+            price_info = self._parse_price_query(user_query)
+            is_informational = self._is_informational_query(user_query)
+            
+            # First-turn queries close enough to a recent one reuse its answer
+            # (the embedding is memoized, so the search below doesn't redo it)
+            semantic_key = None
+            if not conversation_history:
+                try:
+                    query_embedding = await run_db(self.vector_search.embed_query, user_query)
+                    if query_embedding is not None:
+                        params = (
+                            max_results,
+                            round(similarity_threshold, 3),
+                            price_info.get("min_price") if price_info else None,
+                            price_info.get("max_price") if price_info else None,
+                            is_informational,
+                        )
+                        semantic_key = (query_embedding, params, get_index_version())
+                        cached = _semantic_cache.get(query_embedding, params)
+                        if cached is not None:
+                            logger.info("Semantic cache hit for query")
+                            cached_products = await run_db(
+                                self.vector_search.load_products,
+                                dict(zip(cached["product_ids"], cached["scores"]))
+                            )
+                            return {
+                                "response": cached["response"],
+                                "products": [product for product, _ in cached_products],
+                                "needs_clarification": cached["needs_clarification"],
+                                "scores": [score for _, score in cached_products]
+                            }
+                except Exception as e:
+                    logger.warning(f"Semantic cache lookup failed: {e}")
+            
             logger.info(f"Searching for products matching query: {user_query}")
+            # One search at the fallback threshold; results at the requested
+            # threshold are its leading (highest-scoring) slice
+            fallback_threshold = max(0.3, similarity_threshold - 0.2) if similarity_threshold > 0.3 else similarity_threshold
             try:
-                search_results = self.vector_search.search_by_query_text(
+                search_results = await run_db(
+                    self.vector_search.search_by_query_text,
                     query_text=user_query,
                     limit=max_results * 2,
-                    similarity_threshold=similarity_threshold,
+                    similarity_threshold=fallback_threshold,
                     enhance_query=True  # Enable query enhancement
                 )
             except Exception as e:
@@ -809,36 +1471,12 @@ Remember:
             
             search_results = valid_results
             
-            # If we got too few results, try with lower threshold
-            if len(search_results) < max_results and similarity_threshold > 0.3:
-                logger.info(f"Got {len(search_results)} results, trying with lower threshold")
-                try:
-                    retry_results = self.vector_search.search_by_query_text(
-                        query_text=user_query,
-                        limit=max_results * 2,
-                        similarity_threshold=max(0.3, similarity_threshold - 0.2),
-                        enhance_query=True
-                    )
-                    # Validate retry results
-                    if isinstance(retry_results, list):
-                        valid_retry = []
-                        for result in retry_results:
-                            if isinstance(result, tuple) and len(result) == 2:
-                                product, score = result
-                                if product is not None:
-                                    try:
-                                        score = float(score)
-                                        if 0.0 <= score <= 1.0:
-                                            valid_retry.append((product, score))
-                                    except (ValueError, TypeError):
-                                        continue
-                        if len(valid_retry) > len(search_results):
-                            search_results = valid_retry
-                except Exception as e:
-                    logger.warning(f"Error in retry search: {e}, using original results")
-            
-            # Parse price query if present
-            price_info = self._parse_price_query(user_query)
+            # Keep to the requested threshold when it yields enough results
+            above_threshold = [result for result in valid_results if result[1] >= similarity_threshold]
+            if len(above_threshold) >= max_results:
+                search_results = above_threshold
+            else:
+                logger.info(f"Got {len(above_threshold)} results, using lower threshold results ({len(valid_results)})")
             
             # Apply price filtering if price constraints are present
             if price_info and (price_info.get("min_price") is not None or price_info.get("max_price") is not None):
@@ -853,7 +1491,8 @@ Remember:
                     logger.info(f"Price filter reduced results to {len(search_results)}, fetching more candidates")
                     try:
                         # Get more candidates with lower threshold
-                        additional_results = self.vector_search.search_by_query_text(
+                        additional_results = await run_db(
+                            self.vector_search.search_by_query_text,
                             query_text=user_query,
                             limit=max_results * 3,  # Get more candidates
                             similarity_threshold=max(0.3, similarity_threshold - 0.15),
@@ -882,15 +1521,9 @@ Remember:
                     except Exception as e:
                         logger.warning(f"Error fetching additional price-filtered results: {e}")
             
-            # Limit to max_results and extract products
-            search_results = search_results[:max_results]
-            products = [product for product, score in search_results]
-            
-            # Additional validation: ensure products are valid
-            products = [p for p in products if p is not None]
-            
-            # Check if this is an informational query (asking about specific product details)
-            is_informational = self._is_informational_query(user_query)
+            # Limit to max_results and split into products and scores in one
+            # pass (results with a None product were dropped above)
+            products, scores = (list(column) for column in zip(*search_results[:max_results])) if search_results else ([], [])
             
             if not products:
                 # No products found - return a helpful message
@@ -923,7 +1556,7 @@ Remember:
                     "response": f"I found {len(products)} product(s) that might match your query:",
                     "products": products if not is_informational else [],  # Don't show products for informational queries
                     "needs_clarification": False,
-                    "scores": [score for _, score in search_results]
+                    "scores": scores
                 }
             
             # Build prompt (with special handling for informational queries)
@@ -936,49 +1569,111 @@ Remember:
                 logger.error(f"Error building prompt: {e}", exc_info=True)
                 prompt = f"User query: {user_query}\n\nPlease provide a helpful response."
             
+            return {
+                "prompt": prompt,
+                "products": products,
+                "scores": scores,
+                "is_informational": is_informational,
+                "semantic_key": semantic_key,
+            }
+            
+        except Exception as e:
+            logger.error(f"Error in RAG recommendation: {e}", exc_info=True)
+            return {
+                "response": "I'm sorry, I encountered an error while processing your request. Please try again.",
+                "products": [],
+                "needs_clarification": False,
+                "scores": []
+            }
+    
+    async def recommend_products(
+        self,
+        user_query: str,
+        max_results: int = 5,
+        similarity_threshold: float = 0.6,
+        conversation_history: Optional[List[Dict[str, str]]] = None,
+        auto_adjust_threshold: bool = True
+    ) -> Dict[str, Any]:
+        """
+        Recommend products based on user query using RAG.
+        
+        Vector searches run on the DB executor (they share this service's
+        sync session, so they stay sequential); the LLM call uses the async
+        Gemini client, bounded by LLM_MAX_CONCURRENCY.
+        
+        Args:
+            user_query: User's natural language query
+            max_results: Maximum number of products to retrieve
+            similarity_threshold: Minimum similarity score for products
+            conversation_history: Previous conversation messages for context
+        
+        Returns:
+            Dictionary with:
+            - response: LLM-generated response text
+            - products: List of recommended products
+            - needs_clarification: Whether the LLM is asking for clarification
+        """
+        prepared = await self._prepare_recommendation(
+            user_query, max_results, similarity_threshold, conversation_history, auto_adjust_threshold
+        )
+        if "prompt" not in prepared:
+            # Invalid query, no matches or no LLM: nothing to generate
+            return prepared
+        prompt = prepared["prompt"]
+        products = prepared["products"]
+        scores = prepared["scores"]
+        is_informational = prepared["is_informational"]
+        
+        try:
+            # Identical prompts (query, products, history) get the same answer
+            cache_key = self._llm_cache_key(prompt)
+            cached = await self._get_cached_response(cache_key)
+            if cached is not None:
+                logger.info("Using cached LLM response")
+                cleaned_response, needs_clarification = cached
+                return {
+                    "response": cleaned_response,
+                    "products": [] if is_informational else products,
+                    "needs_clarification": needs_clarification,
+                    "scores": [] if is_informational else scores
+                }
+            
             logger.info("Generating LLM response...")
             try:
                 # Add timeout and retry logic for LLM calls
                 max_retries = 2
                 retry_delay = 1
                 
-                for attempt in range(max_retries):
-                    try:
-                        response = self.llm_client.models.generate_content(
-                            model=self.llm_model,
-                            contents=prompt
-                        )
-                        break
-                    except Exception as e:
-                        if attempt < max_retries - 1:
-                            logger.warning(f"LLM call failed (attempt {attempt + 1}), retrying: {e}")
-                            time.sleep(retry_delay)
-                            retry_delay *= 2
-                        else:
-                            raise
-                
-                # Extract response text safely
-                if hasattr(response, 'text'):
-                    llm_response = str(response.text)
-                elif hasattr(response, 'candidates') and response.candidates:
-                    # Handle structured response
-                    candidate = response.candidates[0]
-                    if hasattr(candidate, 'content') and hasattr(candidate.content, 'parts'):
-                        parts = candidate.content.parts
-                        if parts:
-                            llm_response = str(parts[0].text) if hasattr(parts[0], 'text') else str(parts[0])
-                        else:
-                            llm_response = str(response)
-                    else:
-                        llm_response = str(response)
+                if settings.LLM_BATCH_WINDOW_MS > 0 and not conversation_history:
+                    # May share one LLM call with other first-turn requests
+                    # (prompts with history never leave their own context)
+                    llm_response = await _prompt_batcher.generate(self.llm_client, self.llm_model, prompt)
                 else:
-                    llm_response = str(response)
+                    for attempt in range(max_retries):
+                        try:
+                            async with _get_llm_semaphore():
+                                response = await self.llm_client.aio.models.generate_content(
+                                    model=self.llm_model,
+                                    contents=prompt
+                                )
+                            break
+                        except Exception as e:
+                            if attempt < max_retries - 1:
+                                logger.warning(f"LLM call failed (attempt {attempt + 1}), retrying: {e}")
+                                await asyncio.sleep(retry_delay)
+                                retry_delay *= 2
+                            else:
+                                raise
+                    
+                    llm_response = _response_text(response)
                 
                 if not llm_response or not llm_response.strip():
                     logger.warning("Empty LLM response received")
                     llm_response = "I found some products that might match your query."
             except Exception as e:
                 logger.error(f"Error calling LLM: {e}", exc_info=True)
+                # Fallback responses aren't cached
+                cache_key = None
                 # Fallback response
                 if products:
                     llm_response = f"I found {len(products)} product(s) that might match your query."
@@ -987,67 +1682,49 @@ Remember:
             
             # Clean response safely
             try:
-                cleaned_response = llm_response
-                # Apply cleaning patterns one by one with error handling
-                cleaning_patterns = [
-                    (r'^\s*[-*•]\s*.*?:\s*.*$', '', re.MULTILINE),
-                    (r'\*\*.*?\*\*:', '', 0),
-                    (r'^.*?Sports Bra.*?:.*$', '', re.MULTILINE | re.IGNORECASE),
-                    (r'^.*?Top.*?:.*$', '', re.MULTILINE | re.IGNORECASE),
-                    (r'\n{3,}', '\n\n', 0),
-                ]
-                
-                for pattern, replacement, flags in cleaning_patterns:
-                    try:
-                        cleaned_response = re.sub(pattern, replacement, cleaned_response, flags=flags)
-                    except re.error as e:
-                        logger.debug(f"Error applying cleaning pattern {pattern}: {e}")
-                        continue
-                
-                cleaned_response = cleaned_response.strip()
+                cleaned_response = _clean_llm_response(llm_response).strip()
             except Exception as e:
                 logger.warning(f"Error cleaning response: {e}, using original")
                 cleaned_response = llm_response.strip()
             
+            # If cleaning removed everything, use original
+            if not cleaned_response:
+                cleaned_response = llm_response.strip()
+            
             # For informational queries, return answer without products
             if is_informational:
-                return {
+                result = {
                     "response": cleaned_response.strip(),
                     "products": [],  # Don't show product cards for informational queries
                     "needs_clarification": False,
                     "scores": []
                 }
-            cleaned_response = cleaned_response.strip()
-            
-            # If cleaning removed everything, use original
-            if not cleaned_response:
-                cleaned_response = llm_response.strip()
+                if cache_key:
+                    await self._cache_response(cache_key, result["response"], False)
+                    self._remember_result(prepared, result)
+                return result
             
             # Detect clarification requests safely
             try:
-                clarification_keywords = [
-                    "could you clarify",
-                    "can you tell me more",
-                    "what do you mean",
-                    "could you be more specific",
-                    "what are you looking for",
-                ]
-                response_lower = cleaned_response.lower()
                 needs_clarification = (
-                    any(keyword in response_lower for keyword in clarification_keywords) 
-                    and "?" in cleaned_response
+                    "?" in cleaned_response
+                    and _CLARIFY_RE.search(cleaned_response) is not None
                 )
             except Exception as e:
                 logger.debug(f"Error detecting clarification: {e}")
                 needs_clarification = False
             
             # Return products for discovery queries (informational queries already returned above)
-            return {
+            result = {
                 "response": cleaned_response,
                 "products": products,
                 "needs_clarification": needs_clarification,
-                "scores": [score for _, score in search_results]
+                "scores": scores
             }
+            if cache_key:
+                await self._cache_response(cache_key, cleaned_response, needs_clarification)
+                self._remember_result(prepared, result)
+            return result
             
         except Exception as e:
             logger.error(f"Error in RAG recommendation: {e}", exc_info=True)
@@ -1058,7 +1735,101 @@ Remember:
                 "scores": []
             }
     
-    def compare_products(self, products: List[Product]) -> str:
+    async def stream_recommend_products(
+        self,
+        user_query: str,
+        max_results: int = 5,
+        similarity_threshold: float = 0.6,
+        conversation_history: Optional[List[Dict[str, str]]] = None,
+        auto_adjust_threshold: bool = True
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Recommend products like recommend_products, streaming the response text.
+        
+        Args:
+            user_query: User's natural language query
+            max_results: Maximum number of products to retrieve
+            similarity_threshold: Minimum similarity score for products
+            conversation_history: Previous conversation messages for context
+        
+        Yields:
+            {"delta": text} chunks of the cleaned response as the LLM generates
+            it, then one {"products", "scores", "needs_clarification"} message
+        """
+        prepared = await self._prepare_recommendation(
+            user_query, max_results, similarity_threshold, conversation_history, auto_adjust_threshold
+        )
+        if "prompt" not in prepared:
+            yield {"delta": prepared["response"]}
+            yield {
+                "products": prepared["products"],
+                "scores": prepared["scores"],
+                "needs_clarification": prepared["needs_clarification"]
+            }
+            return
+        
+        prompt = prepared["prompt"]
+        is_informational = prepared["is_informational"]
+        products = [] if is_informational else prepared["products"]
+        scores = [] if is_informational else prepared["scores"]
+        
+        cache_key = self._llm_cache_key(prompt)
+        cached = await self._get_cached_response(cache_key)
+        if cached is not None:
+            logger.info("Using cached LLM response")
+            cleaned_response, needs_clarification = cached
+            yield {"delta": cleaned_response}
+        else:
+            logger.info("Streaming LLM response...")
+            line_filter = _ResponseLineFilter()
+            emitted = []
+            try:
+                raw = []
+                async for text in _stream_llm_text(self.llm_client, self.llm_model, prompt):
+                    raw.append(text)
+                    delta = line_filter.feed(text)
+                    if delta:
+                        emitted.append(delta)
+                        yield {"delta": delta}
+                delta = line_filter.flush()
+                if delta:
+                    emitted.append(delta)
+                    yield {"delta": delta}
+                
+                cleaned_response = "".join(emitted)
+                if not cleaned_response:
+                    # Same fallbacks as recommend_products: the original text if
+                    # cleaning removed everything, a stock reply if it was empty
+                    cleaned_response = "".join(raw).strip()
+                    if not cleaned_response:
+                        logger.warning("Empty LLM response received")
+                        cleaned_response = "I found some products that might match your query."
+                    yield {"delta": cleaned_response}
+                needs_clarification = (
+                    not is_informational
+                    and "?" in cleaned_response
+                    and _CLARIFY_RE.search(cleaned_response) is not None
+                )
+                await self._cache_response(cache_key, cleaned_response, needs_clarification)
+                self._remember_result(prepared, {
+                    "response": cleaned_response,
+                    "products": products,
+                    "needs_clarification": needs_clarification,
+                    "scores": scores
+                })
+            except Exception as e:
+                logger.error(f"Error streaming LLM response: {e}", exc_info=True)
+                needs_clarification = False
+                if not emitted:
+                    yield {"delta": f"I found {len(prepared['products'])} product(s) that might match your query."}
+        
+        yield {
+            "products": products,
+            "scores": scores,
+            "needs_clarification": needs_clarification
+        }
+    
+    async def compare_products(self, products: List[Product]) -> str:
         """
         Compare products and generate AI insights.
         
@@ -1124,44 +1895,6 @@ Remember:
                 logger.error(f"Error formatting product context: {e}", exc_info=True)
                 return "I'm sorry, I encountered an error while processing the product information."
             
-            system_prompt = """You are a helpful product comparison assistant. Your role is to provide structured, easy-to-read comparisons between products.
-
-IMPORTANT GUIDELINES:
-1. Format your response as structured bullet points organized by category
-2. Use clear categories like: Price & Value, Key Features, Best For, Pros & Cons
-3. Be objective and balanced in your comparison
-4. Make it easy to scan and understand quickly
-5. Use bullet points (•) for each comparison point
-6. Focus on actionable insights that help users make decisions
-7. Keep each bullet point concise (one line or short phrase)
-
-Format your response like this (IMPORTANT: Always prefix each bullet point with the product name or identifier):
-**Price & Value**
-• [Product Name/Identifier]: [price info and value]
-• [Product Name/Identifier]: [price info and value]
-
-**Key Features**
-• [Product Name/Identifier]: [key features]
-• [Product Name/Identifier]: [key features]
-
-**Best For**
-• [Product Name/Identifier]: [use cases]
-• [Product Name/Identifier]: [use cases]
-
-**Pros & Cons**
-• [Product Name/Identifier]: Pros: [list pros], Cons: [list cons]
-OR format as:
-• [Product Name/Identifier]: [pros and cons description]
-• [Product Name/Identifier]: [pros and cons description]
-
-**Summary**
-• [Overall recommendation or key takeaway]
-
-CRITICAL: For each bullet point, ALWAYS start with the product name or a clear identifier (like "Product 1", "Product 2", or use part of the product title) followed by a colon (:). This ensures each point can be matched to the correct product.
-
-Product Context:
-"""
-            
             # Build product identifiers for the prompt
             product_identifiers = []
             for i, product in enumerate(products, 1):
@@ -1170,31 +1903,12 @@ Product Context:
                 identifier = " ".join(title_words)
                 product_identifiers.append(f"Product {i} ({identifier})")
             
-            user_prompt = f"""
-Please compare these {len(products)} products using structured bullet points organized by:
-1. Price & Value - Compare prices and value proposition
-2. Key Features - Highlight main feature differences
-3. Best For - Best use cases for each product
-4. Pros & Cons - List pros and cons for EACH product separately. Format: "Product X: Pros: [list], Cons: [list]" or "Product X: [pros and cons]"
-5. Summary - Overall recommendation
-
-IMPORTANT: For each bullet point, ALWAYS start with the product identifier followed by a colon (:).
-Use these identifiers: {', '.join(product_identifiers)}
-
-Example format:
-• Product 1 (Zen Nova): ₹2698.0
-• Product 2 (Zen Halo): ₹2698.0
-
-For Pros & Cons, ensure you provide pros and cons for EACH product separately. Example:
-• Product 1 (Zen Nova): Pros: Unique design, Cons: May not suit everyone
-• Product 2 (Zen Halo): Pros: Classic style, Cons: Less distinctive
-
-For Summary, provide a concise overall recommendation based on the comparison.
-
-Use bullet points (•) for each point. Make it easy to scan and compare quickly.
-"""
-            
-            prompt = system_prompt + product_context + "\n\n" + user_prompt
+            prompt = "".join((
+                _COMPARE_SYSTEM_PROMPT,
+                product_context,
+                "\n\n",
+                _COMPARE_INSTRUCTIONS_TMPL.format(count=len(products), identifiers=", ".join(product_identifiers)),
+            ))
             
             logger.info(f"Generating comparison insight for {len(products)} products...")
             try:
@@ -1204,15 +1918,16 @@ Use bullet points (•) for each point. Make it easy to scan and compare quickly
                 
                 for attempt in range(max_retries):
                     try:
-                        response = self.llm_client.models.generate_content(
-                            model=self.llm_model,
-                            contents=prompt
-                        )
+                        async with _get_llm_semaphore():
+                            response = await self.llm_client.aio.models.generate_content(
+                                model=self.llm_model,
+                                contents=prompt
+                            )
                         break
                     except Exception as e:
                         if attempt < max_retries - 1:
                             logger.warning(f"LLM call failed (attempt {attempt + 1}), retrying: {e}")
-                            time.sleep(retry_delay)
+                            await asyncio.sleep(retry_delay)
                             retry_delay *= 2
                         else:
                             raise
@@ -1238,7 +1953,7 @@ Use bullet points (•) for each point. Make it easy to scan and compare quickly
                 
                 # Clean up the response safely
                 try:
-                    cleaned_insight = re.sub(r'\n{3,}', '\n\n', insight)
+                    cleaned_insight = _NL_RE.sub('\n\n', insight)
                     cleaned_insight = cleaned_insight.strip()
                 except Exception as e:
                     logger.debug(f"Error cleaning insight: {e}")
@@ -1253,7 +1968,7 @@ Use bullet points (•) for each point. Make it easy to scan and compare quickly
             logger.error(f"Error generating comparison insight: {e}", exc_info=True)
             return "I'm sorry, I encountered an error while generating the comparison. Please try again."
 
-    def generate_follow_ups(
+    async def generate_follow_ups(
         self,
         user_query: str,
         assistant_response: str,
@@ -1343,49 +2058,6 @@ Use bullet points (•) for each point. Make it easy to scan and compare quickly
                 except Exception as e:
                     logger.debug(f"Error building conversation context: {e}")
             
-            system_prompt = """You are generating clickable follow-up question suggestions for a product recommendation chat.
-
-CRITICAL UNDERSTANDING:
-- These are SUGGESTIONS for what the USER can click/ask next
-- These are NOT questions the AI assistant would ask the user
-- These are questions the USER would type or click to continue exploring
-- Think of these as "quick reply" buttons the user can click
-
-Your task is to generate 3-5 natural follow-up questions that:
-1. The USER can click/ask to explore products further
-2. Are directly relevant to what the user just asked about
-3. Help the user refine their search or learn more about products
-4. Are concise (under 12 words each)
-5. Sound natural and conversational
-
-IMPORTANT GUIDELINES:
-- These are USER questions that the user would ask, NOT assistant questions
-- DO NOT generate questions asking the user for information (like "What kind of event?" or "What's your budget?")
-- DO generate questions the user would ask to explore products (like "Show me more options" or "What are the best sellers?")
-- Base questions on the USER'S query and what they might want to explore next
-- If products were shown, questions can reference exploring those products further
-- Questions should help users explore, compare, or refine their product search
-
-WRONG EXAMPLES (these are assistant asking user - DO NOT GENERATE THESE):
-- "What kind of formal event is it?" ❌ (assistant asking user)
-- "What is the dress code?" ❌ (assistant asking user)
-- "What's your budget?" ❌ (assistant asking user)
-- "Do you need shoes or accessories?" ❌ (assistant asking user)
-- "Are you looking for a dress?" ❌ (assistant asking user)
-
-CORRECT EXAMPLES (these are user asking about products - GENERATE THESE):
-- "Show me more formal options" ✅ (user exploring)
-- "What are the best sellers?" ✅ (user asking about products)
-- "Can you show me different colors?" ✅ (user exploring)
-- "What sizes are available?" ✅ (user asking about products)
-- "Show me similar products" ✅ (user exploring)
-- "Compare these products" ✅ (user exploring)
-- "What are the best alternatives?" ✅ (user exploring)
-
-Format: Return ONLY a simple list, one question per line, no numbering, no bullets, no extra formatting.
-Each line should be a complete, natural question that the USER would click/ask next.
-"""
-            
             # Safely truncate inputs
             safe_user_query = str(user_query)[:500] if user_query else ""
             safe_assistant_response = str(assistant_response)[:300] if assistant_response else ""
@@ -1412,7 +2084,7 @@ Examples of good user follow-up questions (what user would ask):
 
 Remember: These are questions the USER asks about products, NOT questions asking the user for information."""
             
-            prompt = system_prompt + "\n\n" + user_prompt
+            prompt = "".join((_FOLLOW_UP_SYSTEM_PROMPT, "\n\n", user_prompt))
             
             logger.info("Generating AI follow-up suggestions...")
             try:
@@ -1422,15 +2094,16 @@ Remember: These are questions the USER asks about products, NOT questions asking
                 
                 for attempt in range(max_retries):
                     try:
-                        response = self.llm_client.models.generate_content(
-                            model=self.llm_model,
-                            contents=prompt
-                        )
+                        async with _get_llm_semaphore():
+                            response = await self.llm_client.aio.models.generate_content(
+                                model=self.llm_model,
+                                contents=prompt
+                            )
                         break
                     except Exception as e:
                         if attempt < max_retries - 1:
                             logger.warning(f"LLM call failed (attempt {attempt + 1}), retrying: {e}")
-                            time.sleep(retry_delay)
+                            await asyncio.sleep(retry_delay)
                             retry_delay *= 2
                         else:
                             raise
@@ -1479,7 +2152,7 @@ Remember: These are questions the USER asks about products, NOT questions asking
             for line in follow_ups_text.split('\n'):
                 line = line.strip()
                 # Remove numbering, bullets, dashes, etc.
-                line = re.sub(r'^[\d\-\*•\.\)\s]+', '', line)
+                line = _LIST_MARKER_RE.sub('', line)
                 line = line.strip()
                 # Remove quotes if present
                 line = line.strip('"\'')
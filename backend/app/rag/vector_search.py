@@ -1,15 +1,61 @@
 """Vector search service for semantic product retrieval using pgvector."""
-from typing import List, Optional, Tuple
-from sqlalchemy.orm import Session
-from sqlalchemy import text
-from pgvector.sqlalchemy import Vector
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+from uuid import UUID
 import numpy as np
-from app.models.product import Product
+from cachetools import TTLCache
+from sqlalchemy.orm import Session, load_only
+from sqlalchemy import bindparam, text
+from pgvector.sqlalchemy import Vector
+from app.config.settings import settings
+from app.models.product import EMBEDDING_DIMENSION, Product
 from app.rag import get_embedding_service
+from app.rag.query_enhancement import QUERY_ENHANCER
 from app.utils.logger import get_logger
 
 logger = get_logger("vector_search")
 
+# Product columns loaded for search results: what the RAG prompt and the chat
+# response (DBProduct) read, leaving out the embedding vector and its hash
+RESULT_COLUMNS = (
+    Product.external_id, Product.title, Product.handle, Product.description,
+    Product.body_html, Product.price, Product.compare_at_price, Product.vendor,
+    Product.product_type, Product.category, Product.tags, Product.image_urls,
+    Product.features, Product.ai_features, Product.created_at, Product.updated_at,
+    Product.scraped_at,
+)
+
+# Query-text search results as (product id, similarity) pairs, so hits are
+# re-loaded through the caller's session rather than sharing ORM objects
+SEARCH_CACHE_SIZE = 1024
+SEARCH_CACHE_TTL_SECONDS = 300
+_search_cache: TTLCache = TTLCache(maxsize=SEARCH_CACHE_SIZE, ttl=SEARCH_CACHE_TTL_SECONDS)
+_search_cache_lock = threading.RLock()
+
+# Query embeddings by final (enhanced) query text; independent of the index, so
+# the retry searches of one request and repeated queries embed once
+_query_embedding_cache: TTLCache = TTLCache(maxsize=SEARCH_CACHE_SIZE, ttl=SEARCH_CACHE_TTL_SECONDS)
+
+# Part of every cache key; bumped whenever stored products or embeddings change
+# so entries computed against the old index (even ones still being computed)
+# never hit. The version is per process: writes made by another worker or by
+# the embedding CLI job are only picked up as entries expire, so results can be
+# up to SEARCH_CACHE_TTL_SECONDS stale there.
+_index_version = 0
+
+
+def invalidate_search_cache() -> None:
+    """Drop cached query-text search results (call after products or embeddings change)."""
+    global _index_version
+    with _search_cache_lock:
+        _index_version += 1
+        _search_cache.clear()
+
+
+def get_index_version() -> int:
+    """Current embedding index version (changes whenever stored embeddings do)."""
+    return _index_version
+
 
 class VectorSearchService:
     """Service for semantic product search using vector embeddings."""
@@ -25,9 +71,10 @@ class VectorSearchService:
     
     def search_similar_products(
         self,
-        query_embedding: List[float],
+        query_embedding: Sequence[float],
         limit: int = 5,
-        similarity_threshold: float = 0.7
+        similarity_threshold: float = 0.7,
+        exclude_ids: Optional[List[str]] = None
     ) -> List[Tuple[Product, float]]:
         """
         Search for products similar to the query embedding using cosine similarity.
@@ -36,19 +83,16 @@ class VectorSearchService:
             query_embedding: Query vector embedding
             limit: Maximum number of results to return
             similarity_threshold: Minimum cosine similarity score (0-1)
+            exclude_ids: Product IDs to leave out of the results
         
         Returns:
             List of tuples (Product, similarity_score) sorted by similarity
         """
-        if not query_embedding:
+        if query_embedding is None or len(query_embedding) == 0:
             logger.warning("Empty query embedding provided")
             return []
         
         try:
-            # Convert embedding to numpy array and normalize
-            query_vec = np.array(query_embedding)
-            query_vec = query_vec / np.linalg.norm(query_vec)
-            
             # Use pgvector cosine distance operator (1 - cosine similarity)
             # We want products where 1 - cosine_distance > threshold
             # Which means cosine_distance < 1 - threshold
@@ -56,38 +100,44 @@ class VectorSearchService:
             
             # Query using pgvector's cosine distance operator
             # Using raw SQL for better performance with pgvector
-            # Convert numpy array to string format for pgvector
-            query_vec_str = "[" + ",".join(map(str, query_vec.tolist())) + "]"
+            # Cosine distance is scale-invariant, so the embedding is sent as-is
+            # in pgvector's text format
+            query_vec_str = "[" + ",".join(map(str, query_embedding)) + "]"
             
-            query = text("""
+            params = {
+                "query_vec": query_vec_str,
+                "max_distance": max_distance,
+                "limit": limit
+            }
+            exclude_clause = ""
+            if exclude_ids:
+                exclude_clause = "AND id NOT IN :exclude_ids"
+                params["exclude_ids"] = [str(product_id) for product_id in exclude_ids]
+            
+            # ORDER BY embedding <=> ... LIMIT is served by the halfvec HNSW index
+            distance = f"(embedding <=> CAST(:query_vec AS halfvec({EMBEDDING_DIMENSION})))"
+            query = text(f"""
                 SELECT 
                     id,
-                    1 - (embedding <=> CAST(:query_vec AS vector)) as similarity
+                    1 - {distance} as similarity
                 FROM products
                 WHERE embedding IS NOT NULL
-                AND (embedding <=> CAST(:query_vec AS vector)) < :max_distance
-                ORDER BY embedding <=> CAST(:query_vec AS vector)
+                AND {distance} < :max_distance
+                {exclude_clause}
+                ORDER BY {distance}
                 LIMIT :limit
             """)
+            if exclude_ids:
+                query = query.bindparams(bindparam("exclude_ids", expanding=True))
+            
+            # Widen the HNSW candidate list for this transaction only (recall
+            # vs. latency); SET cannot take bind parameters
+            if self.db.get_bind().dialect.name == "postgresql":
+                self.db.execute(text(f"SET LOCAL hnsw.ef_search = {int(settings.HNSW_EF_SEARCH)}"))
             
-            results = self.db.execute(
-                query,
-                {
-                    "query_vec": query_vec_str,
-                    "max_distance": max_distance,
-                    "limit": limit
-                }
-            ).fetchall()
+            results = self.db.execute(query, params).fetchall()
             
-            # Fetch full product objects
-            products_with_scores = []
-            for row in results:
-                product_id = row[0]
-                similarity = float(row[1])
-                
-                product = self.db.query(Product).filter(Product.id == product_id).first()
-                if product:
-                    products_with_scores.append((product, similarity))
+            products_with_scores = self.load_products({row[0]: float(row[1]) for row in results})
             
             logger.info(f"Found {len(products_with_scores)} similar products")
             return products_with_scores
@@ -96,6 +146,28 @@ class VectorSearchService:
             logger.error(f"Error in vector search: {e}")
             return []
     
+    def load_products(self, similarities: Dict[UUID, float]) -> List[Tuple[Product, float]]:
+        """
+        Fetch products for search hits in one IN query, keeping similarity order.
+        
+        Args:
+            similarities: Similarity score by product ID, best match first
+        
+        Returns:
+            List of tuples (Product, similarity_score) for the products that still exist
+        """
+        if not similarities:
+            return []
+        products_by_id = {
+            product.id: product
+            for product in self.db.query(Product).options(load_only(*RESULT_COLUMNS)).filter(Product.id.in_(list(similarities)))
+        }
+        return [
+            (products_by_id[product_id], similarity)
+            for product_id, similarity in similarities.items()
+            if product_id in products_by_id
+        ]
+    
     def search_by_query_text(
         self,
         query_text: str,
@@ -106,6 +178,10 @@ class VectorSearchService:
         """
         Search for products by converting query text to embedding first.
         
+        Results are cached per process for SEARCH_CACHE_TTL_SECONDS, keyed on
+        the normalized query and search parameters; a hit skips both the
+        embedding request and the similarity query.
+        
         Args:
             query_text: Natural language query
             limit: Maximum number of results to return
@@ -119,31 +195,72 @@ class VectorSearchService:
             logger.error("Embedding service not available for query text search")
             return []
         
+        normalized_query = " ".join(query_text.lower().split())
+        with _search_cache_lock:
+            cache_key = (_index_version, normalized_query, enhance_query, limit, round(similarity_threshold, 3))
+            cached = _search_cache.get(cache_key)
+        if cached is not None:
+            logger.debug(f"Vector search cache hit for query: {normalized_query}")
+            return self.load_products(dict(cached))
+        
+        query_embedding = self.embed_query(query_text, enhance_query=enhance_query)
+        if query_embedding is None:
+            return []
+        
+        products_with_scores = self.search_similar_products(
+            query_embedding,
+            limit=limit,
+            similarity_threshold=similarity_threshold
+        )
+        
+        # Empty results aren't cached: search_similar_products also returns []
+        # when the query fails
+        if products_with_scores:
+            with _search_cache_lock:
+                _search_cache[cache_key] = tuple((product.id, score) for product, score in products_with_scores)
+        return products_with_scores
+    
+    def embed_query(self, query_text: str, enhance_query: bool = True) -> Optional[np.ndarray]:
+        """
+        Get the retrieval embedding for a query (memoized per process).
+        
+        Args:
+            query_text: Natural language query
+            enhance_query: Whether to enhance query with synonyms and normalization
+        
+        Returns:
+            Query embedding, or None if the embedding service is unavailable or fails
+        """
+        if not self.embedding_service:
+            logger.error("Embedding service not available for query embedding")
+            return None
+        
         # Enhance query if enabled
         final_query = query_text
         if enhance_query:
             try:
-                from app.rag.query_enhancement import QueryEnhancer
-                enhancer = QueryEnhancer()
-                final_query = enhancer.enhance(query_text)
+                final_query = QUERY_ENHANCER.enhance(query_text)
             except Exception as e:
                 logger.warning(f"Query enhancement failed: {e}, using original query")
                 final_query = query_text
         
+        with _search_cache_lock:
+            query_embedding = _query_embedding_cache.get(final_query)
+        if query_embedding is not None:
+            return query_embedding
+        
         query_embedding = self.embedding_service.generate_embedding(
             final_query,
             task_type="RETRIEVAL_QUERY"
         )
         
-        if not query_embedding:
+        if query_embedding is None:
             logger.warning("Failed to generate embedding for query text")
-            return []
+            return None
         
-        return self.search_similar_products(
-            query_embedding,
-            limit=limit,
-            similarity_threshold=similarity_threshold
-        )
+        with _search_cache_lock:
+            _query_embedding_cache[final_query] = query_embedding
+        return query_embedding
     
     def get_products_with_embeddings_count(self) -> int:
         """Get count of products that have embeddings."""
@@ -1,10 +1,13 @@
 """Chat router for RAG-based product recommendations."""
+from typing import Any, AsyncIterator, Dict
+import orjson
 from fastapi import APIRouter, HTTPException, Depends, Request
-from sqlalchemy.orm import Session
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session, load_only
 from app.rag import RAGService
 from app.schemas.chat import ChatRequest, ChatResponse, ProductRecommendation, CompareRequest, CompareResponse
 from app.schemas.products.hunnit.schemas import DBProduct
-from app.config.database import get_db
+from app.config.database import get_db, run_db
 from app.utils.logger import get_logger
 from app.middleware.rate_limit import limiter
 
@@ -13,6 +16,36 @@ logger = get_logger("chat_router")
 router = APIRouter()
 
 
+def _validate_chat_request(chat_request: ChatRequest) -> None:
+    """Reject empty messages and malformed conversation history (400)."""
+    # Validation is handled by Pydantic, but add extra safety checks
+    if not chat_request.message or not chat_request.message.strip():
+        raise HTTPException(
+            status_code=400,
+            detail="Message cannot be empty"
+        )
+    
+    # Validate conversation history if provided
+    if chat_request.conversation_history:
+        if len(chat_request.conversation_history) > 50:
+            raise HTTPException(
+                status_code=400,
+                detail="Conversation history is too long (max 50 messages)"
+            )
+        # Validate each message structure
+        for i, msg in enumerate(chat_request.conversation_history):
+            if not isinstance(msg, dict):
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Invalid message format at index {i}: must be a dictionary"
+                )
+            if "role" not in msg or "content" not in msg:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Invalid message at index {i}: missing 'role' or 'content' field"
+                )
+
+
 @router.post("", response_model=ChatResponse)
 @limiter.limit("10/minute")
 async def chat(
@@ -34,38 +67,13 @@ async def chat(
         ChatResponse with LLM-generated response and recommended products
     """
     try:
-        # Validation is handled by Pydantic, but add extra safety checks
-        if not chat_request.message or not chat_request.message.strip():
-            raise HTTPException(
-                status_code=400,
-                detail="Message cannot be empty"
-            )
-        
-        # Validate conversation history if provided
-        if chat_request.conversation_history:
-            if len(chat_request.conversation_history) > 50:
-                raise HTTPException(
-                    status_code=400,
-                    detail="Conversation history is too long (max 50 messages)"
-                )
-            # Validate each message structure
-            for i, msg in enumerate(chat_request.conversation_history):
-                if not isinstance(msg, dict):
-                    raise HTTPException(
-                        status_code=400,
-                        detail=f"Invalid message format at index {i}: must be a dictionary"
-                    )
-                if "role" not in msg or "content" not in msg:
-                    raise HTTPException(
-                        status_code=400,
-                        detail=f"Invalid message at index {i}: missing 'role' or 'content' field"
-                    )
+        _validate_chat_request(chat_request)
         
         # Initialize RAG service
         rag_service = RAGService(db)
         
         # Get recommendations
-        result = rag_service.recommend_products(
+        result = await rag_service.recommend_products(
             user_query=chat_request.message,
             max_results=chat_request.max_results,
             similarity_threshold=chat_request.similarity_threshold,
@@ -111,7 +119,7 @@ async def chat(
         suggested_follow_ups = None
         try:
             assistant_response = result.get("response", "")
-            suggested_follow_ups = rag_service.generate_follow_ups(
+            suggested_follow_ups = await rag_service.generate_follow_ups(
                 user_query=chat_request.message,
                 assistant_response=assistant_response,
                 products=products,
@@ -149,6 +157,66 @@ async def chat(
         )
 
 
+@router.post("/stream")
+@limiter.limit("10/minute")
+async def chat_stream(
+    request: Request,
+    chat_request: ChatRequest,
+    db: Session = Depends(get_db)
+) -> StreamingResponse:
+    """
+    Chat endpoint streaming the recommendation as newline-delimited JSON.
+    
+    Emits {"delta": text} lines as the LLM response is generated, then one
+    {"products", "recommendations", "needs_clarification"} line.
+    
+    Args:
+        chat_request: Chat request with message and optional conversation history
+        db: Database session
+    
+    Returns:
+        StreamingResponse of application/x-ndjson messages
+    """
+    _validate_chat_request(chat_request)
+    rag_service = RAGService(db)
+    
+    async def messages() -> AsyncIterator[bytes]:
+        try:
+            async for message in rag_service.stream_recommend_products(
+                user_query=chat_request.message,
+                max_results=chat_request.max_results,
+                similarity_threshold=chat_request.similarity_threshold,
+                conversation_history=chat_request.conversation_history
+            ):
+                if "products" in message:
+                    message = _final_stream_message(message)
+                yield orjson.dumps(message) + b"\n"
+        except Exception as e:
+            logger.error(f"Error in chat stream: {e}", exc_info=True)
+            yield orjson.dumps({"error": "An error occurred while processing your request. Please try again."}) + b"\n"
+    
+    return StreamingResponse(messages(), media_type="application/x-ndjson")
+
+
+def _final_stream_message(message: Dict[str, Any]) -> Dict[str, Any]:
+    """Serialise the products of a stream's final message like ChatResponse does."""
+    products = []
+    recommendations = []
+    for product, score in zip(message["products"], message["scores"]):
+        try:
+            db_product = DBProduct.model_validate(product).model_dump()
+        except Exception as e:
+            logger.warning(f"Failed to validate product: {e}")
+            continue
+        products.append(db_product)
+        recommendations.append({"product": db_product, "similarity_score": score})
+    return {
+        "products": products,
+        "recommendations": recommendations or None,
+        "needs_clarification": message["needs_clarification"]
+    }
+
+
 @router.post("/compare", response_model=CompareResponse)
 @limiter.limit("10/minute")
 async def compare_products(
@@ -185,10 +253,20 @@ async def compare_products(
         
         # Fetch products from database
         from app.models.product import Product
+        from app.rag.vector_search import RESULT_COLUMNS
         
+        # One IN query for all requested products (without their embeddings),
+        # then restore request order
+        rows = await run_db(
+            lambda: db.query(Product)
+            .options(load_only(*RESULT_COLUMNS))
+            .filter(Product.id.in_(compare_request.product_ids))
+            .all()
+        )
+        products_by_id = {str(product.id): product for product in rows}
         products = []
         for product_id in compare_request.product_ids:
-            product = db.query(Product).filter(Product.id == product_id).first()
+            product = products_by_id.get(str(product_id).lower())
             if not product:
                 raise HTTPException(
                     status_code=404,
@@ -200,7 +278,7 @@ async def compare_products(
         rag_service = RAGService(db)
         
         # Generate comparison insight
-        insight = rag_service.compare_products(products)
+        insight = await rag_service.compare_products(products)
         
         # Convert products to DBProduct schema
         db_products = []
@@ -233,7 +311,7 @@ async def chat_health(db: Session = Depends(get_db)) -> dict:
         from app.rag.vector_search import VectorSearchService
         
         vector_search = VectorSearchService(db)
-        products_with_embeddings = vector_search.get_products_with_embeddings_count()
+        products_with_embeddings = await run_db(vector_search.get_products_with_embeddings_count)
         
         return {
             "status": "healthy",
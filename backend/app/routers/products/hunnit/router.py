@@ -2,12 +2,12 @@
 import time
 from typing import List
 from fastapi import APIRouter, HTTPException, Depends, Request
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.controller.products.hunnit.controller import HunnitController
 from app.schemas.products.hunnit.schemas import (
     Product, ScrapeResponse, DBProduct, ProductListResponse, ProductResponse
 )
-from app.config.database import get_db
+from app.config.database import get_async_db
 from app.middleware.rate_limit import limiter
 
 router = APIRouter()
@@ -19,25 +19,25 @@ async def scrape_hunnit_products(
     request: Request,
     save_to_db: bool = True,
     save_to_redis: bool = True,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ) -> ScrapeResponse:
     """
     Scrape all products from Hunnit.com and save to Redis and database.
     Specifically fetches product data from https://hunnit.com/products.json
     
-    Flow: Scrape -> Save to Redis -> Save to DB
+    Flow: Scrape page -> Save to Redis and DB (concurrently) -> next page
     
     Args:
         save_to_db: Whether to save scraped products to the database (default: True)
         save_to_redis: Whether to save scraped products to Redis cache (default: True)
     
     Returns:
-        ScrapeResponse with all scraped Hunnit products
+        ScrapeResponse with the scrape outcome and product count
         
     Raises:
         HTTPException: If scraping fails or returns no products
     """
-    start_time = time.time()
+    start_time = time.perf_counter()
     try:
         controller = HunnitController(db=db)
         result = await controller.scrape_all_products(
@@ -51,14 +51,14 @@ async def scrape_hunnit_products(
                 detail=f"Scraping failed: {result.message}"
             )
         
-        if not result.products or len(result.products) == 0:
+        if result.count == 0:
             raise HTTPException(
                 status_code=404,
                 detail="No products found. The source may be unavailable or empty."
             )
         
         # Add response time
-        response_time_ms = (time.time() - start_time) * 1000
+        response_time_ms = (time.perf_counter() - start_time) * 1000
         result.response_time_ms = round(response_time_ms, 2)
         return result
     except HTTPException:
@@ -78,7 +78,7 @@ async def scrape_hunnit_products(
 async def get_all_products(
     request: Request,
     from_db: bool = True,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ) -> ProductListResponse:
     """
     Get all products. By default, returns products from database.
@@ -89,11 +89,11 @@ async def get_all_products(
     Returns:
         ProductListResponse with all products and response time
     """
-    start_time = time.time()
+    start_time = time.perf_counter()
     try:
         controller = HunnitController(db=db)
         products = await controller.get_all_products_as_db_products(from_db=from_db)
-        response_time_ms = (time.time() - start_time) * 1000
+        response_time_ms = (time.perf_counter() - start_time) * 1000
         return ProductListResponse(
             products=products,
             count=len(products),
@@ -113,7 +113,7 @@ async def get_all_products(
 async def get_product(
     product_id: str,
     from_db: bool = True,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ) -> ProductResponse:
     """
     Get a specific product by ID. By default, searches in database first.
@@ -128,7 +128,7 @@ async def get_product(
     Raises:
         HTTPException: If product not found
     """
-    start_time = time.time()
+    start_time = time.perf_counter()
     try:
         controller = HunnitController(db=db)
         product = await controller.get_product_as_db_product(product_id, from_db=from_db)
@@ -139,7 +139,7 @@ async def get_product(
                 detail=f"Product with ID {product_id} not found"
             )
         
-        response_time_ms = (time.time() - start_time) * 1000
+        response_time_ms = (time.perf_counter() - start_time) * 1000
         return ProductResponse(
             product=product,
             response_time_ms=round(response_time_ms, 2)
@@ -165,7 +165,7 @@ async def get_product(
 async def get_products_by_tag(
     tag: str,
     from_db: bool = True,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ) -> ProductListResponse:
     """
     Get products filtered by tag. By default, searches in database.
@@ -177,11 +177,11 @@ async def get_products_by_tag(
     Returns:
         ProductListResponse with products matching the tag and response time
     """
-    start_time = time.time()
+    start_time = time.perf_counter()
     try:
         controller = HunnitController(db=db)
         products = await controller.get_products_by_tag_as_db_products(tag, from_db=from_db)
-        response_time_ms = (time.time() - start_time) * 1000
+        response_time_ms = (time.perf_counter() - start_time) * 1000
         return ProductListResponse(
             products=products,
             count=len(products),
@@ -201,7 +201,7 @@ async def get_products_by_tag(
 async def get_products_by_vendor(
     vendor: str,
     from_db: bool = True,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ) -> ProductListResponse:
     """
     Get products filtered by vendor. By default, searches in database.
@@ -213,11 +213,11 @@ async def get_products_by_vendor(
     Returns:
         ProductListResponse with products from the specified vendor and response time
     """
-    start_time = time.time()
+    start_time = time.perf_counter()
     try:
         controller = HunnitController(db=db)
         products = await controller.get_products_by_vendor_as_db_products(vendor, from_db=from_db)
-        response_time_ms = (time.time() - start_time) * 1000
+        response_time_ms = (time.perf_counter() - start_time) * 1000
         return ProductListResponse(
             products=products,
             count=len(products),
@@ -234,18 +234,18 @@ async def get_products_by_vendor(
 
 
 @router.get("/stats/count", response_model=dict)
-async def get_product_count(db: Session = Depends(get_db)) -> dict:
+async def get_product_count(db: AsyncSession = Depends(get_async_db)) -> dict:
     """
     Get total number of products in the database.
     
     Returns:
         Dictionary with product count and response time
     """
-    start_time = time.time()
+    start_time = time.perf_counter()
     try:
         controller = HunnitController(db=db)
-        count = controller.get_product_count_from_db()
-        response_time_ms = (time.time() - start_time) * 1000
+        count = await controller.get_product_count_from_db()
+        response_time_ms = (time.perf_counter() - start_time) * 1000
         return {
             "count": count,
             "source": "database",
@@ -265,7 +265,7 @@ async def get_product_count(db: Session = Depends(get_db)) -> dict:
 async def get_similar_products(
     product_id: str,
     limit: int = 4,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ) -> ProductListResponse:
     """
     Get similar products using vector search.
@@ -278,11 +278,11 @@ async def get_similar_products(
     Returns:
         ProductListResponse with similar products and response time
     """
-    start_time = time.time()
+    start_time = time.perf_counter()
     try:
         controller = HunnitController(db=db)
-        similar_products = controller.get_similar_products_as_db_products(product_id, limit=limit)
-        response_time_ms = (time.time() - start_time) * 1000
+        similar_products = await controller.get_similar_products_as_db_products(product_id, limit=limit)
+        response_time_ms = (time.perf_counter() - start_time) * 1000
         return ProductListResponse(
             products=similar_products,
             count=len(similar_products),
@@ -292,7 +292,7 @@ async def get_similar_products(
         from app.utils.logger import get_logger
         logger = get_logger("hunnit_router")
         logger.error(f"Error getting similar products: {e}", exc_info=True)
-        response_time_ms = (time.time() - start_time) * 1000
+        response_time_ms = (time.perf_counter() - start_time) * 1000
         return ProductListResponse(
             products=[],
             count=0,
@@ -308,18 +308,18 @@ async def get_cache_status() -> dict:
     Returns:
         Dictionary with cache status information and response time
     """
-    start_time = time.time()
+    start_time = time.perf_counter()
     try:
         controller = HunnitController()
-        status = controller.get_cache_status()
-        response_time_ms = (time.time() - start_time) * 1000
+        status = await controller.get_cache_status()
+        response_time_ms = (time.perf_counter() - start_time) * 1000
         status["response_time_ms"] = round(response_time_ms, 2)
         return status
     except Exception as e:
         from app.utils.logger import get_logger
         logger = get_logger("hunnit_router")
         logger.error(f"Error getting cache status: {e}", exc_info=True)
-        response_time_ms = (time.time() - start_time) * 1000
+        response_time_ms = (time.perf_counter() - start_time) * 1000
         return {
             "cache_available": False,
             "error": str(e),
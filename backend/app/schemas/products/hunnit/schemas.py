@@ -87,7 +87,6 @@ class ScrapeResponse(BaseModel):
     success: bool
     message: str
     count: int
-    products: Optional[List[Product]] = None
     response_time_ms: Optional[float] = None
 
 
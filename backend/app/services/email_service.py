@@ -1,4 +1,5 @@
 """Email notification service using Resend SMTP."""
+import asyncio
 import traceback
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
@@ -288,3 +289,84 @@ async def send_request_error_notification(
         context=context,
         error_type="Request Error"
     )
+
+
+# Request error notifications are queued and sent by a single background worker,
+# so an error storm can't spawn unbounded tasks (overflow is dropped)
+ERROR_QUEUE_MAXSIZE = 1000
+_error_queue: Optional[asyncio.Queue] = None
+_error_worker: Optional[asyncio.Task] = None
+
+
+def queue_request_error_notification(
+    error: Exception,
+    path: str,
+    method: str,
+    request_id: Optional[str] = None,
+    client_host: Optional[str] = None
+) -> bool:
+    """
+    Queue a request error notification without blocking the request.
+    
+    Args:
+        error: The exception that occurred
+        path: Request path
+        method: HTTP method
+        request_id: Optional request ID for tracing
+        client_host: Optional client host/IP
+    
+    Returns:
+        True if the notification was queued, False if skipped or dropped
+    """
+    if not settings.ENABLE_EMAIL_NOTIFICATIONS or _error_queue is None:
+        return False
+    
+    try:
+        _error_queue.put_nowait((error, path, method, request_id, client_host))
+        return True
+    except asyncio.QueueFull:
+        logger.warning(f"Error notification queue full; dropping notification for {method} {path}")
+        return False
+
+
+async def _drain_error_notifications(queue: asyncio.Queue) -> None:
+    """Send queued request error notifications one at a time."""
+    while True:
+        error, path, method, request_id, client_host = await queue.get()
+        try:
+            await send_request_error_notification(
+                error=error,
+                path=path,
+                method=method,
+                request_id=request_id,
+                client_host=client_host
+            )
+        except Exception as e:
+            logger.error(f"Failed to send queued error notification: {e}", exc_info=True)
+        finally:
+            queue.task_done()
+
+
+def start_error_notifier() -> None:
+    """Create the notification queue and start its worker (call from the running event loop)."""
+    global _error_queue, _error_worker
+    if _error_worker is not None:
+        return
+    _error_queue = asyncio.Queue(maxsize=ERROR_QUEUE_MAXSIZE)
+    _error_worker = asyncio.create_task(_drain_error_notifications(_error_queue))
+    logger.info("Error notification worker started")
+
+
+async def shutdown_error_notifier() -> None:
+    """Stop the notification worker, discarding anything still queued."""
+    global _error_queue, _error_worker
+    if _error_worker is None:
+        return
+    _error_worker.cancel()
+    try:
+        await _error_worker
+    except asyncio.CancelledError:
+        pass
+    _error_queue = None
+    _error_worker = None
+    logger.info("Error notification worker stopped")
@@ -1,5 +1,7 @@
 """Utility script to generate AI features for products that don't have them."""
-from sqlalchemy.orm import Session
+import asyncio
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.models.product import Product
 from app.services.products.hunnit.db_service import HunnitProductDBService
 from app.utils.logger import get_logger
@@ -7,41 +9,47 @@ from app.utils.logger import get_logger
 logger = get_logger("generate_ai_features")
 
 
-def generate_ai_features_for_products(db: Session, batch_size: int = 10) -> tuple[int, int]:
+async def generate_ai_features_for_products(db: AsyncSession, batch_size: int = 10) -> tuple[int, int]:
     """
     Generate AI features for all products that don't have them yet.
     
+    The per-product LLM call is blocking and runs in a worker thread.
+    
     Args:
-        db: Database session
+        db: Async database session
         batch_size: Number of products to process in each batch
         
     Returns:
         Tuple of (successful_count, failed_count)
     """
     db_service = HunnitProductDBService(db)
-    
-    # Get all products without AI features
-    products_without_features = db.query(Product).filter(
-        (Product.ai_features.is_(None)) | (Product.ai_features == [])
-    ).all()
-    
-    if not products_without_features:
-        logger.info("All products already have AI features")
-        return 0, 0
-    
-    logger.info(f"Found {len(products_without_features)} products without AI features")
+    missing_features = (Product.ai_features.is_(None)) | (Product.ai_features == [])
     
     successful = 0
     failed = 0
+    batch_number = 0
+    last_id = None
     
-    # Process in batches
-    for i in range(0, len(products_without_features), batch_size):
-        batch = products_without_features[i:i + batch_size]
+    # Keyset pagination: load one batch at a time ordered by id, so memory stays
+    # bounded and products that fail generation are not fetched again
+    while True:
+        statement = select(Product).where(missing_features)
+        if last_id is not None:
+            statement = statement.where(Product.id > last_id)
+        batch = (await db.execute(statement.order_by(Product.id).limit(batch_size))).scalars().all()
+        
+        if not batch:
+            break
+        
+        if batch_number == 0:
+            logger.info("Found products without AI features, generating in batches...")
+        batch_number += 1
+        last_id = batch[-1].id
         
         for product in batch:
             try:
                 # Generate AI features
-                if db_service.generate_ai_features_for_product(product):
+                if await asyncio.to_thread(db_service.generate_ai_features_for_product, product):
                     successful += 1
                 else:
                     failed += 1
@@ -52,11 +60,15 @@ def generate_ai_features_for_products(db: Session, batch_size: int = 10) -> tupl
         
         # Commit batch
         try:
-            db.commit()
-            logger.info(f"Committed batch: {i // batch_size + 1} ({successful} successful, {failed} failed so far)")
+            await db.commit()
+            logger.info(f"Committed batch: {batch_number} ({successful} successful, {failed} failed so far)")
         except Exception as e:
             logger.error(f"Error committing batch: {e}")
-            db.rollback()
+            await db.rollback()
+    
+    if batch_number == 0:
+        logger.info("All products already have AI features")
+        return 0, 0
     
     logger.info(f"AI feature generation complete: {successful} successful, {failed} failed")
     return successful, failed
@@ -1,5 +1,6 @@
 """Health service for system monitoring."""
 from typing import Dict, Any, Optional
+import asyncio
 import sys
 import platform
 import os
@@ -14,15 +15,22 @@ from app.constants import (
     HEALTH_STATUS_DEGRADED,
     MEMORY_THRESHOLD_PERCENT,
     DISK_THRESHOLD_PERCENT,
+    HEALTH_CACHE_TTL_SECONDS,
 )
 from app.schemas.health import HealthResponse
-from app.config.database import engine
+from app.config.database import engine, run_db
 from app.config.redis import get_redis_client
 from app.utils.logger import get_logger
 
 logger = get_logger("health_service")
 
 
+def _ping_database() -> None:
+    """Run a trivial query on the sync engine (blocking; call through run_db)."""
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1")).fetchone()
+
+
 class HealthService:
     """Service for health check operations."""
     
@@ -30,6 +38,8 @@ class HealthService:
         """Initialize health service with start time tracking."""
         self._start_time = time.time()
         self._last_cpu_check = None
+        self._cached_response: Optional[HealthResponse] = None
+        self._cached_at = 0.0
     
     def _get_cpu_frequency(self) -> tuple[Optional[float], Optional[float]]:
         """Get CPU frequency using multiple methods for cross-platform support."""
@@ -134,8 +144,19 @@ class HealthService:
         
         return current_freq, max_freq
     
-    def get_health_response(self) -> HealthResponse:
-        """Get complete health check response with all system information."""
+    async def get_health_response(self) -> HealthResponse:
+        """Get health check response, reusing the last one for HEALTH_CACHE_TTL_SECONDS."""
+        now = time.monotonic()
+        if self._cached_response is not None and now - self._cached_at < HEALTH_CACHE_TTL_SECONDS:
+            return self._cached_response
+        
+        response = await self._build_health_response()
+        self._cached_response = response
+        self._cached_at = time.monotonic()
+        return response
+    
+    async def _build_health_response(self) -> HealthResponse:
+        """Build complete health check response with all system information."""
         # CPU information
         cpu_percent = None
         cpu_count = None
@@ -145,35 +166,22 @@ class HealthService:
             # Get CPU count first
             cpu_count = psutil.cpu_count()
             
-            # For CPU percentage, psutil needs a baseline measurement
-            # Use interval=None if we've called before, otherwise use a small interval
+            # cpu_percent(interval=None) measures since the previous call and
+            # doesn't block; the first call (and one made too soon after the
+            # last) awaits a short measurement window first
             if self._last_cpu_check is None:
-                # First call - establish baseline with a small interval
-                # This is acceptable for health checks (0.2s delay)
                 psutil.cpu_percent(interval=None)  # Establish baseline
-                time.sleep(0.1)  # Small delay for measurement
-                cpu_percent = psutil.cpu_percent(interval=None)
-                self._last_cpu_check = time.time()
+                await asyncio.sleep(0.1)
             else:
-                # Subsequent calls use interval=None which measures since last call
-                # This is faster and more accurate for frequent polling
-                elapsed = time.time() - self._last_cpu_check
-                if elapsed > 0.1:
-                    cpu_percent = psutil.cpu_percent(interval=None)
-                    self._last_cpu_check = time.time()
-                else:
-                    # If called too soon, use a small interval
-                    cpu_percent = psutil.cpu_percent(interval=0.2)
-                    self._last_cpu_check = time.time()
-            
-            # Ensure we have a valid CPU percentage (not None)
-            if cpu_percent is None:
-                # Fallback: use a small interval measurement
-                cpu_percent = psutil.cpu_percent(interval=0.2)
-                self._last_cpu_check = time.time()
+                elapsed = time.perf_counter() - self._last_cpu_check
+                if elapsed < 0.1:
+                    await asyncio.sleep(0.1 - elapsed)
+            cpu_percent = psutil.cpu_percent(interval=None)
+            self._last_cpu_check = time.perf_counter()
             
-            # Get CPU frequency using cross-platform methods
-            cpu_frequency_mhz, cpu_frequency_max_mhz = self._get_cpu_frequency()
+            # Get CPU frequency using cross-platform methods (may shell out to
+            # sysctl/wmic, so run off the event loop)
+            cpu_frequency_mhz, cpu_frequency_max_mhz = await asyncio.to_thread(self._get_cpu_frequency)
             
         except Exception as e:
             logger.debug(f"Error getting CPU information: {e}")
@@ -247,7 +255,7 @@ class HealthService:
             pass
         
         # Check component health
-        database_status, redis_status, embedding_status, components = self._check_components()
+        database_status, redis_status, embedding_status, components = await self._check_components()
         
         # Determine health status
         status = HEALTH_STATUS_HEALTHY
@@ -289,7 +297,7 @@ class HealthService:
             components=components,
         )
     
-    def _check_components(self) -> tuple[str, str, str, dict]:
+    async def _check_components(self) -> tuple[str, str, str, dict]:
         """Check health of database, Redis, and embedding service."""
         database_status = "unknown"
         redis_status = "unknown"
@@ -298,9 +306,7 @@ class HealthService:
         
         # Check database
         try:
-            with engine.connect() as conn:
-                result = conn.execute(text("SELECT 1"))
-                result.fetchone()
+            await run_db(_ping_database)
             database_status = "healthy"
             components["database"] = {"status": "healthy", "message": "Connected"}
         except Exception as e:
@@ -311,7 +317,7 @@ class HealthService:
         # Check Redis
         try:
             redis_client = get_redis_client()
-            redis_client.ping()
+            await redis_client.ping()
             redis_status = "healthy"
             components["redis"] = {"status": "healthy", "message": "Connected"}
         except Exception as e:
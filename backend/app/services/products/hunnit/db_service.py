@@ -1,21 +1,39 @@
 """Database service for saving Hunnit products to PostgreSQL."""
-from typing import List, Optional
-from sqlalchemy.orm import Session
+import asyncio
+import re
+from typing import AsyncIterator, Dict, List, Optional
+from sqlalchemy import case, select, func, or_
+from sqlalchemy.dialects.postgresql import array as pg_array, insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import defer
 from app.models.product import Product as ProductModel
 from app.schemas.products.hunnit.schemas import Product as ScrapedProduct
 from app.utils.logger import get_logger
-from app.rag import get_embedding_service
+from app.rag import get_embedding_service, get_llm_client
+from app.rag.vector_search import invalidate_search_cache
 from app.config.settings import settings
 from datetime import datetime, timezone
-from google import genai
+import uuid
 
 logger = get_logger("hunnit_db_service")
 
+# Rows per INSERT ... ON CONFLICT statement (~17 columns each, so well under the
+# 32767 bind-parameter limit of asyncpg/psycopg2)
+UPSERT_BATCH_SIZE = 1000
+
+# Listings never serve the embedding (~6 KB per row), so don't fetch it; the
+# detail/similarity lookups load full rows
+_LISTING_OPTIONS = defer(ProductModel.embedding, raiseload=True)
+
+# HTML tags stripped from body_html to build the description
+_HTML_TAG_RE = re.compile(r'<[^>]+>')
+
 
 class HunnitProductDBService:
     """Service for saving and retrieving Hunnit products from the database."""
     
-    def __init__(self, db: Session):
+    def __init__(self, db: AsyncSession):
         """Initialize database service with a database session."""
         self.db = db
     
@@ -123,7 +141,7 @@ class HunnitProductDBService:
             return None
         
         try:
-            llm_client = genai.Client(api_key=settings.GEMINI_API_KEY)
+            llm_client = get_llm_client()
             model = "gemini-2.0-flash"
             
             # Build product context
@@ -186,13 +204,17 @@ Features:"""
             logger.error(f"Error generating AI features for product {product.title}: {e}", exc_info=True)
             return None
     
-    def _scraped_to_db_model(self, scraped_product: ScrapedProduct) -> ProductModel:
-        """Convert scraped product schema to database model."""
-        # Check if product already exists
-        existing_product = self.db.query(ProductModel).filter(
-            ProductModel.external_id == str(scraped_product.id)
-        ).first()
+    def _build_product_values(self, scraped_product: ScrapedProduct, generate_ai_features: bool = True) -> dict:
+        """
+        Build the column values for a scraped product (including its embedding).
         
+        Args:
+            scraped_product: Scraped product schema
+            generate_ai_features: Whether to call the LLM for AI features
+            
+        Returns:
+            Dictionary of Product column values
+        """
         # Extract data
         price = self._extract_price(scraped_product)
         compare_at_price = self._extract_compare_at_price(scraped_product)
@@ -203,8 +225,7 @@ Features:"""
         description = scraped_product.body_html
         if description:
             # Simple HTML tag removal (you might want to use a library like BeautifulSoup)
-            import re
-            description = re.sub(r'<[^>]+>', '', description).strip()
+            description = _HTML_TAG_RE.sub('', description).strip()
             if len(description) > 500:
                 description = description[:500] + "..."
         
@@ -219,12 +240,16 @@ Features:"""
             "price": price,
         }
         
-        # Generate embedding for the product
+        # Generate embedding for the product (the hash records what it was built from)
         embedding = None
+        embedding_input_hash = None
         try:
             embedding_service = get_embedding_service()
-            embedding = embedding_service.generate_product_embedding(product_data)
-            if embedding:
+            product_text = embedding_service._prepare_product_text(product_data)
+            if product_text:
+                embedding = embedding_service.generate_embedding(product_text, task_type="RETRIEVAL_DOCUMENT")
+            if embedding is not None:
+                embedding_input_hash = embedding_service.input_hash(product_text)
                 logger.info(f"Generated embedding for product: {scraped_product.title}")
             else:
                 logger.warning(f"Failed to generate embedding for product: {scraped_product.title}")
@@ -234,25 +259,46 @@ Features:"""
         
         # Generate AI features for the product
         ai_features = None
-        if not existing_product or not existing_product.ai_features:
-            # Only generate if new product or existing product doesn't have AI features
+        if generate_ai_features:
             ai_features = self._generate_ai_features(scraped_product)
         
+        return {
+            "external_id": str(scraped_product.id),
+            "title": scraped_product.title,
+            "handle": scraped_product.handle,
+            "description": description,
+            "body_html": scraped_product.body_html,
+            "price": price,
+            "compare_at_price": compare_at_price,
+            "vendor": scraped_product.vendor,
+            "product_type": scraped_product.product_type,
+            "category": scraped_product.product_type,  # Use product_type as category
+            "tags": scraped_product.tags if scraped_product.tags else [],
+            "image_urls": image_urls,
+            "features": features,
+            "embedding": embedding,
+            "embedding_input_hash": embedding_input_hash,
+            "ai_features": ai_features,
+        }
+    
+    async def _scraped_to_db_model(self, scraped_product: ScrapedProduct) -> ProductModel:
+        """Convert scraped product schema to database model."""
+        # Check if product already exists
+        existing_product = await self.get_product_by_external_id(str(scraped_product.id))
+        
+        # Only generate AI features if new product or existing product doesn't have them
+        # Embedding/LLM calls are blocking; keep them off the event loop
+        values = await asyncio.to_thread(
+            self._build_product_values,
+            scraped_product,
+            generate_ai_features=not existing_product or not existing_product.ai_features,
+        )
+        
         if existing_product:
             # Update existing product
-            existing_product.title = scraped_product.title
-            existing_product.handle = scraped_product.handle
-            existing_product.description = description
-            existing_product.body_html = scraped_product.body_html
-            existing_product.price = price
-            existing_product.compare_at_price = compare_at_price
-            existing_product.vendor = scraped_product.vendor
-            existing_product.product_type = scraped_product.product_type
-            existing_product.category = scraped_product.product_type  # Use product_type as category
-            existing_product.tags = scraped_product.tags if scraped_product.tags else []
-            existing_product.image_urls = image_urls
-            existing_product.features = features
-            existing_product.embedding = embedding  # Update embedding
+            ai_features = values.pop("ai_features")
+            for key, value in values.items():
+                setattr(existing_product, key, value)
             if ai_features:
                 existing_product.ai_features = ai_features  # Update AI features if generated
             existing_product.scraped_at = datetime.now(timezone.utc)
@@ -261,28 +307,25 @@ Features:"""
             return existing_product
         else:
             # Create new product
-            db_product = ProductModel(
-                external_id=str(scraped_product.id),
-                title=scraped_product.title,
-                handle=scraped_product.handle,
-                description=description,
-                body_html=scraped_product.body_html,
-                price=price,
-                compare_at_price=compare_at_price,
-                vendor=scraped_product.vendor,
-                product_type=scraped_product.product_type,
-                category=scraped_product.product_type,  # Use product_type as category
-                tags=scraped_product.tags if scraped_product.tags else [],
-                image_urls=image_urls,
-                features=features,
-                embedding=embedding,  # Add embedding
-                ai_features=ai_features,  # Add AI-generated features
-            )
+            db_product = ProductModel(**values)
             
             logger.info(f"Creating new product: {scraped_product.title} (external_id: {scraped_product.id})")
             return db_product
     
-    def save_product(self, scraped_product: ScrapedProduct) -> ProductModel:
+    def _insert(self):
+        """Return the dialect-specific INSERT construct (supports ON CONFLICT)."""
+        if self.db.get_bind().dialect.name == "sqlite":
+            return sqlite_insert(ProductModel)
+        return pg_insert(ProductModel)
+    
+    def _tags_contain(self, tag: str):
+        """Return a filter matching products tagged with `tag`."""
+        if self.db.get_bind().dialect.name == "postgresql":
+            # Array containment is served by the GIN index on tags
+            return ProductModel.tags.op("@>")(pg_array([tag]))
+        return ProductModel.tags.contains([tag])
+    
+    async def save_product(self, scraped_product: ScrapedProduct) -> ProductModel:
         """
         Save or update a single product in the database.
         
@@ -292,88 +335,195 @@ Features:"""
         Returns:
             Saved Product model
         """
-        db_product = self._scraped_to_db_model(scraped_product)
+        db_product = await self._scraped_to_db_model(scraped_product)
         
         if db_product.id is None or not hasattr(db_product, '_sa_instance_state') or db_product._sa_instance_state.pending:
             self.db.add(db_product)
         
-        self.db.commit()
-        self.db.refresh(db_product)
+        await self.db.commit()
+        await self.db.refresh(db_product)
         
         return db_product
     
-    def save_products(self, scraped_products: List[ScrapedProduct]) -> tuple[int, int]:
+    def _build_rows(self, unique_products: Dict[str, ScrapedProduct], existing: Dict[str, bool]) -> List[dict]:
+        """
+        Build upsert rows for products keyed by external_id.
+        
+        Args:
+            unique_products: Scraped products keyed by external_id
+            existing: Whether each existing external_id already has AI features
+            
+        Returns:
+            List of Product column value dictionaries
+        """
+        now = datetime.now(timezone.utc)
+        rows = []
+        for external_id, scraped_product in unique_products.items():
+            values = self._build_product_values(
+                scraped_product,
+                generate_ai_features=not existing.get(external_id, False),
+            )
+            values["id"] = uuid.uuid4()
+            values["scraped_at"] = now
+            rows.append(values)
+        return rows
+    
+    async def _upsert_rows(self, rows: List[dict]) -> None:
+        """
+        Insert or update product rows by external_id (without committing).
+        
+        Existing AI features and embeddings are kept when a row has none (e.g.
+        the LLM or embedding call failed during this scrape); the embedding
+        input hash always moves together with the embedding.
+        
+        Args:
+            rows: Product column value dictionaries (all with the same keys)
+        """
+        for start in range(0, len(rows), UPSERT_BATCH_SIZE):
+            chunk = rows[start:start + UPSERT_BATCH_SIZE]
+            stmt = self._insert().values(chunk)
+            update_columns = {
+                column: getattr(stmt.excluded, column)
+                for column in chunk[0]
+                if column not in ("id", "external_id", "ai_features", "embedding", "embedding_input_hash")
+            }
+            # Keep existing AI features unless new ones were generated
+            update_columns["ai_features"] = func.coalesce(stmt.excluded.ai_features, ProductModel.ai_features)
+            # Keep the stored embedding (and its hash) unless a new one was generated
+            if "embedding" in chunk[0]:
+                update_columns["embedding"] = func.coalesce(stmt.excluded.embedding, ProductModel.embedding)
+                update_columns["embedding_input_hash"] = case(
+                    (stmt.excluded.embedding.is_(None), ProductModel.embedding_input_hash),
+                    else_=stmt.excluded.embedding_input_hash,
+                )
+            update_columns["updated_at"] = func.now()
+            stmt = stmt.on_conflict_do_update(index_elements=["external_id"], set_=update_columns)
+            await self.db.execute(stmt)
+            logger.info(f"Upserted {start + len(chunk)} products so far...")
+    
+    async def save_products(self, scraped_products: List[ScrapedProduct]) -> tuple[int, int]:
         """
         Save or update multiple products in the database.
         
+        Uses one lookup for existing products and chunked INSERT ... ON CONFLICT
+        (external_id) DO UPDATE statements instead of per-row queries.
+        
         Args:
             scraped_products: List of scraped product schemas
             
         Returns:
             Tuple of (created_count, updated_count)
         """
-        created_count = 0
-        updated_count = 0
+        if not scraped_products:
+            return 0, 0
         
-        for scraped_product in scraped_products:
-            existing = self.db.query(ProductModel).filter(
-                ProductModel.external_id == str(scraped_product.id)
-            ).first()
+        # De-duplicate by external_id (last one wins); ON CONFLICT cannot touch a row twice
+        unique_products = {str(p.id): p for p in scraped_products}
+        external_ids = list(unique_products)
+        
+        try:
+            # Single query for which products already exist (and whether they have AI features)
+            result = await self.db.execute(
+                select(ProductModel.external_id, ProductModel.ai_features).where(
+                    ProductModel.external_id.in_(external_ids)
+                )
+            )
+            existing = {external_id: bool(ai_features) for external_id, ai_features in result.all()}
             
-            is_new = existing is None
-            db_product = self._scraped_to_db_model(scraped_product)
+            # Embedding/LLM calls are blocking; build all rows in a worker thread
+            rows = await asyncio.to_thread(self._build_rows, unique_products, existing)
             
-            if is_new:
-                self.db.add(db_product)
-                created_count += 1
-            else:
-                updated_count += 1
+            await self._upsert_rows(rows)
             
-            # Commit in batches to avoid memory issues
-            if (created_count + updated_count) % 10 == 0:
-                self.db.commit()
-                logger.info(f"Saved {created_count + updated_count} products so far...")
+            # One transaction for the whole batch
+            await self.db.commit()
+        except Exception:
+            # The session is reused for later batches; don't leave it in an
+            # aborted transaction
+            await self.db.rollback()
+            raise
+        # Prices, text and embeddings may have changed under cached search results
+        invalidate_search_cache()
         
-        # Final commit
-        self.db.commit()
+        created_count = sum(1 for external_id in external_ids if external_id not in existing)
+        updated_count = len(external_ids) - created_count
         logger.info(f"Successfully saved {len(scraped_products)} products: {created_count} created, {updated_count} updated")
         
         return created_count, updated_count
     
-    def get_all_products(self) -> List[ProductModel]:
+    async def get_all_products(self) -> List[ProductModel]:
         """Get all products from the database."""
-        return self.db.query(ProductModel).all()
+        result = await self.db.execute(select(ProductModel).options(_LISTING_OPTIONS))
+        return list(result.scalars().all())
     
-    def get_product_by_external_id(self, external_id: str) -> Optional[ProductModel]:
+    async def iter_all_products(self, batch_size: int = 1000) -> AsyncIterator[List[ProductModel]]:
+        """
+        Stream all products in batches instead of loading the whole table at once.
+        
+        Args:
+            batch_size: Rows fetched per round-trip
+            
+        Yields:
+            Lists of up to batch_size Product models
+        """
+        result = await self.db.stream_scalars(
+            select(ProductModel).options(_LISTING_OPTIONS).execution_options(yield_per=batch_size)
+        )
+        async for batch in result.partitions():
+            yield batch
+    
+    async def get_product_by_external_id(self, external_id: str) -> Optional[ProductModel]:
         """Get a product by its external ID (from Hunnit.com)."""
-        return self.db.query(ProductModel).filter(
-            ProductModel.external_id == external_id
-        ).first()
+        result = await self.db.execute(
+            select(ProductModel).where(ProductModel.external_id == external_id).limit(1)
+        )
+        return result.scalars().first()
     
-    def get_product_by_id(self, product_id: str) -> Optional[ProductModel]:
+    async def get_product_by_id(self, product_id: str) -> Optional[ProductModel]:
         """Get a product by its database UUID."""
         try:
-            import uuid
             product_uuid = uuid.UUID(product_id)
-            return self.db.query(ProductModel).filter(ProductModel.id == product_uuid).first()
         except (ValueError, AttributeError):
             return None
+        return await self.db.get(ProductModel, product_uuid)
+    
+    async def get_product_by_any_id(self, product_id: str) -> Optional[ProductModel]:
+        """
+        Get a product by database UUID or external ID in a single query.
+        
+        Args:
+            product_id: Database UUID or external ID (from Hunnit.com)
+            
+        Returns:
+            Product model if found, None otherwise
+        """
+        condition = ProductModel.external_id == product_id
+        try:
+            # Compare against the UUID column directly so the primary key index is used
+            condition = or_(ProductModel.id == uuid.UUID(product_id), condition)
+        except (ValueError, AttributeError):
+            pass
+        result = await self.db.execute(select(ProductModel).where(condition).limit(1))
+        return result.scalars().first()
     
-    def get_products_by_tag(self, tag: str) -> List[ProductModel]:
+    async def get_products_by_tag(self, tag: str) -> List[ProductModel]:
         """Get products filtered by tag."""
-        return self.db.query(ProductModel).filter(
-            ProductModel.tags.contains([tag])
-        ).all()
+        result = await self.db.execute(
+            select(ProductModel).options(_LISTING_OPTIONS).where(self._tags_contain(tag))
+        )
+        return list(result.scalars().all())
     
-    def get_products_by_vendor(self, vendor: str) -> List[ProductModel]:
+    async def get_products_by_vendor(self, vendor: str) -> List[ProductModel]:
         """Get products filtered by vendor."""
-        return self.db.query(ProductModel).filter(
-            ProductModel.vendor == vendor
-        ).all()
+        result = await self.db.execute(
+            select(ProductModel).options(_LISTING_OPTIONS).where(ProductModel.vendor == vendor)
+        )
+        return list(result.scalars().all())
     
-    def get_product_count(self) -> int:
+    async def get_product_count(self) -> int:
         """Get total number of products in the database."""
-        return self.db.query(ProductModel).count()
+        result = await self.db.execute(select(func.count()).select_from(ProductModel))
+        return result.scalar_one()
     
     def generate_ai_features_for_product(self, product: ProductModel) -> bool:
         """
@@ -390,7 +540,7 @@ Features:"""
             return False
         
         try:
-            llm_client = genai.Client(api_key=settings.GEMINI_API_KEY)
+            llm_client = get_llm_client()
             model = "gemini-2.0-flash"
             
             # Build product context from database product
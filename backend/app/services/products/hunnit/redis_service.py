@@ -1,5 +1,6 @@
 """Redis service for caching Hunnit products."""
-import json
+import uuid
+import orjson
 from typing import List, Optional
 from app.config.redis import get_redis_client
 from app.schemas.products.hunnit.schemas import Product, ProductsResponse
@@ -9,10 +10,16 @@ logger = get_logger("hunnit_redis_service")
 
 # Redis key prefixes
 PRODUCTS_KEY = "hunnit:products"
+# Each scrape stages its list under its own key so overlapping scrapes can't
+# interleave writes into one snapshot
+PRODUCTS_STAGING_KEY_PREFIX = "hunnit:products:staging:"
 PRODUCT_KEY_PREFIX = "hunnit:product:"
 SCRAPE_TIMESTAMP_KEY = "hunnit:scrape:timestamp"
 PRODUCTS_COUNT_KEY = "hunnit:products:count"
 
+# Commands buffered per pipeline round-trip
+PIPELINE_BATCH_SIZE = 500
+
 
 class HunnitProductRedisService:
     """Service for caching Hunnit products in Redis."""
@@ -21,7 +28,7 @@ class HunnitProductRedisService:
         """Initialize Redis service."""
         self.redis = get_redis_client()
     
-    def save_products(self, products: List[Product], ttl: int = 86400) -> bool:
+    async def save_products(self, products: List[Product], ttl: int = 86400) -> bool:
         """
         Save products to Redis cache.
         
@@ -29,41 +36,112 @@ class HunnitProductRedisService:
             products: List of products to cache
             ttl: Time to live in seconds (default: 24 hours)
             
+        Returns:
+            True if successful, False otherwise
+        """
+        staging_key = self.new_staging_key()
+        if (
+            await self.save_products_chunk(products, staging_key, ttl=ttl, first_chunk=True)
+            and await self.finalize_products(len(products), staging_key, ttl=ttl)
+        ):
+            return True
+        await self.discard_staging(staging_key)
+        return False
+    
+    @staticmethod
+    def new_staging_key() -> str:
+        """Get a staging key for a new snapshot (unique per scrape)."""
+        return f"{PRODUCTS_STAGING_KEY_PREFIX}{uuid.uuid4().hex}"
+    
+    async def save_products_chunk(
+        self,
+        products: List[Product],
+        staging_key: str,
+        ttl: int = 86400,
+        first_chunk: bool = False
+    ) -> bool:
+        """
+        Cache one chunk of a scrape: per-product keys plus an append to the full list.
+        
+        The full list is built under the scrape's staging key and only replaces
+        the live list in finalize_products(), so readers never see a partial
+        snapshot.
+        
+        Args:
+            products: Chunk of products to cache
+            staging_key: The scrape's key from new_staging_key()
+            ttl: Time to live in seconds (default: 24 hours)
+            first_chunk: Whether this chunk starts a new snapshot
+            
         Returns:
             True if successful, False otherwise
         """
         try:
-            # Save all products as a JSON list
-            products_data = [product.model_dump() for product in products]
-            self.redis.setex(
-                PRODUCTS_KEY,
-                ttl,
-                json.dumps(products_data, default=str)
-            )
+            # Serialize each product once; the full list reuses the same bytes
+            serialized = [orjson.dumps(product.model_dump(), default=str) for product in products]
             
-            # Save individual products for quick lookup
-            for product in products:
-                product_key = f"{PRODUCT_KEY_PREFIX}{product.id}"
-                self.redis.setex(
-                    product_key,
-                    ttl,
-                    json.dumps(product.model_dump(), default=str)
-                )
+            # Pipeline all writes (no MULTI) and flush every PIPELINE_BATCH_SIZE commands
+            async with self.redis.pipeline(transaction=False) as pipe:
+                # Extend the staged JSON list
+                if first_chunk:
+                    pipe.set(staging_key, b"[", ex=ttl)
+                elif serialized:
+                    pipe.append(staging_key, b",")
+                pipe.append(staging_key, b",".join(serialized))
+                
+                # Save individual products for quick lookup
+                for i, (product, data) in enumerate(zip(products, serialized), start=1):
+                    pipe.setex(f"{PRODUCT_KEY_PREFIX}{product.id}", ttl, data)
+                    if i % PIPELINE_BATCH_SIZE == 0:
+                        await pipe.execute()
+                await pipe.execute()
             
-            # Save metadata
-            self.redis.setex(PRODUCTS_COUNT_KEY, ttl, len(products))
-            self.redis.setex(SCRAPE_TIMESTAMP_KEY, ttl, json.dumps({
-                "timestamp": self._get_current_timestamp(),
-                "count": len(products)
-            }, default=str))
+            logger.debug(f"Cached chunk of {len(products)} products in Redis")
+            return True
+        except Exception as e:
+            logger.error(f"Failed to save products to Redis: {e}", exc_info=True)
+            return False
+    
+    async def finalize_products(self, count: int, staging_key: str, ttl: int = 86400) -> bool:
+        """
+        Publish the staged product list and scrape metadata.
+        
+        Args:
+            count: Total number of products cached in this snapshot
+            staging_key: The scrape's key from new_staging_key()
+            ttl: Time to live in seconds (default: 24 hours)
             
-            logger.info(f"Cached {len(products)} products in Redis with TTL {ttl}s")
+        Returns:
+            True if successful, False otherwise
+        """
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                pipe.append(staging_key, b"]")
+                pipe.rename(staging_key, PRODUCTS_KEY)
+                pipe.expire(PRODUCTS_KEY, ttl)
+                
+                # Save metadata
+                pipe.setex(PRODUCTS_COUNT_KEY, ttl, count)
+                pipe.setex(SCRAPE_TIMESTAMP_KEY, ttl, orjson.dumps({
+                    "timestamp": self._get_current_timestamp(),
+                    "count": count
+                }))
+                await pipe.execute()
+            
+            logger.info(f"Cached {count} products in Redis with TTL {ttl}s")
             return True
         except Exception as e:
             logger.error(f"Failed to save products to Redis: {e}", exc_info=True)
             return False
     
-    def get_products(self) -> Optional[List[Product]]:
+    async def discard_staging(self, staging_key: str) -> None:
+        """Delete a scrape's staged list without publishing it (e.g. after a failed chunk)."""
+        try:
+            await self.redis.unlink(staging_key)
+        except Exception as e:
+            logger.error(f"Failed to discard staged products in Redis: {e}", exc_info=True)
+    
+    async def get_products(self) -> Optional[List[Product]]:
         """
         Get all products from Redis cache.
         
@@ -71,12 +149,12 @@ class HunnitProductRedisService:
             List of products if found, None otherwise
         """
         try:
-            cached_data = self.redis.get(PRODUCTS_KEY)
+            cached_data = await self.redis.get(PRODUCTS_KEY)
             if cached_data is None:
                 logger.debug("No products found in Redis cache")
                 return None
             
-            products_data = json.loads(cached_data)
+            products_data = orjson.loads(cached_data)
             products = [Product(**product_data) for product_data in products_data]
             logger.info(f"Retrieved {len(products)} products from Redis cache")
             return products
@@ -84,7 +162,7 @@ class HunnitProductRedisService:
             logger.error(f"Failed to get products from Redis: {e}", exc_info=True)
             return None
     
-    def get_product_by_id(self, product_id: int) -> Optional[Product]:
+    async def get_product_by_id(self, product_id: int) -> Optional[Product]:
         """
         Get a specific product from Redis cache by ID.
         
@@ -96,17 +174,17 @@ class HunnitProductRedisService:
         """
         try:
             product_key = f"{PRODUCT_KEY_PREFIX}{product_id}"
-            cached_data = self.redis.get(product_key)
+            cached_data = await self.redis.get(product_key)
             if cached_data is None:
                 return None
             
-            product_data = json.loads(cached_data)
+            product_data = orjson.loads(cached_data)
             return Product(**product_data)
         except Exception as e:
             logger.error(f"Failed to get product {product_id} from Redis: {e}", exc_info=True)
             return None
     
-    def get_scrape_timestamp(self) -> Optional[dict]:
+    async def get_scrape_timestamp(self) -> Optional[dict]:
         """
         Get the timestamp of the last scrape.
         
@@ -114,15 +192,15 @@ class HunnitProductRedisService:
             Dictionary with timestamp and count, or None
         """
         try:
-            cached_data = self.redis.get(SCRAPE_TIMESTAMP_KEY)
+            cached_data = await self.redis.get(SCRAPE_TIMESTAMP_KEY)
             if cached_data is None:
                 return None
-            return json.loads(cached_data)
+            return orjson.loads(cached_data)
         except Exception as e:
             logger.error(f"Failed to get scrape timestamp from Redis: {e}", exc_info=True)
             return None
     
-    def get_products_count(self) -> Optional[int]:
+    async def get_products_count(self) -> Optional[int]:
         """
         Get the count of cached products.
         
@@ -130,13 +208,13 @@ class HunnitProductRedisService:
             Count of products, or None
         """
         try:
-            count = self.redis.get(PRODUCTS_COUNT_KEY)
+            count = await self.redis.get(PRODUCTS_COUNT_KEY)
             return int(count) if count else None
         except Exception as e:
             logger.error(f"Failed to get products count from Redis: {e}", exc_info=True)
             return None
     
-    def clear_cache(self) -> bool:
+    async def clear_cache(self) -> bool:
         """
         Clear all cached products from Redis.
         
@@ -144,13 +222,20 @@ class HunnitProductRedisService:
             True if successful, False otherwise
         """
         try:
-            # Get all product keys
-            product_keys = self.redis.keys(f"{PRODUCT_KEY_PREFIX}*")
-            
-            # Delete all keys
-            keys_to_delete = [PRODUCTS_KEY, PRODUCTS_COUNT_KEY, SCRAPE_TIMESTAMP_KEY] + product_keys
-            if keys_to_delete:
-                self.redis.delete(*keys_to_delete)
+            # SCAN instead of KEYS so a large keyspace doesn't block the server,
+            # unlinking matched keys in pipelined batches
+            async with self.redis.pipeline(transaction=False) as pipe:
+                pipe.unlink(PRODUCTS_KEY, PRODUCTS_COUNT_KEY, SCRAPE_TIMESTAMP_KEY)
+                batch = []
+                for prefix in (PRODUCT_KEY_PREFIX, PRODUCTS_STAGING_KEY_PREFIX):
+                    async for key in self.redis.scan_iter(match=f"{prefix}*", count=PIPELINE_BATCH_SIZE):
+                        batch.append(key)
+                        if len(batch) == PIPELINE_BATCH_SIZE:
+                            pipe.unlink(*batch)
+                            batch = []
+                if batch:
+                    pipe.unlink(*batch)
+                await pipe.execute()
             
             logger.info("Cleared all Hunnit products from Redis cache")
             return True
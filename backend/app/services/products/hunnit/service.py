@@ -1,5 +1,5 @@
 """Hunnit.com scraper service."""
-from typing import List, Optional
+from typing import AsyncIterator, List, Optional
 import httpx
 from app.schemas.products.hunnit.schemas import Product, ProductsResponse
 from app.utils.logger import get_logger
@@ -12,33 +12,49 @@ class HunnitScraperService:
     
     BASE_URL = "https://hunnit.com/products.json"
     
-    async def fetch_products(self) -> List[Product]:
+    PAGE_SIZE = 250  # Shopify's maximum page size for products.json
+    
+    async def fetch_products_chunked(self, size: int = PAGE_SIZE) -> AsyncIterator[List[Product]]:
         """
-        Fetch all products from Hunnit.com products.json endpoint.
-        Specifically scrapes https://hunnit.com/products.json
+        Fetch products from Hunnit.com page by page.
+        Specifically scrapes https://hunnit.com/products.json?limit=<size>&page=<n>
         
-        Returns:
-            List of Hunnit Product objects
+        Args:
+            size: Products per page (Shopify caps this at 250)
+            
+        Yields:
+            Lists of Hunnit Product objects, one per page
             
         Raises:
             httpx.HTTPError: If the HTTP request fails
             ValueError: If the response data is invalid
         """
         logger.info(f"Fetching products from {self.BASE_URL}")
+        total = 0
+        page = 1
         try:
             async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.get(self.BASE_URL)
-                response.raise_for_status()
-                
-                data = response.json()
-                
-                # Validate and parse the response
-                if "products" not in data:
-                    raise ValueError("Invalid response format: 'products' key not found")
-                
-                products_response = ProductsResponse(**data)
-                logger.info(f"Successfully fetched {len(products_response.products)} products")
-                return products_response.products
+                while True:
+                    response = await client.get(self.BASE_URL, params={"limit": size, "page": page})
+                    response.raise_for_status()
+                    
+                    data = response.json()
+                    
+                    # Validate and parse the response
+                    if "products" not in data:
+                        raise ValueError("Invalid response format: 'products' key not found")
+                    
+                    products = ProductsResponse(**data).products
+                    if not products:
+                        break
+                    
+                    total += len(products)
+                    yield products
+                    
+                    if len(products) < size:
+                        break
+                    page += 1
+            logger.info(f"Successfully fetched {total} products")
         except httpx.HTTPError as e:
             logger.error(f"HTTP error while fetching products: {e}")
             raise
@@ -46,6 +62,22 @@ class HunnitScraperService:
             logger.error(f"Error fetching products: {e}")
             raise
     
+    async def fetch_products(self) -> List[Product]:
+        """
+        Fetch all products from Hunnit.com products.json endpoint.
+        
+        Returns:
+            List of Hunnit Product objects
+            
+        Raises:
+            httpx.HTTPError: If the HTTP request fails
+            ValueError: If the response data is invalid
+        """
+        products = []
+        async for chunk in self.fetch_products_chunked():
+            products.extend(chunk)
+        return products
+    
     async def fetch_product_by_id(self, product_id: int) -> Optional[Product]:
         """
         Fetch a specific product by ID from Hunnit.com.
@@ -1,8 +1,7 @@
 """Scheduler service for periodic tasks."""
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.interval import IntervalTrigger
-from sqlalchemy.orm import Session
-from app.config.database import SessionLocal
+from app.config.database import AsyncSessionLocal
 from app.controller.products.hunnit.controller import HunnitController
 from app.config.settings import settings
 from app.utils.logger import get_logger
@@ -24,17 +23,16 @@ def get_scheduler() -> AsyncIOScheduler:
 async def scrape_and_save_products():
     """Periodic task to scrape products and save to Redis and DB."""
     logger.info("Starting scheduled product scrape job...")
-    db: Session = None
     try:
         # Create a new database session for this job
-        db = SessionLocal()
-        controller = HunnitController(db=db)
-        
-        # Scrape and save to both Redis and DB
-        response = await controller.scrape_all_products(
-            save_to_redis=True,
-            save_to_db=True
-        )
+        async with AsyncSessionLocal() as db:
+            controller = HunnitController(db=db)
+            
+            # Scrape and save to both Redis and DB
+            response = await controller.scrape_all_products(
+                save_to_redis=True,
+                save_to_db=True
+            )
         
         if response.success:
             logger.info(f"Scheduled scrape completed successfully: {response.message}")
@@ -43,9 +41,6 @@ async def scrape_and_save_products():
             
     except Exception as e:
         logger.error(f"Error in scheduled scrape job: {e}", exc_info=True)
-    finally:
-        if db:
-            db.close()
 
 
 def setup_scheduler():
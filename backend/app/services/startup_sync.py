@@ -1,6 +1,6 @@
 """Startup sync service to ensure database is populated on app start."""
 from sqlalchemy.orm import Session
-from app.config.database import SessionLocal
+from app.config.database import SessionLocal, AsyncSessionLocal, run_db
 from app.controller.products.hunnit.controller import HunnitController
 from app.services.products.hunnit.db_service import HunnitProductDBService
 from app.config.settings import settings
@@ -23,12 +23,14 @@ async def sync_products_on_startup():
     
     logger.info("Starting initial product sync on startup...")
     db: Session = None
+    async_db = AsyncSessionLocal()
     try:
+        # Embedding generation still runs on a sync session
         db = SessionLocal()
-        db_service = HunnitProductDBService(db)
+        db_service = HunnitProductDBService(async_db)
         
         # Check if we have products in the database
-        product_count = db_service.get_product_count()
+        product_count = await db_service.get_product_count()
         logger.info(f"Current product count in database: {product_count}")
         
         # If database is empty or has very few products, scrape and save
@@ -37,7 +39,7 @@ async def sync_products_on_startup():
         
         if should_sync:
             logger.info(f"Database has {product_count} products (below threshold of {min_products_threshold}). Starting initial scrape...")
-            controller = HunnitController(db=db)
+            controller = HunnitController(db=async_db)
             
             # Scrape and save to both Redis and DB
             response = await controller.scrape_all_products(
@@ -48,7 +50,7 @@ async def sync_products_on_startup():
             if response.success:
                 logger.info(f"Initial sync completed successfully: {response.message}")
                 # Verify the sync
-                new_count = db_service.get_product_count()
+                new_count = await db_service.get_product_count()
                 logger.info(f"Database now has {new_count} products after sync")
             else:
                 logger.error(f"Initial sync failed: {response.message}")
@@ -58,7 +60,7 @@ async def sync_products_on_startup():
         # Generate AI features for products that don't have them (after sync or if sync was skipped)
         try:
             logger.info("Checking for products without AI features...")
-            successful, failed = generate_ai_features_for_products(db, batch_size=10)
+            successful, failed = await generate_ai_features_for_products(async_db, batch_size=10)
             if successful > 0:
                 logger.info(f"Generated AI features for {successful} products during startup")
             if failed > 0:
@@ -76,7 +78,7 @@ async def sync_products_on_startup():
         if settings.GENERATE_EMBEDDINGS_ON_STARTUP:
             try:
                 logger.info("Checking for products without embeddings...")
-                successful, failed = generate_embeddings_for_products(db, batch_size=10)
+                successful, failed = await run_db(generate_embeddings_for_products, db)
                 if successful > 0:
                     logger.info(f"Generated embeddings for {successful} products during startup")
                 if failed > 0:
@@ -96,16 +98,16 @@ async def sync_products_on_startup():
             try:
                 from app.services.products.hunnit.redis_service import HunnitProductRedisService
                 redis_service = HunnitProductRedisService()
-                redis_count = redis_service.get_products_count()
+                redis_count = await redis_service.get_products_count()
                 
                 if redis_count is None or redis_count == 0:
                     logger.info("Redis cache is empty. Populating from database...")
-                    # Get products from DB and cache them
-                    db_products = db_service.get_all_products()
-                    if db_products:
-                        # Convert DB products to scraped product format for caching
-                        # For now, we'll just log - full conversion would require more work
-                        logger.info(f"Found {len(db_products)} products in DB. Redis cache will be populated on next scrape.")
+                    # Only the count is needed here; don't load every product
+                    db_count = await db_service.get_product_count()
+                    if db_count:
+                        # Converting DB products to scraped product format for caching
+                        # would require more work, so just log for now
+                        logger.info(f"Found {db_count} products in DB. Redis cache will be populated on next scrape.")
                 else:
                     logger.info(f"Redis cache already has {redis_count} products.")
             except Exception as redis_error:
@@ -116,6 +118,7 @@ async def sync_products_on_startup():
         logger.error(f"Error during startup sync: {e}", exc_info=True)
         # Don't fail startup if sync fails - app can still run
     finally:
+        await async_db.close()
         if db:
             db.close()
             logger.info("Startup sync completed")
@@ -32,20 +32,20 @@ class ResponseTimer:
         self.response_time_ms: Optional[float] = None
     
     def __enter__(self):
-        self.start_time = time.time()
+        self.start_time = time.perf_counter()
         return self
     
     def __exit__(self, exc_type, exc_val, exc_tb):
-        if self.start_time:
-            self.response_time_ms = (time.time() - self.start_time) * 1000
+        if self.start_time is not None:
+            self.response_time_ms = (time.perf_counter() - self.start_time) * 1000
         return False
     
     def get_time_ms(self) -> float:
         """Get response time in milliseconds."""
         if self.response_time_ms is not None:
             return round(self.response_time_ms, 2)
-        if self.start_time:
-            return round((time.time() - self.start_time) * 1000, 2)
+        if self.start_time is not None:
+            return round((time.perf_counter() - self.start_time) * 1000, 2)
         return 0.0
 
 
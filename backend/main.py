@@ -1,4 +1,5 @@
 from fastapi import FastAPI
+from fastapi.responses import HTMLResponse, ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 import asyncio
@@ -7,7 +8,7 @@ from app.routers.products.hunnit import router as hunnit_router
 from app.routers import chat
 from app.schemas.common import MessageResponse
 from app.config.settings import settings
-from app.config.database import init_db, engine
+from app.config.database import init_db, engine, async_engine
 from app.config.redis import get_redis_client, close_redis
 from app.services.scheduler import start_scheduler, shutdown_scheduler
 from app.services.startup_sync import sync_products_on_startup
@@ -18,7 +19,11 @@ from app.docs import get_scalar_html
 from app.middleware.validation import RequestValidationMiddleware, ErrorHandlingMiddleware
 from app.middleware.rate_limit import limiter, rate_limit_exceeded_handler
 from app.middleware.metrics import MetricsMiddleware
-from app.services.email_service import send_startup_error_notification
+from app.services.email_service import (
+    send_startup_error_notification,
+    start_error_notifier,
+    shutdown_error_notifier,
+)
 from slowapi.errors import RateLimitExceeded
 
 # Setup logging first
@@ -42,6 +47,12 @@ async def lifespan(app: FastAPI):
     # Startup
     logger.info("Starting up application...")
     
+    # Background worker for request error notifications
+    start_error_notifier()
+    
+    # Render the API docs page once; the OpenAPI schema doesn't change after startup
+    app.state.docs_html = _build_docs_html()
+    
     # Skip database initialization in test environment
     if settings.ENVIRONMENT != "test":
         try:
@@ -61,7 +72,8 @@ async def lifespan(app: FastAPI):
     if settings.ENVIRONMENT != "test":
         try:
             logger.info("Initializing Redis connection...")
-            get_redis_client()
+            # One-shot connectivity check; clients are cheap views on the shared pool
+            await get_redis_client().ping()
             logger.info("Redis connection initialized successfully")
         except Exception as e:
             logger.warning(f"Failed to initialize Redis (will continue without cache): {e}")
@@ -120,6 +132,12 @@ async def lifespan(app: FastAPI):
     except Exception as e:
         logger.error(f"Error shutting down scheduler: {e}", exc_info=True)
     
+    # Stop error notification worker
+    try:
+        await shutdown_error_notifier()
+    except Exception as e:
+        logger.error(f"Error stopping error notification worker: {e}", exc_info=True)
+    
     # Close Redis connections
     try:
         await close_redis()
@@ -128,6 +146,7 @@ async def lifespan(app: FastAPI):
     
     # Close database connections
     engine.dispose()
+    await async_engine.dispose()
     logger.info("Database connections closed")
 
 
@@ -138,19 +157,28 @@ app = FastAPI(
     docs_url=settings.DOCS_URL,
     redoc_url=settings.REDOC_URL,
     lifespan=lifespan,
+    default_response_class=ORJSONResponse,
 )
 
 # Initialize rate limiter with app
 app.state.limiter = limiter
 app.add_exception_handler(RateLimitExceeded, rate_limit_exceeded_handler)
 
-# Add Scalar API documentation
-@app.get("/docs", include_in_schema=False)
-async def scalar_html():
+def _build_docs_html() -> bytes:
+    """Render the Scalar documentation page for the app's OpenAPI schema."""
     return get_scalar_html(
         openapi_schema=app.openapi(),
         title=app.title + " - API Documentation",
-    )
+    ).body
+
+
+# Add Scalar API documentation (served from the page rendered at startup)
+@app.get("/docs", include_in_schema=False)
+async def scalar_html():
+    docs_html = getattr(app.state, "docs_html", None)
+    if docs_html is None:
+        docs_html = app.state.docs_html = _build_docs_html()
+    return HTMLResponse(content=docs_html)
 
 # Error handling middleware (should be first to catch all errors)
 app.add_middleware(ErrorHandlingMiddleware)
@@ -1,28 +1,36 @@
 """Pytest configuration and fixtures."""
 import os
+import tempfile
 
 # Set test environment BEFORE any other imports
 os.environ["ENVIRONMENT"] = "test"
+os.environ.setdefault("RATE_LIMIT_STORAGE_URI", "memory://")
 
 import pytest
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy.pool import StaticPool
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.pool import NullPool
 
-from app.config.database import Base, get_db
+from app.config.database import Base, get_db, get_async_db
 from main import app
 
-# Create in-memory SQLite database for testing
-SQLALCHEMY_TEST_DATABASE_URL = "sqlite:///:memory:"
+# File-backed SQLite database so the sync and async (aiosqlite) engines share it
+_TEST_DB_PATH = os.path.join(tempfile.mkdtemp(), "test.db")
+SQLALCHEMY_TEST_DATABASE_URL = f"sqlite:///{_TEST_DB_PATH}"
+SQLALCHEMY_ASYNC_TEST_DATABASE_URL = f"sqlite+aiosqlite:///{_TEST_DB_PATH}"
 
 engine = create_engine(
     SQLALCHEMY_TEST_DATABASE_URL,
     connect_args={"check_same_thread": False},
-    poolclass=StaticPool,
 )
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# NullPool: the TestClient runs the app on its own event loop per test
+async_engine = create_async_engine(SQLALCHEMY_ASYNC_TEST_DATABASE_URL, poolclass=NullPool)
+TestingAsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+
 
 @pytest.fixture(scope="function")
 def db_session():
@@ -45,7 +53,12 @@ def client(db_session):
         finally:
             pass
     
+    async def override_get_async_db():
+        async with TestingAsyncSessionLocal() as session:
+            yield session
+    
     app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_async_db] = override_get_async_db
     with TestClient(app) as test_client:
         yield test_client
     app.dependency_overrides.clear()
@@ -1,4 +1,5 @@
 """Tests for chat/RAG endpoints."""
+import json
 import pytest
 from fastapi import status
 
@@ -40,3 +41,19 @@ def test_chat_health_endpoint(client):
     assert "status" in data
     assert "rag_available" in data
 
+
+
+def test_chat_stream_endpoint(client):
+    """Test streaming chat endpoint emits newline-delimited JSON."""
+    response = client.post(
+        "/api/chat/stream",
+        json={"message": "Show me gym wear", "max_results": 5}
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    messages = [json.loads(line) for line in response.text.splitlines() if line]
+    assert messages
+    assert not any("error" in message for message in messages)
+    assert all(message["delta"] for message in messages[:-1])
+    assert "products" in messages[-1]
+    assert "needs_clarification" in messages[-1]
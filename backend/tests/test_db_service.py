@@ -0,0 +1,83 @@
+"""Tests for the Hunnit product upsert."""
+import uuid
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+from sqlalchemy import select
+
+from app.models.product import EMBEDDING_DIMENSION, Product
+from app.services.products.hunnit.db_service import HunnitProductDBService
+from tests.conftest import TestingAsyncSessionLocal
+
+
+def _row(embedding=None, embedding_input_hash=None, ai_features=None, price=100.0) -> dict:
+    """Upsert row for one product (external_id "ext-1")."""
+    return {
+        "id": uuid.uuid4(),
+        "external_id": "ext-1",
+        "title": "Zen Nova",
+        "handle": "zen-nova",
+        "price": price,
+        "tags": ["yoga"],
+        "embedding": embedding,
+        "embedding_input_hash": embedding_input_hash,
+        "ai_features": ai_features,
+    }
+
+
+async def _upsert(row: dict) -> Product:
+    """Upsert a row, commit, and read the stored product back."""
+    async with TestingAsyncSessionLocal() as db:
+        await HunnitProductDBService(db)._upsert_rows([row])
+        await db.commit()
+    async with TestingAsyncSessionLocal() as db:
+        return (await db.execute(select(Product).where(Product.external_id == "ext-1"))).scalar_one()
+
+
+async def test_upsert_without_embedding_keeps_stored_vector(db_session):
+    """A scrape whose embedding call failed doesn't wipe the stored vector or its hash."""
+    vector = np.full(EMBEDDING_DIMENSION, 0.5, dtype=np.float32)
+    await _upsert(_row(embedding=vector, embedding_input_hash="a" * 32, ai_features=["breathable"]))
+
+    product = await _upsert(_row(price=120.0))
+
+    assert product.price == 120.0
+    assert product.embedding is not None
+    assert np.allclose(product.embedding.to_numpy(), vector)
+    assert product.embedding_input_hash == "a" * 32
+    assert product.ai_features == ["breathable"]
+
+
+async def test_upsert_with_new_embedding_replaces_vector_and_hash(db_session):
+    """A freshly generated embedding overwrites the stored one together with its hash."""
+    await _upsert(_row(embedding=np.full(EMBEDDING_DIMENSION, 0.5, dtype=np.float32), embedding_input_hash="a" * 32))
+
+    product = await _upsert(_row(embedding=np.full(EMBEDDING_DIMENSION, 0.25, dtype=np.float32), embedding_input_hash="b" * 32))
+
+    assert np.allclose(product.embedding.to_numpy(), 0.25)
+    assert product.embedding_input_hash == "b" * 32
+
+
+async def test_failed_save_rolls_back_before_the_next_batch(db_session, monkeypatch):
+    """A batch that fails mid-upsert leaves nothing behind for the next batch's commit."""
+    async with TestingAsyncSessionLocal() as db:
+        service = HunnitProductDBService(db)
+        upsert_rows = service._upsert_rows
+        batches = {1: _row(), 2: {**_row(), "external_id": "ext-2", "handle": "zen-halo", "title": "Zen Halo"}}
+
+        async def failing_upsert(rows):
+            await upsert_rows(rows)
+            raise RuntimeError("later chunk failed")
+
+        monkeypatch.setattr(service, "_build_rows", lambda unique_products, existing: [batches[int(key)] for key in unique_products])
+        monkeypatch.setattr(service, "_upsert_rows", failing_upsert)
+        with pytest.raises(RuntimeError):
+            await service.save_products([SimpleNamespace(id=1)])
+
+        monkeypatch.setattr(service, "_upsert_rows", upsert_rows)
+        assert await service.save_products([SimpleNamespace(id=2)]) == (1, 0)
+
+    async with TestingAsyncSessionLocal() as db:
+        stored = (await db.execute(select(Product.external_id))).scalars().all()
+    assert stored == ["ext-2"]
@@ -0,0 +1,165 @@
+"""Tests for bulk embedding generation and its database writes."""
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from app.models.product import EMBEDDING_DIMENSION, Product
+from app.rag import generate_embeddings
+from app.rag.embedding_service import EmbeddingService
+from app.rag.generate_embeddings import _collect_embeddings, _copy_embeddings, _submit_texts
+
+
+class _StubEmbeddingService(EmbeddingService):
+    """Embedding service whose vectors encode the length of their input text."""
+
+    def __init__(self):
+        self.model = "test-model"
+        self.dimension = EMBEDDING_DIMENSION
+        self.requests = []
+
+    def generate_embeddings_batch(self, texts, task_type="RETRIEVAL_DOCUMENT"):
+        self.requests.append(list(texts))
+        return [np.full(EMBEDDING_DIMENSION, float(len(text)), dtype=np.float32) for text in texts]
+
+
+class _EchoEmbeddingService:
+    """Embedding service returning each text as its own "embedding"."""
+
+    def __init__(self):
+        self.requests = []
+
+    def generate_embeddings_batch(self, texts):
+        self.requests.append(list(texts))
+        return list(texts)
+
+
+def test_submitted_texts_map_back_to_their_own_embeddings():
+    """Deduplicated, length-sorted requests still line up with the original texts."""
+    texts = ["bb", "a", "dddd", "ccc", "a", "bb", "dddd"]
+    service = _EchoEmbeddingService()
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        slots, futures = _submit_texts(pool, service, texts, batch_size=2)
+        embeddings = _collect_embeddings(slots, futures)
+
+    assert embeddings == texts
+    assert sorted(service.requests) == [["bb", "a"], ["dddd", "ccc"]]
+
+
+def _add_products(db, titles):
+    """Store one product per title and return them."""
+    products = [
+        Product(id=uuid.uuid4(), external_id=f"ext-{i}", handle=f"handle-{i}", title=title, price=100.0)
+        for i, title in enumerate(titles)
+    ]
+    db.add_all(products)
+    db.commit()
+    return products
+
+
+def _stored_lengths(db):
+    """Encoded text length of each product's stored embedding, by product id."""
+    db.expire_all()
+    return {
+        product.id: None if product.embedding is None else float(product.embedding.to_numpy()[0])
+        for product in db.query(Product)
+    }
+
+
+def test_embeddings_are_written_to_their_own_products(db_session, monkeypatch):
+    """Each product (duplicate texts included) gets the embedding of its own text (SQLite bulk update)."""
+    service = _StubEmbeddingService()
+    monkeypatch.setattr(generate_embeddings, "get_embedding_service", lambda: service)
+    titles = ["Zen", "Zen Nova Leggings", "Halo Bra", "Zen", "Everyday Running Tee"]
+    products = _add_products(db_session, titles)
+    expected = {product.id: float(len(service._prepare_text(product.title, price=100.0))) for product in products}
+
+    assert generate_embeddings.generate_embeddings_for_products(db_session, batch_size=2) == (5, 0)
+
+    assert sum(len(request) for request in service.requests) == 4
+    assert _stored_lengths(db_session) == expected
+    for product in db_session.query(Product):
+        assert product.embedding_input_hash == service.input_hash(service._prepare_text(product.title, price=100.0))
+
+
+def test_unchanged_embedding_input_is_skipped(db_session, monkeypatch):
+    """Regeneration skips products whose stored hash matches their current text."""
+    service = _StubEmbeddingService()
+    monkeypatch.setattr(generate_embeddings, "get_embedding_service", lambda: service)
+    unchanged, changed = _add_products(db_session, ["Zen Nova", "Halo Bra"])
+    unchanged_id, changed_id = unchanged.id, changed.id
+    for product in (unchanged, changed):
+        product.embedding = np.full(EMBEDDING_DIMENSION, 1.0, dtype=np.float32)
+        product.embedding_input_hash = service.input_hash(service._prepare_text(product.title, price=100.0))
+    changed.title = "Halo Sports Bra"
+    db_session.commit()
+
+    assert generate_embeddings.regenerate_all_embeddings(db_session) == (1, 0)
+
+    new_text = service._prepare_text("Halo Sports Bra", price=100.0)
+    assert service.requests == [[new_text]]
+    assert _stored_lengths(db_session) == {unchanged_id: 1.0, changed_id: float(len(new_text))}
+
+
+class _RecordingCursor:
+    """DB-API cursor capturing the COPY data stream."""
+
+    def __init__(self, copied):
+        self.copied = copied
+
+    def copy_expert(self, sql, file):
+        self.copied.append((sql, file.read()))
+
+    def close(self):
+        pass
+
+
+class _RecordingSession:
+    """Session stand-in recording executed SQL and COPY streams."""
+
+    def __init__(self):
+        self.statements = []
+        self.copied = []
+
+    def execute(self, statement):
+        self.statements.append(str(statement))
+
+    def connection(self):
+        cursor = _RecordingCursor(self.copied)
+        dbapi_connection = type("DBAPIConnection", (), {"cursor": lambda _: cursor})()
+        return type("Connection", (), {"connection": dbapi_connection})()
+
+
+def test_copy_stream_matches_binary_copy_format():
+    """One row is framed exactly as PostgreSQL's binary COPY expects."""
+    product_id = uuid.UUID("12345678-1234-5678-1234-567812345678")
+    input_hash = "0123456789abcdef" * 2
+    db = _RecordingSession()
+
+    _copy_embeddings(db, [{
+        "id": product_id,
+        "embedding": np.array([1.0, -2.0, 0.5], dtype=np.float32),
+        "embedding_input_hash": input_hash,
+    }])
+
+    expected = (
+        b"PGCOPY\n\xff\r\n\x00"              # signature
+        b"\x00\x00\x00\x00"                  # flags
+        b"\x00\x00\x00\x00"                  # header extension length
+        b"\x00\x03"                          # fields in the tuple
+        b"\x00\x00\x00\x10" + product_id.bytes
+        + b"\x00\x00\x00\x0a"                # halfvec: dim, unused, float16 values
+        b"\x00\x03\x00\x00" b"\x3c\x00" b"\xc0\x00" b"\x38\x00"
+        b"\x00\x00\x00\x20" + input_hash.encode("ascii")
+        + b"\xff\xff"                        # trailer
+    )
+    [(sql, data)] = db.copied
+    assert sql == "COPY _embedding_stage FROM STDIN WITH (FORMAT BINARY)"
+    assert data == expected
+    assert db.statements[0].startswith("CREATE TEMP TABLE _embedding_stage")
+    assert f"halfvec({EMBEDDING_DIMENSION})" in db.statements[0]
+    assert db.statements[1] == (
+        "UPDATE products SET embedding = s.embedding, embedding_input_hash = s.embedding_input_hash "
+        "FROM _embedding_stage s WHERE products.id = s.id"
+    )
@@ -0,0 +1,66 @@
+"""Tests for the migrate / verify_schema startup flow."""
+import os
+
+import pytest
+from sqlalchemy import create_engine, text
+
+from app.config import database
+from app.cli.migrate import migrate
+
+
+@pytest.fixture
+def empty_engine(tmp_path, monkeypatch):
+    """Point the database module at an empty SQLite database."""
+    test_engine = create_engine(f"sqlite:///{os.path.join(tmp_path, 'migrate.db')}")
+    monkeypatch.setattr(database, "engine", test_engine)
+    yield test_engine
+    test_engine.dispose()
+
+
+def test_migrate_then_verify_on_empty_database(empty_engine):
+    """A fresh database is created, stamped at head and passes verify_schema."""
+    assert migrate() == 0
+
+    current, head = database.get_schema_revisions()
+    assert current == head
+    database.verify_schema()
+
+    with empty_engine.connect() as conn:
+        assert conn.execute(text("SELECT COUNT(*) FROM products")).scalar() == 0
+
+
+def test_migrate_is_noop_at_head(empty_engine):
+    """Running migrate again on a database at head leaves it there."""
+    assert migrate() == 0
+    assert migrate() == 0
+    database.verify_schema()
+
+
+def test_verify_schema_rejects_unversioned_database(empty_engine):
+    """Startup refuses a database that was never migrated."""
+    with pytest.raises(RuntimeError):
+        database.verify_schema()
+
+
+def test_failed_upgrade_on_existing_tables_is_not_stamped(empty_engine):
+    """Tables created outside Alembic aren't silently stamped at head."""
+    database.Base.metadata.create_all(bind=empty_engine)
+
+    with pytest.raises(RuntimeError):
+        database.run_migrations()
+    with pytest.raises(RuntimeError):
+        database.verify_schema()
+
+
+def test_migrate_exit_code_reports_failure(empty_engine):
+    """The migrate command exits non-zero when the schema can't reach head."""
+    database.Base.metadata.create_all(bind=empty_engine)
+
+    assert migrate() == 1
+
+
+def test_migrate_exit_code_checks_resulting_revision(empty_engine, monkeypatch):
+    """A run_migrations that completes without reaching head still fails the deploy."""
+    monkeypatch.setattr(database, "run_migrations", lambda: None)
+
+    assert migrate() == 1
@@ -0,0 +1,67 @@
+"""Tests for query synonym expansion."""
+import pytest
+
+from app.rag.query_enhancement import QueryEnhancer
+
+
+@pytest.fixture
+def enhancer():
+    """Query enhancer with memoized results cleared."""
+    QueryEnhancer.cache_clear()
+    yield QueryEnhancer()
+    QueryEnhancer.cache_clear()
+
+
+def test_trigger_terms_expand_with_synonyms(enhancer):
+    """A synonym key in the query appends its synonyms after the original query."""
+    assert enhancer.expand_query("red shirt") == "red shirt top blouse tee t-shirt tshirt"
+
+
+@pytest.mark.parametrize("query", ["red shirts", "running shoes", "canvas bags", "leather watches"])
+def test_plural_triggers_expand(enhancer, query):
+    """Plural forms ("s" / "es") of a key trigger its synonyms."""
+    assert enhancer.expand_query(query) != query
+
+
+@pytest.mark.parametrize("query", ["shirtless look", "gymnastics kit", "dressing table", "informally"])
+def test_triggers_match_whole_words_only(enhancer, query):
+    """Keys inside longer words don't trigger expansion."""
+    assert enhancer.expand_query(query) == query
+
+
+def test_shared_synonyms_added_once_in_query_order(enhancer):
+    """Synonyms shared by several triggered keys appear once, in trigger order."""
+    expanded = enhancer.expand_query("formal meeting")
+    extras = expanded[len("formal meeting "):].split()
+    assert extras == ["business", "professional", "dressy", "elegant", "sophisticated", "office", "corporate"]
+
+
+@pytest.mark.parametrize("query, skipped", [
+    ("shirt tee", "tee"),
+    ("shirt t-shirt", "t-shirt"),
+    ("sunglasses sun glasses", "sun glasses"),
+    ("cheap low price shoes", "low price"),
+])
+def test_synonyms_already_in_query_are_not_repeated(enhancer, query, skipped):
+    """Single- and multi-word synonyms already in the query aren't appended again."""
+    expanded = enhancer.expand_query(query)
+    assert expanded != query
+    assert expanded[len(query):].count(skipped) == 0
+
+
+def test_synonyms_inside_longer_query_words_are_still_added(enhancer):
+    """Synonym checks use whole words: "tee" isn't already present in "teenager"."""
+    assert "tee" in enhancer.expand_query("teenager shirt")[len("teenager shirt"):].split()
+
+
+def test_enhance_caps_expansion(enhancer):
+    """Long expansions keep the normalized query plus at most 10 distinct extra terms."""
+    query = "Cheap formal shirt under ₹500 for gym meeting!!"
+    normalized = enhancer.normalize_query(query)
+    enhanced = enhancer.enhance(query)
+
+    assert enhanced.startswith(normalized + " ")
+    extras = enhanced[len(normalized) + 1:].split()
+    assert len(extras) == 10
+    assert len(set(extras)) == len(extras)
+    assert not set(extras) & set(normalized.split())
@@ -0,0 +1,244 @@
+"""Tests for RAG response cleanup and streaming."""
+import asyncio
+import random
+import uuid
+
+import numpy as np
+import pytest
+
+from app.models.product import EMBEDDING_DIMENSION, Product
+from app.rag import rag_service
+from app.rag.rag_service import RAGService, _ResponseLineFilter, _clean_llm_response
+
+# LLM-style responses exercising the cleanup rules: labelled bullet lines,
+# bold headings, blank and whitespace-only lines, surrounding whitespace
+SAMPLE_RESPONSES = [
+    "Here are some great options for your workout!",
+    "  Here are a few picks.\n\n\n- Zen Nova: breathable\n- Zen Halo: soft\n\nEnjoy your run!  ",
+    "**Top Picks**: these suit you\nThe first one is lighter.\n\n  \n\t\nThe second is warmer.\n",
+    "\n\n• Sports Bra: high support\n* Leggings: squat proof\nWould you like more colours?\n\n",
+    "Line one \nline two\t\n\n\n\nline three \r\n",
+    "",
+    "   \n\n  ",
+]
+
+
+def _split(text: str, rng: random.Random) -> list:
+    """Split text into chunks at random positions (as an LLM stream would)."""
+    cuts = sorted(rng.sample(range(len(text) + 1), min(len(text) + 1, rng.randint(0, 6))))
+    return [text[start:end] for start, end in zip([0] + cuts, cuts + [len(text)])]
+
+
+@pytest.mark.parametrize("text", SAMPLE_RESPONSES)
+def test_line_filter_matches_clean_response(text):
+    """Streamed cleanup equals the non-streaming cleanup for any chunking."""
+    rng = random.Random(text)
+    expected = _clean_llm_response(text).strip()
+    for _ in range(50):
+        line_filter = _ResponseLineFilter()
+        streamed = "".join(line_filter.feed(piece) for piece in _split(text, rng)) + line_filter.flush()
+        assert streamed == expected
+
+
+def test_clean_response_drops_listing_lines():
+    """Labelled bullet lines and bold headings are removed, blank runs collapsed."""
+    cleaned = _clean_llm_response(SAMPLE_RESPONSES[1]).strip()
+    assert cleaned == "Here are a few picks.\n\nEnjoy your run!"
+
+
+@pytest.fixture
+def stubbed_service(db_session, monkeypatch):
+    """
+    Factory for a RAGService whose retrieval step and response cache are stubbed out.
+
+    The service prepares a fixed "prompt" with no products (keyword arguments
+    override the prepared values) and never hits the LLM response cache; tests
+    stub the LLM call they exercise.
+    """
+    def make(llm_client=None, **prepared):
+        async def stub_prepare(*args, **kwargs):
+            return {
+                "prompt": "prompt",
+                "products": [],
+                "scores": [],
+                "is_informational": False,
+                "semantic_key": None,
+                **prepared,
+            }
+
+        async def no_cache(*args, **kwargs):
+            return None
+
+        service = RAGService(db_session)
+        service.llm_client = llm_client if llm_client is not None else object()
+        service.llm_model = "test-model"
+        monkeypatch.setattr(service, "_prepare_recommendation", stub_prepare)
+        monkeypatch.setattr(service, "_get_cached_response", no_cache)
+        monkeypatch.setattr(service, "_cache_response", no_cache)
+        return service
+
+    return make
+
+
+async def test_stream_recommend_products_deltas_match_cleaned_response(stubbed_service, monkeypatch):
+    """Deltas from a stubbed LLM stream join to the cleaned full response."""
+    text = SAMPLE_RESPONSES[1]
+    pieces = _split(text, random.Random(0))
+
+    async def stub_stream(client, model, prompt):
+        for piece in pieces:
+            yield piece
+
+    monkeypatch.setattr(rag_service, "_stream_llm_text", stub_stream)
+    service = stubbed_service()
+
+    messages = [message async for message in service.stream_recommend_products("gym wear")]
+
+    deltas = "".join(message["delta"] for message in messages if "delta" in message)
+    assert deltas == _clean_llm_response(text).strip()
+    assert messages[-1] == {"products": [], "scores": [], "needs_clarification": False}
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("**Top Picks**:\n- Zen Nova: breathable\n", "**Top Picks**:\n- Zen Nova: breathable"),
+    ("", "I found some products that might match your query."),
+])
+async def test_stream_recommend_products_empty_cleanup_falls_back(stubbed_service, monkeypatch, text, expected):
+    """A response cleaned to nothing streams and caches the same text recommend_products returns."""
+    cached = []
+
+    async def stub_stream(client, model, prompt):
+        yield text
+
+    async def record_cache(cache_key, response, needs_clarification):
+        cached.append(response)
+
+    monkeypatch.setattr(rag_service, "_stream_llm_text", stub_stream)
+    service = stubbed_service()
+    monkeypatch.setattr(service, "_cache_response", record_cache)
+
+    messages = [message async for message in service.stream_recommend_products("gym wear")]
+
+    assert "".join(message["delta"] for message in messages if "delta" in message) == expected
+    assert cached == [expected]
+
+
+async def test_stream_llm_text_releases_slot_before_consumer_reads(monkeypatch):
+    """The LLM slot is freed once generation ends, even if the consumer hasn't read the chunks."""
+    semaphore = asyncio.Semaphore(1)
+    monkeypatch.setattr(rag_service, "_llm_semaphore", semaphore)
+
+    class StubModels:
+        def generate_content_stream(self, model, contents):
+            for text in ("one ", "two ", "three"):
+                yield type("Chunk", (), {"text": text})()
+
+    client = type("Client", (), {"models": StubModels()})()
+    stream = rag_service._stream_llm_text(client, "test-model", "prompt")
+
+    assert await stream.__anext__() == "one "
+    await asyncio.wait_for(semaphore.acquire(), timeout=5)
+    semaphore.release()
+    assert [text async for text in stream] == ["two ", "three"]
+
+
+class _FixedEmbeddingSearch:
+    """Vector search stub that embeds every query to the same vector."""
+    
+    def __init__(self, products):
+        self.products = products
+    
+    def embed_query(self, query_text):
+        return np.full(EMBEDDING_DIMENSION, 0.5, dtype=np.float32)
+    
+    def search_by_query_text(self, query_text, limit, similarity_threshold, enhance_query=True):
+        return [(product, 0.9) for product in self.products][:limit]
+    
+    def load_products(self, scores_by_id):
+        by_id = {product.id: product for product in self.products}
+        return [(by_id[product_id], score) for product_id, score in scores_by_id.items()]
+
+
+async def test_semantic_cache_keys_on_parsed_price_bounds(db_session, monkeypatch):
+    """Queries with the same embedding but different price bounds don't share an entry."""
+    monkeypatch.setattr(rag_service, "_semantic_cache", rag_service._SemanticResponseCache(8, 60, 0.95))
+    products = [Product(id=uuid.uuid4(), title=f"Leggings {price}", price=price) for price in (800.0, 2500.0, 4000.0)]
+    service = RAGService(db_session)
+    service.llm_client = object()
+    service.vector_search = _FixedEmbeddingSearch(products)
+
+    async def prepare(query):
+        return await service._prepare_recommendation(query, 5, 0.6, None, False)
+
+    first = await prepare("leggings under 1000")
+    assert "prompt" in first
+    service._remember_result(first, {
+        "response": "Here are leggings under ₹1000.",
+        "products": first["products"],
+        "needs_clarification": False,
+        "scores": first["scores"],
+    })
+
+    assert (await prepare("leggings under 1000"))["response"] == "Here are leggings under ₹1000."
+    for query in ("leggings under 3000", "leggings above 3000"):
+        prepared = await prepare(query)
+        assert "prompt" in prepared
+        assert prepared["products"] != first["products"]
+
+
+def _batcher_replying(monkeypatch, reply: str) -> rag_service._PromptBatcher:
+    """Prompt batcher whose batched LLM call returns a fixed reply."""
+    batcher = rag_service._PromptBatcher(0.01, 4)
+
+    async def stub_generate(client, model, contents, config=None):
+        return reply
+
+    monkeypatch.setattr(batcher, "_generate", stub_generate)
+    return batcher
+
+
+async def test_batch_answers_are_matched_by_id(monkeypatch):
+    """Batched answers go to the request whose id they carry, not their array position."""
+    reply = '[{"id": 2, "answer": "second"}, {"id": 1, "answer": "first"}]'
+    batcher = _batcher_replying(monkeypatch, reply)
+
+    assert await batcher._generate_batch(None, "test-model", ["one", "two"]) == ["first", "second"]
+
+
+@pytest.mark.parametrize("reply", [
+    '["first", "second"]',
+    '[{"id": 1, "answer": "first"}]',
+    '[{"id": 1, "answer": "first"}, {"id": 1, "answer": "again"}]',
+    '[{"id": 1, "answer": "first"}, {"id": 3, "answer": "third"}]',
+    '[{"id": 1, "answer": "first"}, {"id": true, "answer": "second"}]',
+    '[{"id": 1, "answer": "first"}, {"id": 2, "answer": null}]',
+])
+async def test_batch_reply_without_matching_ids_is_rejected(monkeypatch, reply):
+    """Replies that don't carry exactly one answer per request id fall back to single calls."""
+    batcher = _batcher_replying(monkeypatch, reply)
+
+    assert await batcher._generate_batch(None, "test-model", ["one", "two"]) is None
+
+
+async def test_prompts_with_history_are_not_batched(stubbed_service, monkeypatch):
+    """Only first-turn prompts may share a batched LLM call."""
+    batched = []
+
+    async def stub_batch(client, model, prompt):
+        batched.append(prompt)
+        return "batched answer"
+
+    class StubModels:
+        async def generate_content(self, model, contents):
+            return type("Response", (), {"text": "own answer"})()
+
+    monkeypatch.setattr(rag_service.settings, "LLM_BATCH_WINDOW_MS", 10)
+    monkeypatch.setattr(rag_service._prompt_batcher, "generate", stub_batch)
+    client = type("Client", (), {"aio": type("Aio", (), {"models": StubModels()})()})()
+    service = stubbed_service(llm_client=client, is_informational=True)
+
+    history = [{"role": "user", "content": "my earlier message"}]
+    assert (await service.recommend_products("gym wear", conversation_history=history))["response"] == "own answer"
+    assert batched == []
+    assert (await service.recommend_products("gym wear"))["response"] == "batched answer"
+    assert batched == ["prompt"]
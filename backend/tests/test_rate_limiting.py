@@ -37,3 +37,33 @@ def test_rate_limit_scrape_endpoint(client):
     assert any(code == status.HTTP_429_TOO_MANY_REQUESTS for code in status_codes) or \
            all(code in [status.HTTP_200_OK, status.HTTP_500_INTERNAL_SERVER_ERROR] for code in status_codes)
 
+
+
+def test_rate_limit_falls_back_to_memory_when_redis_is_down():
+    """An unreachable Redis neither fails requests nor disables limiting."""
+    from fastapi import FastAPI, Request
+    from fastapi.testclient import TestClient
+    from slowapi.errors import RateLimitExceeded
+    from app.middleware.rate_limit import create_limiter, rate_limit_exceeded_handler
+    
+    # Nothing listens on port 1
+    limiter = create_limiter("redis://127.0.0.1:1/0")
+    app = FastAPI()
+    app.state.limiter = limiter
+    app.add_exception_handler(RateLimitExceeded, rate_limit_exceeded_handler)
+    
+    @app.get("/limited")
+    @limiter.limit("2/minute")
+    async def limited(request: Request):
+        return {"ok": True}
+    
+    started = time.monotonic()
+    with TestClient(app) as test_client:
+        responses = [test_client.get("/limited") for _ in range(3)]
+    
+    assert [response.status_code for response in responses] == [
+        status.HTTP_200_OK, status.HTTP_200_OK, status.HTTP_429_TOO_MANY_REQUESTS
+    ]
+    assert responses[2].headers["Retry-After"] == "60"
+    assert responses[2].json()["retry_after"] == 60
+    assert time.monotonic() - started < 5